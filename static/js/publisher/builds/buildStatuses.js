@@ -0,0 +1,95 @@
+import { UserFacingStatus } from "./helpers";
+
+/**
+ * Render the build status of a snap in its cell
+ *
+ * @param {HTMLElement} cell
+ * @param {string} status
+ */
+export function renderBuildStatus(cell, status) {
+  const userFacingStatus =
+    UserFacingStatus[status] || UserFacingStatus["unknown"];
+  const link = document.createElement("a");
+
+  link.href = `/${cell.dataset.snapName}/builds`;
+  link.textContent = userFacingStatus.shortStatusMessage;
+
+  if (userFacingStatus.icon) {
+    const icon = document.createElement("i");
+    icon.className = `p-icon--${userFacingStatus.icon}`;
+    link.prepend(icon, " ");
+  }
+
+  cell.textContent = "";
+  cell.appendChild(link);
+}
+
+/**
+ * Fill the build status cells of the account snaps as the statuses are
+ * streamed, one snap per line, so slow snaps don't hold back the others
+ *
+ * @param {string} selector Selector of the cells, with the snap name in
+ *   their data-snap-name attribute
+ */
+export function initBuildStatuses(selector) {
+  const cells = {};
+
+  [].slice.call(document.querySelectorAll(selector)).forEach((cell) => {
+    cells[cell.dataset.snapName] = cell;
+  });
+
+  if (!Object.keys(cells).length) {
+    return;
+  }
+
+  const addStatuses = (lines) => {
+    lines
+      .filter((line) => line)
+      .forEach((line) => {
+        const snapStatus = JSON.parse(line);
+        const cell = cells[snapStatus.name];
+
+        if (cell) {
+          renderBuildStatus(cell, snapStatus.status);
+          delete cells[snapStatus.name];
+        }
+      });
+  };
+
+  // The snaps missing from the stream are shown with the unknown status
+  const finish = () => {
+    Object.keys(cells).forEach((snapName) => {
+      renderBuildStatus(cells[snapName], "unknown");
+    });
+  };
+
+  fetch("/snap-builds.ndjson")
+    .then((res) => {
+      if (!res.ok) {
+        throw new Error(res.statusText);
+      }
+
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+
+      const read = () =>
+        reader.read().then(({ done, value }) => {
+          if (done) {
+            addStatuses([buffer]);
+            return;
+          }
+
+          buffer += decoder.decode(value, { stream: true });
+          const lines = buffer.split("\n");
+          buffer = lines.pop();
+          addStatuses(lines);
+
+          return read();
+        });
+
+      return read();
+    })
+    .catch(() => {})
+    .then(finish);
+}
@@ -0,0 +1,32 @@
+import { renderBuildStatus } from "./buildStatuses";
+
+describe("renderBuildStatus", () => {
+  let cell;
+
+  beforeEach(() => {
+    cell = document.createElement("td");
+    cell.dataset.snapName = "toto";
+    cell.textContent = "Loading…";
+  });
+
+  it("should link the status to the builds of the snap", () => {
+    renderBuildStatus(cell, "released");
+
+    const link = cell.querySelector("a");
+    expect(link.getAttribute("href")).toEqual("/toto/builds");
+    expect(link.textContent).toEqual("Released");
+  });
+
+  it("should show an icon for failures", () => {
+    renderBuildStatus(cell, "failed_to_build");
+
+    expect(cell.querySelector("i").className).toEqual("p-icon--error");
+    expect(cell.textContent).toEqual(" Failed");
+  });
+
+  it("should show unknown statuses as unknown", () => {
+    renderBuildStatus(cell, "not_a_status");
+
+    expect(cell.textContent).toEqual("Unknown");
+  });
+});
@@ -88,53 +88,140 @@ class RepoConnect extends React.Component {
     );
   }
 
+  /**
+   * Map a repository from the API to a repo list item
+   *
+   * @param {object} repo
+   *
+   * @returns {object}
+   */
+  repoListItem(repo) {
+    const { user } = this.state;
+
+    // a user may have access to a repo in an org
+    // but they're not part of that org
+    // they may also have their own fork
+    // so we need to differentiate, this just shows
+    // the upstream org name in the repo list
+    if (repo.nameWithOwner) {
+      if (repo.nameWithOwner.indexOf(`${user.login}/`) === 0) {
+        return {
+          value: repo.nameWithOwner.replace(`${user.login}/`, ""),
+        };
+      } else {
+        return { value: repo.nameWithOwner };
+      }
+    } else {
+      return { value: repo.name };
+    }
+  }
+
   /**
    * Fetch repo list of the selected organization
    *
+   * The repos are streamed one per line, the list is usable as soon as
+   * the first page arrives and grows with the next ones
    */
   fetchRepoList() {
     const { selectedOrganization, user } = this.state;
     let url = "";
 
     if (selectedOrganization === user.login) {
-      url = "/publisher/github/get-repos";
+      url = "/publisher/github/get-repos.ndjson";
     } else {
-      url = `/publisher/github/get-repos?org=${selectedOrganization}`;
+      url = `/publisher/github/get-repos.ndjson?org=${selectedOrganization}`;
     }
     this.setState({
+      repoList: [],
       isRepoListDisabled: true,
       status: LOADING,
     });
+
+    // The last line tells if all the repos were sent
+    let complete = false;
+
+    const addRepos = (lines, done) => {
+      // The organization changed while its repos were streamed
+      if (this.state.selectedOrganization !== selectedOrganization) {
+        return;
+      }
+
+      const newRepos = [];
+
+      lines
+        .filter((line) => line)
+        .forEach((line) => {
+          const item = JSON.parse(line);
+
+          if (item.error) {
+            throw new Error(item.error);
+          } else if (item.done) {
+            complete = true;
+          } else {
+            newRepos.push(this.repoListItem(item));
+          }
+        });
+
+      if (done && !complete) {
+        throw new Error("The repository list is incomplete");
+      }
+
+      if (!newRepos.length && !done) {
+        return;
+      }
+
+      this.setState({
+        repoList: this.state.repoList.concat(newRepos).sort(this.sortByValue),
+        isRepoListDisabled: false,
+        status: null,
+      });
+    };
+
     fetch(url)
-      .then((res) => res.json())
-      .then((result) => {
-        let newRepoList = result
-          .map((el) => {
-            // a user may have access to a repo in an org
-            // but they're not part of that org
-            // they may also have their own fork
-            // so we need to differentiate, this just shows
-            // the upstream org name in the repo list
-            if (el.nameWithOwner) {
-              if (el.nameWithOwner.indexOf(`${user.login}/`) === 0) {
-                return {
-                  value: el.nameWithOwner.replace(`${user.login}/`, ""),
-                };
-              } else {
-                return { value: el.nameWithOwner };
-              }
-            } else {
-              return { value: el.name };
+      .then((res) => {
+        if (!res.ok) {
+          throw new Error(res.statusText);
+        }
+
+        const reader = res.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = "";
+
+        const read = () =>
+          reader.read().then(({ done, value }) => {
+            if (done) {
+              addRepos([buffer], true);
+              return;
             }
-          })
-          .sort(this.sortByValue);
-        this.setState({
-          repoList: newRepoList,
-          isRepoListDisabled: false,
-          status: null,
-        });
+
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split("\n");
+            buffer = lines.pop();
+            addRepos(lines, false);
+
+            return read();
+          });
+
+        return read();
       })
-      .catch(() => {
+      .catch((error) => {
+        // The organization changed while its repos were streamed
+        if (this.state.selectedOrganization !== selectedOrganization) {
+          return;
+        }
+
+        // Some repos were listed before the listing was interrupted
+        if (this.state.repoList.length) {
+          this.setState({
+            isRepoListDisabled: false,
+            status: ERROR,
+            error: {
+              message: `Only some of the repos could be listed: ${error.message}`,
+            },
+          });
+          return;
+        }
+
         this.setState({
           isRepoListDisabled: false,
           status: ERROR,
@@ -8,20 +8,23 @@ import { TriggerBuildStatus } from "./helpers";
 
 import TriggerBuild from "./components/triggerBuild";
 
+const BUILDS_PER_PAGE = 15;
+
 class Builds extends React.Component {
   constructor(props) {
     super(props);
 
     this.fetchTimer = null;
+    this.eventSource = null;
 
     this.state = {
       triggerBuildLoading: false,
       triggerBuildStatus: TriggerBuildStatus.IDLE,
       triggerBuildErrorMessage: "",
       isLoading: false,
-      fetchSize: 15,
-      fetchStart: 0,
       builds: props.builds,
+      nextCursor: props.nextCursor,
+      hasMorePages: false,
       queueTime:
         props.builds.length > 0 ? this.getInitialQueueTime(props.builds) : {},
       shouldUpdateQueueTime: true,
@@ -40,6 +43,53 @@ class Builds extends React.Component {
     }
   }
 
+  componentDidMount() {
+    const { snapName, updateFreq } = this.props;
+
+    // Builds are pushed when their status changes, polling is only a
+    // fallback for browsers without server-sent events
+    if (updateFreq && window.EventSource) {
+      if (this.fetchTimer) {
+        clearTimeout(this.fetchTimer);
+      }
+
+      this.eventSource = new EventSource(`/${snapName}/builds/events`);
+      this.eventSource.addEventListener("build", (event) => {
+        this.updateBuild(JSON.parse(event.data));
+      });
+    }
+  }
+
+  componentWillUnmount() {
+    if (this.eventSource) {
+      this.eventSource.close();
+    }
+  }
+
+  updateBuild(build) {
+    const { triggerBuildStatus, triggerBuildLoading } = this.state;
+    const { SUCCESS, IDLE } = TriggerBuildStatus;
+    const builds = this.state.builds.slice();
+    const index = builds.findIndex((existing) => existing.id === build.id);
+
+    if (index === -1) {
+      builds.unshift(build);
+    } else {
+      builds[index] = Object.assign({}, builds[index], build);
+    }
+
+    this.setState(
+      {
+        triggerBuildLoading:
+          triggerBuildStatus === SUCCESS ? !SUCCESS : triggerBuildLoading,
+        triggerBuildStatus:
+          triggerBuildStatus === SUCCESS ? IDLE : triggerBuildStatus,
+        builds,
+      },
+      () => this.updateQueueTime()
+    );
+  }
+
   getInitialQueueTime(builds) {
     let newQueueTime = {};
 
@@ -74,9 +124,9 @@ class Builds extends React.Component {
 
   fetchBuilds(fromStart) {
     const {
-      fetchSize,
-      fetchStart,
       builds,
+      nextCursor,
+      hasMorePages,
       triggerBuildStatus,
       triggerBuildLoading,
       shouldUpdateQueueTime,
@@ -84,19 +134,12 @@ class Builds extends React.Component {
     const { snapName } = this.props;
     const { SUCCESS, IDLE } = TriggerBuildStatus;
 
-    let url = `/${snapName}/builds.json`;
-    let params = [];
-
-    if (fetchStart && !fromStart) {
-      params.push(`start=${fetchStart}`);
-    }
-
-    if (fetchSize) {
-      params.push(`size=${fetchSize}`);
-    }
+    let url = `/${snapName}/builds.json?size=${BUILDS_PER_PAGE}`;
 
-    if (params.length > 0) {
-      url += `?${params.join("&")}`;
+    // The cursor points after the last build shown, builds created since
+    // don't shift the next page
+    if (builds && !fromStart && nextCursor) {
+      url += `&cursor=${encodeURIComponent(nextCursor)}`;
     }
 
     fetch(url)
@@ -110,8 +153,13 @@ class Builds extends React.Component {
               triggerBuildStatus === SUCCESS ? IDLE : triggerBuildStatus,
             isLoading: false,
             builds: fromStart
-              ? result.snap_builds
-              : builds.slice().concat(result.snap_builds),
+              ? this.mergeFirstPage(result.snap_builds, builds || [])
+              : this.mergeNextPage(builds || [], result.snap_builds),
+            // Refreshing the first page keeps the cursor of the pages
+            // loaded after it
+            nextCursor:
+              fromStart && hasMorePages ? nextCursor : result.next_cursor,
+            hasMorePages: hasMorePages || !fromStart,
           },
           () => {
             if (shouldUpdateQueueTime) {
@@ -129,13 +177,29 @@ class Builds extends React.Component {
       });
   }
 
+  // Refreshed builds of the first page replace the ones already shown,
+  // the older builds loaded with "Show more" are kept
+  mergeFirstPage(firstPage, builds) {
+    const ids = new Set(firstPage.map((build) => build.id));
+
+    return firstPage.concat(builds.filter((build) => !ids.has(build.id)));
+  }
+
+  // Builds already shown, e.g. pushed by the build events, aren't
+  // listed twice
+  mergeNextPage(builds, nextPage) {
+    const ids = new Set(builds.map((build) => build.id));
+
+    return builds.concat(nextPage.filter((build) => !ids.has(build.id)));
+  }
+
   triggerFetchBuilds() {
     const { updateFreq } = this.props;
 
     if (this.fetchTimer) {
       clearTimeout(this.fetchTimer);
     }
-    if (updateFreq) {
+    if (updateFreq && !this.eventSource) {
       this.fetchTimer = setTimeout(() => this.fetchBuilds(true), updateFreq);
     }
   }
@@ -176,12 +240,9 @@ class Builds extends React.Component {
   }
 
   showMoreHandler(e) {
-    const { fetchStart, fetchSize } = this.state;
     e.preventDefault();
     this.setState(
       {
-        fetchStart: fetchStart + 15,
-        fetchSize: fetchSize + 15,
         isLoading: true,
       },
       () => {
@@ -231,6 +292,7 @@ Builds.propTypes = {
   snapName: PropTypes.string,
   builds: PropTypes.array,
   totalBuilds: PropTypes.number,
+  nextCursor: PropTypes.string,
   updateFreq: PropTypes.number,
   singleBuild: PropTypes.bool,
 };
@@ -245,7 +307,8 @@ export function initBuilds(
   csrf_token,
   builds,
   totalBuilds,
-  singleBuild
+  singleBuild,
+  nextCursor
 ) {
   ReactDOM.render(
     <Builds
@@ -253,6 +316,7 @@ export function initBuilds(
       csrf_token={csrf_token}
       builds={builds}
       totalBuilds={totalBuilds}
+      nextCursor={nextCursor}
       updateFreq={singleBuild ? null : 30000}
       singleBuild={singleBuild}
     />,
@@ -12,6 +12,7 @@ import { preview } from "./preview";
 import submitEnabler from "./submitEnabler";
 import * as tour from "./tour";
 import { initBuilds } from "./builds";
+import { initBuildStatuses } from "./builds/buildStatuses";
 import { initRepoDisconnect } from "./builds/repoDisconnect";
 
 const settings = { enableInput, changeHandler };
@@ -31,5 +32,6 @@ export {
   submitEnabler,
   tour,
   initBuilds,
+  initBuildStatuses,
   initRepoDisconnect,
 };
@@ -59,45 +59,3 @@ class GitHubTest(VCRTestCase):
             "canonical-web-and-design", "snapcraft.io"
         )
         self.assertEqual(False, case2)
-
-    def test_get_snapcraft_yaml_location(self):
-        # /snapcraft.yaml is present
-        case1 = self.client.get_snapcraft_yaml_location(
-            "build-staging-snapcraft-io", "test1"
-        )
-        self.assertEqual("snapcraft.yaml", case1)
-
-        # /.snapcraft.yaml is present
-        case2 = self.client.get_snapcraft_yaml_location(
-            "build-staging-snapcraft-io", "test2"
-        )
-        self.assertEqual(".snapcraft.yaml", case2)
-
-        # /snap/snapcraft.yaml is present
-        case3 = self.client.get_snapcraft_yaml_location(
-            "build-staging-snapcraft-io", "test3"
-        )
-        self.assertEqual("snap/snapcraft.yaml", case3)
-
-        # /build-aux/snap/snapcraft.yaml is present
-        case4 = self.client.get_snapcraft_yaml_location(
-            "build-staging-snapcraft-io", "test4"
-        )
-        self.assertEqual("build-aux/snap/snapcraft.yaml", case4)
-
-        # The repo doesn't contain a valid yaml file
-        case5 = self.client.get_snapcraft_yaml_location(
-            "build-staging-snapcraft-io", "test5"
-        )
-        self.assertEqual(False, case5)
-
-    def test_get_snapcraft_yaml_name(self):
-        case1 = self.client.get_snapcraft_yaml_name(
-            "build-staging-snapcraft-io", "test1"
-        )
-        self.assertEqual("test1", case1)
-
-        case2 = self.client.get_snapcraft_yaml_name(
-            "build-staging-snapcraft-io", "test5"
-        )
-        self.assertEqual(False, case2)
@@ -0,0 +1,92 @@
+import unittest
+
+import responses
+from prometheus_client import REGISTRY
+from webapp.api.github import GitHub, conditional_cache
+
+REPO_URL = "https://api.github.com/repos/toto/snap"
+
+
+def get_default_branch(client):
+    return client._request("GET", "repos/toto/snap").json()["default_branch"]
+
+
+def get_conditional_requests(result):
+    return (
+        REGISTRY.get_sample_value(
+            "github_conditional_requests_total", {"result": result}
+        )
+        or 0
+    )
+
+
+class GitHubConditionalRequestsTest(unittest.TestCase):
+    def setUp(self):
+        conditional_cache.clear()
+        self.client = GitHub("token")
+
+    @responses.activate
+    def test_not_modified_served_from_cache(self):
+        not_modified = get_conditional_requests("not_modified")
+        responses.add(
+            responses.GET,
+            REPO_URL,
+            json={"default_branch": "main"},
+            headers={"ETag": '"abc"', "X-RateLimit-Remaining": "4999"},
+        )
+        responses.add(
+            responses.GET,
+            REPO_URL,
+            status=304,
+            headers={"ETag": '"abc"', "X-RateLimit-Remaining": "4998"},
+        )
+
+        self.assertEqual(get_default_branch(self.client), "main")
+
+        response = self.client._request("GET", "repos/toto/snap")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"default_branch": "main"})
+        self.assertEqual(response.headers["X-RateLimit-Remaining"], "4998")
+
+        self.assertEqual(
+            responses.calls[1].request.headers["If-None-Match"], '"abc"'
+        )
+        self.assertEqual(
+            get_conditional_requests("not_modified"), not_modified + 1
+        )
+
+    @responses.activate
+    def test_cache_per_token(self):
+        responses.add(
+            responses.GET,
+            REPO_URL,
+            json={"default_branch": "main"},
+            headers={"ETag": '"abc"'},
+        )
+
+        get_default_branch(self.client)
+        get_default_branch(GitHub("other-token"))
+
+        self.assertNotIn("If-None-Match", responses.calls[1].request.headers)
+
+    @responses.activate
+    def test_modified_replaces_cache(self):
+        responses.add(
+            responses.GET,
+            REPO_URL,
+            json={"default_branch": "main"},
+            headers={"Last-Modified": "Mon, 01 Jun 2020 00:00:00 GMT"},
+        )
+        responses.add(
+            responses.GET,
+            REPO_URL,
+            json={"default_branch": "develop"},
+            headers={"Last-Modified": "Tue, 02 Jun 2020 00:00:00 GMT"},
+        )
+
+        get_default_branch(self.client)
+        self.assertEqual(get_default_branch(self.client), "develop")
+        self.assertEqual(
+            responses.calls[1].request.headers["If-Modified-Since"],
+            "Mon, 01 Jun 2020 00:00:00 GMT",
+        )
@@ -0,0 +1,88 @@
+import json
+import unittest
+
+import responses
+from webapp.api.github import GitHub, conditional_cache, listings_cache
+
+GRAPHQL_URL = "https://api.github.com/graphql"
+
+
+def repositories_page(names, end_cursor=None):
+    return {
+        "data": {
+            "viewer": {
+                "repositories": {
+                    "edges": [
+                        {"node": {"name": name, "nameWithOwner": name}}
+                        for name in names
+                    ],
+                    "pageInfo": {
+                        "hasNextPage": bool(end_cursor),
+                        "endCursor": end_cursor,
+                    },
+                }
+            }
+        }
+    }
+
+
+class GitHubPaginationTest(unittest.TestCase):
+    def setUp(self):
+        conditional_cache.clear()
+        listings_cache.clear()
+        self.client = GitHub("token")
+
+    @responses.activate
+    def test_iter_user_repositories(self):
+        responses.add(
+            responses.POST,
+            GRAPHQL_URL,
+            json=repositories_page(["a", "b"], end_cursor="cursor"),
+        )
+        responses.add(
+            responses.POST, GRAPHQL_URL, json=repositories_page(["c"])
+        )
+
+        pages = list(self.client.iter_user_repositories())
+
+        self.assertEqual(
+            [[repo["name"] for repo in page] for page in pages],
+            [["a", "b"], ["c"]],
+        )
+        query = json.loads(responses.calls[1].request.body)["query"]
+        self.assertIn('after: "cursor"', query)
+
+    @responses.activate
+    def test_get_user_repositories_cached(self):
+        responses.add(
+            responses.POST, GRAPHQL_URL, json=repositories_page(["a"])
+        )
+
+        self.client.get_user_repositories()
+        repositories = self.client.get_user_repositories()
+
+        self.assertEqual(repositories, [{"name": "a", "nameWithOwner": "a"}])
+        self.assertEqual(len(responses.calls), 1)
+        self.assertEqual(self.client.get_cached_repositories(), repositories)
+        self.assertIsNone(GitHub("other").get_cached_repositories())
+
+    @responses.activate
+    def test_get_hooks(self):
+        hooks_url = "https://api.github.com/repos/toto/snap/hooks"
+        responses.add(
+            responses.GET,
+            f"{hooks_url}?per_page=100&page=1",
+            json=[{"id": 1}],
+            headers={"Link": f'<{hooks_url}?page=2>; rel="next"'},
+            match_querystring=True,
+        )
+        responses.add(
+            responses.GET,
+            f"{hooks_url}?per_page=100&page=2",
+            json=[{"id": 2}],
+            match_querystring=True,
+        )
+
+        hooks = self.client.get_hooks("toto", "snap")
+
+        self.assertEqual(hooks, [{"id": 1}, {"id": 2}])
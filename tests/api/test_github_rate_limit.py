@@ -0,0 +1,166 @@
+import time
+import unittest
+from unittest.mock import patch
+
+import responses
+from prometheus_client import REGISTRY
+from webapp.api import github
+from webapp.api.github import (
+    GitHub,
+    RateLimitBudget,
+    RateLimitExceeded,
+    conditional_cache,
+    get_rate_limit_budget,
+    rate_limit_budgets,
+)
+
+REPO_URL = "https://api.github.com/repos/toto/snap"
+
+
+def get_default_branch(client):
+    return client._request("GET", "repos/toto/snap").json()["default_branch"]
+
+
+def rate_limit_headers(remaining, limit=5000):
+    return {
+        "X-RateLimit-Limit": str(limit),
+        "X-RateLimit-Remaining": str(remaining),
+        "X-RateLimit-Reset": str(int(time.time()) + 3600),
+    }
+
+
+class RateLimitBudgetTest(unittest.TestCase):
+    def test_reserve_kept_for_critical_requests(self):
+        budget = RateLimitBudget()
+        self.assertTrue(budget.acquire())
+
+        budget.update(rate_limit_headers(1001))
+        self.assertTrue(budget.acquire())
+        self.assertEqual(budget.remaining, 1000)
+        self.assertFalse(budget.acquire())
+        self.assertTrue(budget.acquire(critical=True))
+
+        budget.update(rate_limit_headers(0))
+        self.assertFalse(budget.acquire(critical=True))
+
+    def test_refilled_after_reset(self):
+        budget = RateLimitBudget()
+        budget.update(
+            {
+                "X-RateLimit-Limit": "5000",
+                "X-RateLimit-Remaining": "0",
+                "X-RateLimit-Reset": str(int(time.time()) - 1),
+            }
+        )
+
+        self.assertTrue(budget.acquire())
+
+    def test_budgets_kept(self):
+        rate_limit_budgets.clear()
+        budget = get_rate_limit_budget("core")
+        budget.update(rate_limit_headers(0))
+
+        for index in range(32):
+            get_rate_limit_budget(f"resource-{index}")
+
+        self.assertIs(get_rate_limit_budget("core"), budget)
+        self.assertFalse(budget.acquire(critical=True))
+        self.assertIsNone(
+            REGISTRY.get_sample_value(
+                "cache_misses_total", {"cache": "github_rate_limits"}
+            )
+        )
+
+
+class GitHubRateLimitTest(unittest.TestCase):
+    def setUp(self):
+        conditional_cache.clear()
+        rate_limit_budgets.clear()
+
+        patcher = patch.object(github, "GITHUB_SNAPCRAFT_USER_TOKEN", "token")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @responses.activate
+    def test_low_budget_served_from_cache(self):
+        responses.add(
+            responses.GET,
+            REPO_URL,
+            json={"default_branch": "main"},
+            headers={"ETag": '"abc"', **rate_limit_headers(100)},
+        )
+        client = GitHub("token")
+
+        self.assertEqual(get_default_branch(client), "main")
+        self.assertEqual(get_default_branch(client), "main")
+        self.assertEqual(len(responses.calls), 1)
+
+        with self.assertRaises(RateLimitExceeded):
+            client.check_if_repo_exists("toto", "other")
+
+    @responses.activate
+    def test_critical_requests_sent(self):
+        responses.add(
+            responses.GET,
+            REPO_URL,
+            json={"default_branch": "main"},
+            headers=rate_limit_headers(100),
+        )
+
+        get_default_branch(GitHub("token"))
+        get_default_branch(GitHub("token", critical=True))
+
+        self.assertEqual(len(responses.calls), 2)
+
+    @responses.activate
+    def test_user_tokens_not_limited(self):
+        responses.add(
+            responses.GET,
+            REPO_URL,
+            json={"default_branch": "main"},
+            headers=rate_limit_headers(100),
+        )
+
+        get_default_branch(GitHub("user-token"))
+        get_default_branch(GitHub("user-token"))
+
+        self.assertEqual(len(responses.calls), 2)
+
+    @responses.activate
+    def test_writes_not_limited(self):
+        responses.add(
+            responses.GET,
+            REPO_URL,
+            json={"default_branch": "main"},
+            headers=rate_limit_headers(100),
+        )
+        responses.add(
+            responses.DELETE,
+            f"{REPO_URL}/hooks/1",
+            status=204,
+            headers=rate_limit_headers(99),
+        )
+        client = GitHub("token")
+
+        get_default_branch(client)
+        client.remove_hook("toto", "snap", 1)
+
+        self.assertEqual(len(responses.calls), 2)
+
+    @responses.activate
+    def test_remaining_metric(self):
+        responses.add(
+            responses.GET,
+            REPO_URL,
+            json={"default_branch": "main"},
+            headers=rate_limit_headers(4321),
+        )
+
+        get_default_branch(GitHub("token"))
+
+        self.assertEqual(
+            REGISTRY.get_sample_value(
+                "github_rate_limit_remaining", {"resource": "core"}
+            ),
+            4321,
+        )
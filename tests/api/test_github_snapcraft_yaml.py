@@ -0,0 +1,132 @@
+import json
+import unittest
+
+import responses
+from webapp.api.github import (
+    GitHub,
+    InvalidYAML,
+    conditional_cache,
+    parse_snapcraft_yaml_name,
+    snapcraft_yaml_cache,
+)
+
+REPO_URL = "https://api.github.com/repos/toto/snap"
+SHA = "d6cd1e2bd19e03a81132a23b2025920577f84e37"
+
+
+class GetSnapcraftYamlTest(unittest.TestCase):
+    def setUp(self):
+        conditional_cache.clear()
+        snapcraft_yaml_cache.clear()
+
+        responses.start()
+        self.addCleanup(responses.stop)
+        self.addCleanup(responses.reset)
+
+        responses.add(
+            responses.GET,
+            f"{REPO_URL}/commits/HEAD",
+            json={"sha": SHA},
+            headers={"ETag": '"head"'},
+        )
+
+    def test_graphql_probe(self):
+        responses.add(
+            responses.POST,
+            "https://api.github.com/graphql",
+            json={
+                "data": {
+                    "repository": {
+                        "location0": None,
+                        "location1": None,
+                        "location2": {"text": "name: toto\n"},
+                        "location3": None,
+                    }
+                }
+            },
+        )
+
+        snapcraft_yaml = GitHub("token").get_snapcraft_yaml("toto", "snap")
+
+        self.assertEqual(
+            snapcraft_yaml,
+            {
+                "sha": SHA,
+                "location": "snap/snapcraft.yaml",
+                "content": "name: toto\n",
+            },
+        )
+        self.assertEqual(len(responses.calls), 2)
+
+        query = json.loads(responses.calls[1].request.body)["query"]
+        self.assertIn(f'"{SHA}:snap/snapcraft.yaml"', query)
+
+    def test_tree_probe(self):
+        responses.add(
+            responses.GET,
+            f"{REPO_URL}/git/trees/{SHA}?recursive=1",
+            json={
+                "tree": [
+                    {"path": "README.md"},
+                    {"path": "build-aux/snap/snapcraft.yaml"},
+                ],
+                "truncated": False,
+            },
+            match_querystring=True,
+        )
+        responses.add(
+            responses.GET,
+            "https://raw.githubusercontent.com/toto/snap/"
+            f"{SHA}/build-aux/snap/snapcraft.yaml",
+            body="name: toto\n",
+        )
+
+        snapcraft_yaml = GitHub().get_snapcraft_yaml("toto", "snap")
+
+        self.assertEqual(
+            snapcraft_yaml["location"], "build-aux/snap/snapcraft.yaml"
+        )
+        self.assertEqual(snapcraft_yaml["content"], "name: toto\n")
+
+    def test_probe_cached_by_sha(self):
+        responses.add(
+            responses.GET,
+            f"{REPO_URL}/git/trees/{SHA}?recursive=1",
+            json={"tree": [], "truncated": False},
+            match_querystring=True,
+        )
+
+        github = GitHub()
+        snapcraft_yaml = github.get_snapcraft_yaml("toto", "snap")
+        self.assertIsNone(snapcraft_yaml["location"])
+
+        github.get_snapcraft_yaml("toto", "snap")
+        self.assertEqual(
+            [call.request.url.split("?")[0] for call in responses.calls],
+            [
+                f"{REPO_URL}/commits/HEAD",
+                f"{REPO_URL}/git/trees/{SHA}",
+                f"{REPO_URL}/commits/HEAD",
+            ],
+        )
+
+    def test_empty_repo(self):
+        responses.replace(
+            responses.GET, f"{REPO_URL}/commits/HEAD", status=409
+        )
+
+        snapcraft_yaml = GitHub().get_snapcraft_yaml("toto", "snap")
+
+        self.assertIsNone(snapcraft_yaml["location"])
+
+
+class ParseSnapcraftYamlNameTest(unittest.TestCase):
+    def test_name(self):
+        self.assertEqual(parse_snapcraft_yaml_name("name: toto"), "toto")
+
+    def test_invalid(self):
+        with self.assertRaises(InvalidYAML):
+            parse_snapcraft_yaml_name("name: [toto")
+
+        with self.assertRaises(InvalidYAML):
+            parse_snapcraft_yaml_name("")
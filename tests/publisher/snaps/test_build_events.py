@@ -0,0 +1,69 @@
+import unittest
+from unittest.mock import Mock
+
+from webapp.publisher.snaps import build_events
+
+
+class BuildPollersTest(unittest.TestCase):
+    def setUp(self):
+        self.fetch_builds = Mock(
+            return_value=[{"id": "1", "status": "in_progress"}]
+        )
+        self.pollers = build_events.BuildPollers(self.fetch_builds)
+        self.poller = build_events.BuildPoller("toto")
+
+    def test_first_poll_pushes_all_builds(self):
+        subscription = build_events.Subscription("toto")
+        self.poller.subscribers.add(subscription)
+
+        self.pollers._poll(self.poller)
+
+        self.assertEqual(
+            subscription.get(0), {"id": "1", "status": "in_progress"}
+        )
+        self.assertIsNone(subscription.get(0))
+
+    def test_only_transitions_pushed(self):
+        subscriptions = [build_events.Subscription("toto") for _ in range(3)]
+        self.poller.subscribers.update(subscriptions)
+
+        self.poller.publish(
+            [
+                {"id": "1", "status": "in_progress"},
+                {"id": "2", "status": "released"},
+            ]
+        )
+        for subscription in subscriptions:
+            subscription.get(0)
+            subscription.get(0)
+
+        self.poller.publish(
+            [
+                {"id": "3", "status": "building_soon"},
+                {"id": "1", "status": "releasing_soon"},
+                {"id": "2", "status": "released"},
+            ]
+        )
+
+        for subscription in subscriptions:
+            self.assertEqual(subscription.get(0)["id"], "3")
+            self.assertEqual(subscription.get(0)["id"], "1")
+            self.assertIsNone(subscription.get(0))
+
+    def test_polls_shared(self):
+        self.pollers._poll(self.poller)
+        self.pollers._poll(build_events.BuildPoller("toto"))
+
+        self.fetch_builds.assert_called_once_with("toto")
+
+    def test_stream(self):
+        stream = self.pollers.stream("toto", max_duration=5)
+
+        self.assertEqual(next(stream), "retry: 5000\n\n")
+        self.assertEqual(
+            next(stream),
+            'event: build\ndata: {"id": "1", "status": "in_progress"}\n\n',
+        )
+
+        stream.close()
+        self.assertEqual(self.pollers.pollers["toto"].subscribers, set())
@@ -0,0 +1,81 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import responses
+from webapp.publisher.snaps import build_logs
+
+LOG_URL = "https://launchpad.net/buildlog.txt.gz"
+
+
+class BuildLogsTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_is_log_complete(self):
+        self.assertTrue(
+            build_logs.is_log_complete(
+                {"build_log_url": LOG_URL, "buildstate": "Failed to build"}
+            )
+        )
+        self.assertFalse(
+            build_logs.is_log_complete(
+                {"build_log_url": LOG_URL, "buildstate": "Currently building"}
+            )
+        )
+        self.assertFalse(
+            build_logs.is_log_complete(
+                {"build_log_url": None, "buildstate": "Failed to build"}
+            )
+        )
+
+    @responses.activate
+    @patch.object(build_logs, "CHUNK_SIZE", 4)
+    def test_iter_log_offset(self):
+        responses.add(responses.GET, LOG_URL, body="0123456789")
+
+        self.assertEqual(
+            b"".join(build_logs.iter_log(LOG_URL, start=6)), b"6789"
+        )
+
+    @responses.activate
+    def test_iter_log_range(self):
+        responses.add(responses.GET, LOG_URL, body="6789", status=206)
+
+        self.assertEqual(
+            b"".join(build_logs.iter_log(LOG_URL, start=6)), b"6789"
+        )
+        self.assertEqual(
+            responses.calls[0].request.headers["Range"], "bytes=6-"
+        )
+
+    @responses.activate
+    def test_iter_log_nothing_new(self):
+        responses.add(responses.GET, LOG_URL, status=416)
+
+        self.assertEqual(b"".join(build_logs.iter_log(LOG_URL, start=10)), b"")
+
+    @responses.activate
+    def test_iter_and_cache_log(self):
+        responses.add(responses.GET, LOG_URL, body="build log")
+        path = build_logs.get_log_path("42", self.directory)
+
+        chunks = build_logs.iter_and_cache_log(LOG_URL, path)
+        self.assertFalse(os.path.exists(path))
+
+        self.assertEqual(b"".join(chunks), b"build log")
+        self.assertEqual(b"".join(build_logs.iter_file(path, 6)), b"log")
+
+    @responses.activate
+    def test_interrupted_log_not_cached(self):
+        responses.add(responses.GET, LOG_URL, body="build log")
+        path = build_logs.get_log_path("42", self.directory)
+
+        chunks = build_logs.iter_and_cache_log(LOG_URL, path)
+        next(chunks)
+        chunks.close()
+
+        self.assertEqual(os.listdir(self.directory), [])
@@ -0,0 +1,211 @@
+import hmac
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+from hashlib import sha1
+from unittest.mock import Mock, patch
+
+from flask_testing import TestCase
+from webapp.app import create_app
+from webapp.publisher.snaps import build_queue, build_views
+
+
+class BuildQueueTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+
+        self.run_job = Mock()
+        self.queue = build_queue.BuildQueue(
+            self.run_job,
+            path=os.path.join(directory.name, "queue.sqlite"),
+            debounce_window=0,
+        )
+        # Jobs are claimed by the tests
+        self.queue.start = Mock()
+
+    def claim(self, limit=10):
+        return [job[:4] for job in self.queue.claim(limit)]
+
+    def test_pushes_coalesced(self):
+        self.queue.enqueue("toto", "owner", "repo")
+        self.queue.enqueue("toto", "owner", "renamed-repo")
+        self.queue.enqueue("other", "owner", "other")
+
+        self.assertEqual(
+            self.claim(),
+            [
+                ("toto", "owner", "renamed-repo", 0),
+                ("other", "owner", "other", 0),
+            ],
+        )
+        self.assertEqual(self.claim(), [])
+
+    def test_debounce_window(self):
+        self.queue.debounce_window = 60
+        self.queue.enqueue("toto", "owner", "repo")
+
+        self.assertEqual(self.queue.claim(10), [])
+
+    def test_max_debounce(self):
+        self.queue.debounce_window = 60
+        self.queue.max_debounce = 0
+        self.queue.enqueue("toto", "owner", "repo")
+        time.sleep(0.01)
+        self.queue.enqueue("toto", "owner", "repo")
+
+        self.assertEqual(len(self.queue.claim(10)), 1)
+
+    def test_claim_limit(self):
+        for snap_name in ["a", "b", "c"]:
+            self.queue.enqueue(snap_name, "owner", snap_name)
+
+        self.assertEqual(len(self.queue.claim(2)), 2)
+        self.assertEqual(len(self.queue.claim(2)), 1)
+
+    def test_job_removed_once_run(self):
+        self.queue.enqueue("toto", "owner", "repo")
+        self.queue.running = 1
+
+        [job] = self.queue.claim(10)
+        self.queue._execute(*job)
+
+        self.run_job.assert_called_once_with("toto", "owner", "repo")
+        self.assertEqual(self.queue.running, 0)
+
+        with patch.object(build_queue, "LEASE", -1):
+            self.assertEqual(self.claim(), [])
+
+    def test_expired_lease_claimed_again(self):
+        self.queue.enqueue("toto", "owner", "repo")
+
+        with patch.object(build_queue, "LEASE", -1):
+            self.assertEqual(len(self.queue.claim(10)), 1)
+
+        # The worker was recycled before running the job
+        self.assertEqual(self.claim(), [("toto", "owner", "repo", 0)])
+
+    def test_push_while_running(self):
+        self.queue.enqueue("toto", "owner", "repo")
+        [job] = self.queue.claim(10)
+        self.queue.running = 1
+
+        self.queue.enqueue("toto", "owner", "repo")
+        self.queue._execute(*job)
+
+        self.assertEqual(self.claim(), [("toto", "owner", "repo", 0)])
+
+    @patch.object(build_queue, "RETRY_DELAY", 0)
+    def test_failed_job_retried(self):
+        self.run_job.side_effect = Exception("Launchpad is down")
+        self.queue.enqueue("toto", "owner", "repo")
+        self.queue.running = 2
+
+        [job] = self.queue.claim(10)
+        self.queue._execute(*job)
+
+        self.run_job.assert_called_once_with("toto", "owner", "repo")
+        self.assertEqual(self.queue.running, 1)
+
+        [job] = self.queue.claim(10)
+        self.assertEqual(job[:4], ("toto", "owner", "repo", 1))
+
+        # The last attempt failed
+        self.queue._execute("toto", "owner", "repo", 2, job[4])
+
+        with patch.object(build_queue, "LEASE", -1):
+            self.assertEqual(self.claim(), [])
+
+    def test_empty_queue_not_locked(self):
+        self.queue.debounce_window = 60
+        self.queue.enqueue("toto", "owner", "repo")
+        connection = self.queue._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        self.addCleanup(connection.close)
+
+        with patch.object(build_queue, "WRITE_ATTEMPTS", 1):
+            self.assertEqual(self.queue.claim(10), [])
+
+    def test_locked_database(self):
+        self.queue.enqueue("toto", "owner", "repo")
+        connection = self.queue._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        self.addCleanup(connection.close)
+
+        with patch.object(build_queue, "WRITE_ATTEMPTS", 2):
+            with self.assertRaises(sqlite3.OperationalError):
+                self.queue.enqueue("toto", "owner", "repo")
+
+            with self.assertRaises(sqlite3.OperationalError):
+                self.queue.claim(10)
+
+
+class WebhookTest(TestCase):
+    render_templates = False
+
+    def create_app(self):
+        return create_app(testing=True)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+
+        self.queue = build_queue.BuildQueue(
+            Mock(), path=os.path.join(directory.name, "queue.sqlite")
+        )
+        self.queue.start = Mock()
+
+        for target, attribute, value in [
+            (build_views, "build_queue", self.queue),
+            (build_views, "launchpad", Mock()),
+            ("webapp.api.github.GITHUB_WEBHOOK_SECRET", None, "secret"),
+        ]:
+            if attribute:
+                patcher = patch.object(target, attribute, value)
+            else:
+                patcher = patch(target, value)
+
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        build_views.launchpad.get_snap_by_store_name.return_value = {
+            "store_name": "toto",
+            "git_repository_url": "https://github.com/owner/repo",
+        }
+
+    def test_push_queued(self):
+        payload = json.dumps(
+            {
+                "ref": "refs/heads/main",
+                "repository": {
+                    "html_url": "https://github.com/owner/repo",
+                    "owner": {"login": "owner"},
+                    "name": "repo",
+                    "default_branch": "main",
+                },
+            }
+        ).encode()
+        signature = hmac.new(b"secret", payload, sha1).hexdigest()
+
+        response = self.client.post(
+            "/toto/webhook/notify",
+            data=payload,
+            content_type="application/json",
+            headers={"X-Hub-Signature": f"sha1={signature}"},
+        )
+
+        self.assertStatus(response, 202)
+        self.queue.start.assert_called_once_with()
+
+        connection = self.queue._connect()
+        self.addCleanup(connection.close)
+        self.assertEqual(
+            connection.execute(
+                "SELECT snap_name, gh_owner, gh_repo, attempts, "
+                "claimed_until FROM build_jobs"
+            ).fetchall(),
+            [("toto", "owner", "repo", 0, None)],
+        )
@@ -1,7 +1,11 @@
+import threading
 import unittest
+from unittest.mock import Mock
 
-
-from webapp.publisher.snaps.builds import map_build_and_upload_states
+from webapp.publisher.snaps.builds import (
+    get_snap_build_statuses,
+    map_build_and_upload_states,
+)
 
 
 class TestBuildStateMapper(unittest.TestCase):
@@ -115,3 +119,41 @@ class TestBuildStateMapper(unittest.TestCase):
         for build_state, upload_state, expected in combinations:
             result = map_build_and_upload_states(build_state, upload_state)
             self.assertEqual(result, expected)
+
+
+class TestSnapBuildStatuses(unittest.TestCase):
+    def test_partial_results(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def get_snap_build_status(snap_name):
+            if snap_name == "slow":
+                release.wait(5)
+            elif snap_name == "error":
+                raise Exception("error")
+
+            return {
+                "amd64": {
+                    "buildstate": "Successfully built",
+                    "store_upload_status": "Uploaded",
+                }
+            }
+
+        launchpad = Mock()
+        launchpad.get_snap_build_status.side_effect = get_snap_build_status
+
+        statuses = list(
+            get_snap_build_statuses(
+                launchpad, ["slow", "error", "toto"], timeout=0.1
+            )
+        )
+
+        self.assertEqual(
+            sorted(statuses, key=lambda snap_status: snap_status["name"]),
+            [
+                {"name": "error", "status": "unknown"},
+                {"name": "slow", "status": "unknown"},
+                {"name": "toto", "status": "released"},
+            ],
+        )
+        self.assertEqual(statuses[-1]["name"], "slow")
@@ -0,0 +1,119 @@
+import unittest
+from unittest.mock import Mock, patch
+
+from webapp.publisher.snaps import build_views
+
+
+def lp_build(build_id, datecreated, buildstate="Successfully built"):
+    return {
+        "self_link": f"https://api.launchpad.net/devel/builds/{build_id}",
+        "arch_tag": "amd64",
+        "datebuilt": None,
+        "datecreated": datecreated,
+        "duration": None,
+        "build_log_url": None,
+        "revision_id": None,
+        "buildstate": buildstate,
+        "store_upload_status": "Uploaded",
+        "title": "build",
+    }
+
+
+class GetBuildsTest(unittest.TestCase):
+    def setUp(self):
+        self.lp_snap = {
+            "store_name": "toto",
+            "pending_builds_collection_link": "pending",
+            "completed_builds_collection_link": "completed",
+        }
+        self.completed = [
+            lp_build(index, f"2020-01-{20 - index:02}")
+            for index in range(1, 11)
+        ]
+
+        def request(url, params):
+            start, size = params["ws.start"], params["ws.size"]
+            end = start + size
+
+            return Mock(
+                json=Mock(
+                    return_value={
+                        "entries": self.completed[start:end],
+                        "total_size": len(self.completed),
+                    }
+                )
+            )
+
+        patcher = patch.object(build_views, "launchpad")
+        self.launchpad = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.launchpad.get_collection_entries.return_value = [
+            lp_build(0, "2020-01-20", "Currently building")
+        ]
+        self.launchpad.request.side_effect = request
+
+    def test_first_page(self):
+        result = build_views.get_builds(self.lp_snap, 0, 4)
+
+        self.assertEqual(
+            [build["id"] for build in result["snap_builds"]],
+            ["0", "1", "2", "3"],
+        )
+        self.assertEqual(result["total_builds"], 11)
+        self.assertEqual(
+            build_views.decode_builds_cursor(result["next_cursor"]),
+            (4, ("2020-01-17", 3)),
+        )
+        self.launchpad.request.assert_called_once_with(
+            "completed", params={"ws.start": 0, "ws.size": 3}
+        )
+
+    def test_next_pages(self):
+        result = build_views.get_builds(self.lp_snap, 4, 4)
+
+        self.assertEqual(
+            [build["id"] for build in result["snap_builds"]],
+            ["4", "5", "6", "7"],
+        )
+        self.launchpad.request.assert_called_once_with(
+            "completed", params={"ws.start": 3, "ws.size": 4}
+        )
+
+        result = build_views.get_builds(self.lp_snap, 8, 4)
+
+        self.assertEqual(
+            [build["id"] for build in result["snap_builds"]],
+            ["8", "9", "10"],
+        )
+        self.assertIsNone(result["next_cursor"])
+
+    def test_builds_created_since_the_cursor(self):
+        result = build_views.get_builds(self.lp_snap, 0, 4)
+        start, after = build_views.decode_builds_cursor(result["next_cursor"])
+
+        # Two builds were created since the first page
+        self.completed = [
+            lp_build(12, "2020-01-21"),
+            lp_build(11, "2020-01-20"),
+        ] + self.completed
+
+        result = build_views.get_builds(self.lp_snap, start, 4, after)
+
+        self.assertEqual(
+            [build["id"] for build in result["snap_builds"]],
+            ["4", "5", "6", "7"],
+        )
+        self.assertEqual(
+            build_views.decode_builds_cursor(result["next_cursor"]),
+            (10, ("2020-01-13", 7)),
+        )
+
+    def test_invalid_cursor(self):
+        self.assertIsNone(build_views.decode_builds_cursor("invalid!"))
+        self.assertIsNone(build_views.decode_builds_cursor("LTE="))
+        self.assertIsNone(
+            build_views.decode_builds_cursor(
+                build_views.encode_builds_cursor(-1, lp_build(1, "2020"))
+            )
+        )
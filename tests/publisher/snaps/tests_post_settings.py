@@ -3,6 +3,7 @@ import json
 
 import responses
 from tests.publisher.endpoint_testing import BaseTestCases
+from webapp.helpers import launchpad
 
 
 LP_API_USERNAME = os.getenv("LP_API_USERNAME")
@@ -22,6 +23,10 @@ class PostSettingsPageNotAuth(BaseTestCases.EndpointLoggedOut):
 
 class PostMetadataSettingsPage(BaseTestCases.EndpointLoggedIn):
     def setUp(self):
+        # The Launchpad responses are mocked differently by each test
+        launchpad.clear_cache()
+        self.addCleanup(launchpad.clear_cache)
+
         self.snap_id = "complexId"
 
         snap_name = "test-snap"
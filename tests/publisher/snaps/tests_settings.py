@@ -2,6 +2,7 @@ import os
 
 import responses
 from tests.publisher.endpoint_testing import BaseTestCases
+from webapp.helpers import launchpad
 
 
 LP_API_USERNAME = os.getenv("LP_API_USERNAME")
@@ -17,6 +18,10 @@ class SettingsPageNotAuth(BaseTestCases.EndpointLoggedOut):
 
 class GetSettingsPage(BaseTestCases.EndpointLoggedInErrorHandling):
     def setUp(self):
+        # The Launchpad responses are mocked differently by each test
+        launchpad.clear_cache()
+        self.addCleanup(launchpad.clear_cache)
+
         snap_name = "test-snap"
 
         api_url = "https://dashboard.snapcraft.io/dev/api/snaps/info/{}"
@@ -0,0 +1,153 @@
+import json
+import time
+from unittest.mock import patch
+
+import responses
+from tests.api.test_github_pagination import repositories_page
+from tests.publisher.endpoint_testing import BaseTestCases
+from webapp.api.github import listings_cache
+
+GRAPHQL_URL = "https://api.github.com/graphql"
+
+
+class StreamReposTest(BaseTestCases.BaseAppTesting):
+    def setUp(self):
+        super().setUp(
+            snap_name=None,
+            api_url=GRAPHQL_URL,
+            endpoint_url="/publisher/github/get-repos.ndjson",
+        )
+        listings_cache.clear()
+
+    def _log_in(self, client):
+        authorization = super()._log_in(client)
+
+        with client.session_transaction() as s:
+            s["github_auth_secret"] = "token"
+
+        return authorization
+
+    @responses.activate
+    def test_repos_streamed(self):
+        self._log_in(self.client)
+        responses.add(
+            responses.POST,
+            GRAPHQL_URL,
+            json=repositories_page(["a", "b"], end_cursor="cursor"),
+        )
+        responses.add(
+            responses.POST, GRAPHQL_URL, json=repositories_page(["c"])
+        )
+
+        response = self.client.get(self.endpoint_url)
+
+        self.assert200(response)
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        lines = [
+            json.loads(line)
+            for line in response.get_data(as_text=True).splitlines()
+        ]
+        self.assertEqual(
+            [repo["name"] for repo in lines[:-1]], ["a", "b", "c"]
+        )
+        self.assertEqual(lines[-1], {"done": True})
+
+        # The next listings are served from the cache
+        response = self.client.get(self.endpoint_url)
+        self.assertEqual(len(response.get_data(as_text=True).splitlines()), 4)
+        self.assertEqual(len(responses.calls), 2)
+
+    @responses.activate
+    def test_interrupted_listing(self):
+        self._log_in(self.client)
+        responses.add(
+            responses.POST,
+            GRAPHQL_URL,
+            json=repositories_page(["a", "b"], end_cursor="cursor"),
+        )
+        responses.add(responses.POST, GRAPHQL_URL, status=502)
+
+        response = self.client.get(self.endpoint_url)
+
+        self.assert200(response)
+        lines = [
+            json.loads(line)
+            for line in response.get_data(as_text=True).splitlines()
+        ]
+        self.assertEqual([repo["name"] for repo in lines[:-1]], ["a", "b"])
+        self.assertIn("error", lines[-1])
+
+        # The partial listing isn't cached
+        self.assertEqual(len(listings_cache), 0)
+
+    @responses.activate
+    def test_first_page_error(self):
+        self._log_in(self.client)
+        responses.add(responses.POST, GRAPHQL_URL, status=502)
+
+        response = self.client.get(self.endpoint_url)
+
+        self.assertStatus(response, 502)
+        self.assertEqual(
+            response.json,
+            {"error": "The repositories could not be fetched from GitHub"},
+        )
+        self.assertEqual(len(listings_cache), 0)
+
+    @responses.activate
+    def test_pages_get_their_own_deadline(self):
+        self._log_in(self.client)
+        responses.add(
+            responses.POST,
+            GRAPHQL_URL,
+            json=repositories_page(["a"], end_cursor="cursor"),
+        )
+        responses.add(
+            responses.POST, GRAPHQL_URL, json=repositories_page(["b"])
+        )
+
+        with patch(
+            "webapp.publisher.github.views.set_request_deadline"
+        ) as set_request_deadline:
+            response = self.client.get(self.endpoint_url)
+            response.get_data()
+
+        set_request_deadline.assert_called_with(
+            self.app.config["API_DEADLINES"]["github"]
+        )
+        self.assertEqual(set_request_deadline.call_count, 2)
+
+    @responses.activate
+    def test_user_token_not_limited(self):
+        self._log_in(self.client)
+        responses.add(
+            responses.POST,
+            GRAPHQL_URL,
+            json=repositories_page(["a"]),
+            headers={
+                "X-RateLimit-Limit": "5000",
+                "X-RateLimit-Remaining": "100",
+                "X-RateLimit-Reset": str(int(time.time()) + 3600),
+            },
+        )
+
+        for _ in range(2):
+            listings_cache.clear()
+            response = self.client.get(self.endpoint_url)
+
+            self.assert200(response)
+            self.assertEqual(
+                json.loads(response.get_data(as_text=True).splitlines()[0]),
+                {"name": "a", "nameWithOwner": "a"},
+            )
+
+        self.assertEqual(len(responses.calls), 2)
+
+    @responses.activate
+    def test_unauthorized(self):
+        self._log_in(self.client)
+        responses.add(responses.POST, GRAPHQL_URL, status=401)
+
+        response = self.client.get(self.endpoint_url)
+
+        self.assertStatus(response, 401)
@@ -0,0 +1,147 @@
+import re
+import time
+from unittest.mock import Mock, patch
+
+import flask
+import requests
+import responses
+from flask_testing import TestCase
+from webapp.api.exceptions import ApiCircuitBreaker
+from webapp.app import create_app
+from webapp.cache import Cache
+from webapp.store import degraded
+
+
+class CallOrLastGoodTest(TestCase):
+    def create_app(self):
+        return flask.Flask(__name__)
+
+    def test_last_good_served(self):
+        last_good = Cache("test_last_good", ttl=None)
+        func = Mock(return_value="good")
+
+        value = degraded.call_or_last_good(last_good, "key", func)
+        self.assertEqual(value, "good")
+        self.assertFalse(degraded.is_degraded())
+
+        func.side_effect = ApiCircuitBreaker("open")
+        value = degraded.call_or_last_good(last_good, "key", func)
+        self.assertEqual(value, "good")
+        self.assertTrue(degraded.is_degraded())
+
+    def test_no_last_good(self):
+        last_good = Cache("test_last_good", ttl=None)
+        func = Mock(side_effect=ApiCircuitBreaker("open"))
+
+        with self.assertRaises(ApiCircuitBreaker):
+            degraded.call_or_last_good(last_good, "key", func)
+
+
+class DegradedViewTest(TestCase):
+    render_templates = False
+
+    def create_app(self):
+        app = create_app(testing=True)
+        app.secret_key = "secret_key"
+
+        return app
+
+    @responses.activate
+    def test_featured_snaps_degraded(self):
+        category_url = re.compile(r"https://api\.snapcraft\.io/.*")
+        payload = {
+            "_embedded": {
+                "clickindex:package": [
+                    {"package_name": "toto", "media": []},
+                ]
+            }
+        }
+
+        responses.add(responses.GET, category_url, json=payload)
+        response = self.client.get("/store/featured-snaps/development")
+        self.assert200(response)
+        self.assertNotIn(degraded.DEGRADED_HEADER, response.headers)
+
+        responses.replace(
+            responses.GET, category_url, body=requests.exceptions.Timeout()
+        )
+        degraded_response = self.client.get(
+            "/store/featured-snaps/development"
+        )
+        self.assert200(degraded_response)
+        self.assertEqual(degraded_response.json, response.json)
+        self.assertEqual(
+            degraded_response.headers[degraded.DEGRADED_HEADER],
+            "stale-if-error",
+        )
+
+    @responses.activate
+    def test_snap_details_degraded(self):
+        details_url = re.compile(
+            r"https://api\.snapcraft\.io/v2/snaps/info/toto.*"
+        )
+        payload = {
+            "snap-id": "id",
+            "name": "toto",
+            "default-track": None,
+            "snap": {
+                "title": "Snap Title",
+                "summary": "This is a summary",
+                "description": "this is a description",
+                "media": [],
+                "license": "license",
+                "prices": 0,
+                "publisher": {
+                    "display-name": "Toto",
+                    "username": "toto",
+                    "validation": True,
+                },
+                "categories": [{"name": "test"}],
+                "trending": False,
+                "unlisted": False,
+            },
+            "channel-map": [
+                {
+                    "channel": {
+                        "architecture": "amd64",
+                        "name": "stable",
+                        "risk": "stable",
+                        "track": "latest",
+                    },
+                    "created-at": "2018-09-18T14:45:28.064633+00:00",
+                    "version": "1.0",
+                    "confinement": "conf",
+                    "download": {"size": 100000},
+                }
+            ],
+        }
+
+        responses.add(responses.GET, details_url, json=payload)
+        responses.add(
+            responses.POST,
+            "https://api.snapcraft.io/api/v1/snaps/metrics",
+            json={},
+        )
+        response = self.client.get("/toto")
+        self.assert200(response)
+        self.assertNotIn(degraded.DEGRADED_HEADER, response.headers)
+
+        responses.replace(
+            responses.GET, details_url, body=requests.exceptions.Timeout()
+        )
+        monotonic = time.monotonic
+
+        # Once the cached details and page expired, every request is
+        # served from the last good details, and flagged as degraded
+        with patch("time.monotonic", lambda: monotonic() + 1000):
+            for _ in range(2):
+                # The requests of the test client share the app context
+                # of the test, and so flask.g
+                flask.g.pop("degraded", None)
+                response = self.client.get("/toto")
+
+                self.assert200(response)
+                self.assertEqual(
+                    response.headers[degraded.DEGRADED_HEADER],
+                    "stale-if-error",
+                )
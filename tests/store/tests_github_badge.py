@@ -239,3 +239,56 @@ class GetGitHubBadgeTest(TestCase):
 
         self.assertEqual(response.status_code, 200)
         self.assertTrue("Trending" in svg)
+
+    @responses.activate
+    def test_details_shared_between_badges(self):
+        payload = self.snap_payload
+
+        responses.add(
+            responses.Response(
+                method="GET", url=self.api_url, json=payload, status=200
+            )
+        )
+
+        self.client.get(self.badge_url)
+        response = self.client.get(self.trending_url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(responses.calls), 1)
+
+    @responses.activate
+    def test_get_badge_not_modified(self):
+        payload = self.snap_payload
+
+        responses.add(
+            responses.Response(
+                method="GET", url=self.api_url, json=payload, status=200
+            )
+        )
+
+        response = self.client.get(self.badge_url)
+        etag = response.headers["ETag"]
+
+        response = self.client.get(
+            self.badge_url, headers={"If-None-Match": etag}
+        )
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.get_data(), b"")
+
+    @responses.activate
+    def test_get_badge_etag_changes_with_name(self):
+        payload = self.snap_payload
+
+        responses.add(
+            responses.Response(
+                method="GET", url=self.api_url, json=payload, status=200
+            )
+        )
+
+        response = self.client.get(self.badge_url)
+        response_no_name = self.client.get(self.badge_url + "?name=0")
+
+        self.assertNotEqual(
+            response.headers["ETag"], response_no_name.headers["ETag"]
+        )
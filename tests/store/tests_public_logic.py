@@ -345,3 +345,77 @@ class StoreLogicTest(unittest.TestCase):
         result = logic.get_snap_banner_url(snap_with_banner)
 
         self.assertEqual(result.get("banner_url"), None)
+
+    def test_parse_date_fallback(self):
+        result = logic.parse_date("2019-01-12T16:48:41Z")
+
+        self.assertEqual(result, datetime.datetime(2019, 1, 12, 16, 48, 41))
+
+    # ChannelMap
+    # ===
+    def _channel(self, arch, track, risk, version):
+        return {
+            "channel": {
+                "name": f"{track}/{risk}",
+                "architecture": arch,
+                "track": track,
+                "risk": risk,
+            },
+            "created-at": "2019-01-12T16:48:41.821037+00:00",
+            "confinement": "strict",
+            "download": {"size": 10},
+            "version": version,
+        }
+
+    def test_channel_map_matches_functions(self):
+        channel_maps = [
+            self._channel("armhf", "latest", "edge", "3"),
+            self._channel("amd64", "latest", "edge", "2"),
+            self._channel("amd64", "latest", "stable", "1"),
+            self._channel("armhf", "latest", "stable", "0"),
+            self._channel("amd64", "1.0", "beta", "4"),
+        ]
+
+        channel_map = logic.ChannelMap(channel_maps)
+        channel_maps_list = channel_map.channel_maps_list
+
+        self.assertEqual(
+            channel_map.latest_channel,
+            logic.get_last_updated_version(channel_maps),
+        )
+        self.assertEqual(
+            channel_map.has_stable, logic.has_stable(channel_maps_list)
+        )
+
+        for track in ["latest", "1.0", "unknown"]:
+            risk = channel_map.get_lowest_available_risk(track)
+            self.assertEqual(
+                risk,
+                logic.get_lowest_available_risk(channel_maps_list, track),
+            )
+            self.assertEqual(
+                channel_map.extract_info(track, risk),
+                logic.extract_info_channel_map(channel_maps_list, track, risk),
+            )
+
+        self.assertEqual(
+            channel_map.extract_info("latest", "stable")["version"], "0"
+        )
+        self.assertEqual(
+            channel_map.get("amd64", "latest", "edge")["version"], "2"
+        )
+        self.assertIsNone(channel_map.get("arm64", "latest", "edge"))
+
+    def test_channel_map_no_stable(self):
+        channel_maps = [
+            self._channel("amd64", "latest", "edge", "2"),
+            self._channel("amd64", "latest", "beta", "1"),
+        ]
+
+        channel_map = logic.ChannelMap(channel_maps)
+
+        self.assertFalse(channel_map.has_stable)
+        self.assertEqual(channel_map.latest_channel, channel_maps[0])
+        self.assertEqual(
+            channel_map.get_lowest_available_risk("latest"), "beta"
+        )
@@ -0,0 +1,134 @@
+import json
+import os
+import tempfile
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
+
+import responses
+from flask_testing import TestCase
+from webapp.api import requests
+from webapp.app import create_app
+from webapp.store import sitemap
+
+
+def search_callback(request):
+    page = int(parse_qs(urlparse(request.url).query)["page"][0])
+    snaps = [
+        {
+            "package_name": f"snap-{page}-{index}",
+            "last_updated": "2019-01-12T16:48:41.821037+00:00",
+        }
+        for index in range(2)
+    ]
+    payload = {"total": 6, "_embedded": {"clickindex:package": snaps}}
+
+    return 200, {}, json.dumps(payload)
+
+
+class StoreSitemapTest(TestCase):
+    render_templates = False
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+        patcher = patch.object(
+            sitemap, "SITEMAP_DIRECTORY", self.directory.name
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_app(self):
+        app = create_app(testing=True)
+        app.secret_key = "secret_key"
+
+        return app
+
+    @responses.activate
+    @patch.object(sitemap, "PAGE_SIZE", 2)
+    @patch.object(sitemap, "MAX_URLS", 4)
+    def test_build_sitemap(self):
+        responses.add_callback(
+            responses.GET, sitemap.SEARCH_URL, callback=search_callback
+        )
+
+        built = sitemap.build_sitemap(requests.Session(), self.directory.name)
+
+        self.assertTrue(built)
+        self.assertEqual(len(responses.calls), 3)
+        self.assertEqual(sitemap.get_shards(self.directory.name), [1, 2])
+
+        with open(os.path.join(self.directory.name, "store-2.xml")) as f:
+            shard = f.read()
+
+        self.assertIn("<loc>https://snapcraft.io/snap-3-0</loc>", shard)
+        self.assertIn("<lastmod>2019-01-12</lastmod>", shard)
+
+        # The sitemap is fresh, no need to build it again
+        self.assertFalse(
+            sitemap.build_sitemap(requests.Session(), self.directory.name)
+        )
+
+    @responses.activate
+    def test_first_page_error(self):
+        responses.add(responses.GET, sitemap.SEARCH_URL, body="error")
+
+        built = sitemap.build_sitemap(requests.Session(), self.directory.name)
+
+        self.assertFalse(built)
+        self.assertEqual(len(responses.calls), sitemap.FETCH_RETRIES)
+
+    def test_sitemap_views(self):
+        sitemap.write_sitemaps(
+            [{"url": "https://snapcraft.io/toto"}], self.directory.name
+        )
+
+        response = self.client.get("/store/sitemap.xml")
+        self.assert200(response)
+        self.assertEqual(response.mimetype, "application/xml")
+        self.assertIn(b"/store/sitemap-1.xml", response.get_data())
+        response.close()
+
+        response = self.client.get("/store/sitemap-1.xml")
+        self.assert200(response)
+        self.assertIn(b"https://snapcraft.io/toto", response.get_data())
+        response.close()
+
+        response = self.client.get("/store/sitemap-2.xml")
+        self.assertStatus(response, 503)
+
+    def test_site_index(self):
+        sitemap.write_sitemaps(
+            [{"url": "https://snapcraft.io/toto"}], self.directory.name
+        )
+
+        with patch.object(sitemap, "refresh_in_background") as refresh:
+            response = self.client.get("/sitemap.xml")
+
+        self.assert200(response)
+        self.assert_context(
+            "store_sitemaps", ["https://snapcraft.io/store/sitemap-1.xml"]
+        )
+        refresh.assert_called_once_with(directory=self.directory.name)
+
+    @patch.object(sitemap, "_refresher_pid", None)
+    @patch.object(sitemap.threading, "Thread")
+    def test_start_refresh_once_per_process(self, thread):
+        sitemap.start_refresh(directory=self.directory.name)
+        sitemap.start_refresh(directory=self.directory.name)
+
+        thread.assert_called_once()
+        thread.return_value.start.assert_called_once()
+
+    def test_crawl_session(self):
+        upstream = sitemap.session.get_upstream(sitemap.SEARCH_URL)
+
+        for _ in range(requests.MIN_LATENCY_SAMPLES):
+            upstream.observe(0.1)
+
+        self.assertEqual(upstream.host, "sitemap@api.snapcraft.io")
+        self.assertEqual(upstream.get_timeout(sitemap.FETCH_TIMEOUT), 30)
+        self.assertIsNot(
+            upstream,
+            requests.Session().get_upstream(sitemap.SEARCH_URL),
+        )
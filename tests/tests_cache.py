@@ -0,0 +1,135 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import Mock, patch
+
+from webapp.cache import Cache, SharedStore
+
+
+class CacheTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = patch("webapp.cache.time.monotonic", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_get_or_set_calls_once(self):
+        cache = Cache("test", ttl=10)
+        func = Mock(return_value="value")
+
+        self.assertEqual(cache.get_or_set("key", func, 1, a=2), "value")
+        self.assertEqual(cache.get_or_set("key", func, 1, a=2), "value")
+
+        func.assert_called_once_with(1, a=2)
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 1)
+
+    def test_expired_entry(self):
+        cache = Cache("test", ttl=10)
+        cache.set("key", "value")
+
+        self.now += 10
+
+        self.assertIsNone(cache.get("key"))
+        self.assertEqual(len(cache), 0)
+
+    def test_lru_eviction(self):
+        cache = Cache("test", maxsize=2, ttl=10)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+
+    def test_exceptions_are_not_cached(self):
+        cache = Cache("test", ttl=10)
+        func = Mock(side_effect=[ValueError(), "value"])
+
+        with self.assertRaises(ValueError):
+            cache.get_or_set("key", func)
+
+        self.assertEqual(cache.get_or_set("key", func), "value")
+
+    @patch("webapp.cache.threading.Thread")
+    def test_stale_while_revalidate(self, mock_thread):
+        cache = Cache("test", ttl=10, stale_ttl=10)
+        cache.set("key", "stale")
+        func = Mock(return_value="fresh")
+
+        self.now += 15
+
+        self.assertEqual(cache.get_or_set("key", func), "stale")
+        self.assertEqual(cache.get_or_set("key", func), "stale")
+        mock_thread.assert_called_once()
+
+        # Run the background refresh inline
+        kwargs = mock_thread.call_args[1]
+        kwargs["target"](*kwargs["args"])
+
+        self.assertEqual(cache.get_or_set("key", func), "fresh")
+        func.assert_called_once_with()
+
+    def test_no_ttl(self):
+        cache = Cache("test", ttl=None)
+        cache.set("key", "value")
+
+        self.now += 10**6
+
+        self.assertEqual(cache.get("key"), "value")
+
+    def test_weight_eviction(self):
+        cache = Cache("test", ttl=None, maxweight=10)
+        cache.set("a", "12345")
+        cache.set("b", "12345")
+        cache.set("c", "1")
+
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("b"), "12345")
+        self.assertEqual(cache.weight, 6)
+
+
+class SharedStoreTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = SharedStore(directory.name)
+
+    def _cache(self, **kwargs):
+        cache = Cache("test", **kwargs)
+        cache.shared_store = self.store
+
+        return cache
+
+    def test_shared_between_caches(self):
+        func = Mock(return_value={"value": 1})
+
+        self._cache(ttl=10).get_or_set(("key", 1), func)
+        value = self._cache(ttl=10).get_or_set(("key", 1), func)
+
+        self.assertEqual(value, {"value": 1})
+        func.assert_called_once_with()
+
+    def test_expired_shared_entry(self):
+        self.store.set("test", "key", "value", time.time() - 10)
+
+        self.assertIsNone(self._cache(ttl=10).get("key"))
+        self.assertEqual(self._cache(ttl=None).get("key"), "value")
+
+    def test_delete(self):
+        cache = self._cache(ttl=10)
+        cache.set("key", "value")
+        cache.delete("key")
+
+        self.assertIsNone(self._cache(ttl=10).get("key"))
+
+    def test_prune(self):
+        for index in range(5):
+            self.store.set("test", index, "value", time.time())
+
+        self.store.prune("test", 2)
+
+        self.assertEqual(len(os.listdir(self.store.directory + "/test")), 2)
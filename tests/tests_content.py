@@ -0,0 +1,62 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from webapp.content import ContentStore, FrozenDict
+
+
+class ContentStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.store = ContentStore(self.directory.name)
+
+    def _write(self, filename, data, mtime):
+        filepath = os.path.join(self.directory.name, filename)
+        with open(filepath, "w") as f:
+            f.write(data)
+        os.utime(filepath, (mtime, mtime))
+
+    def test_get_yaml_frozen(self):
+        self._write("test.yaml", "test:\n- a\n- b\n", 1)
+
+        data = self.store.get_yaml("test.yaml")
+
+        self.assertIsInstance(data, FrozenDict)
+        self.assertEqual(data, {"test": ("a", "b")})
+        with self.assertRaises(TypeError):
+            data["test"] = "c"
+
+    def test_parsed_once(self):
+        self._write("test.yaml", "test: test", 1)
+        self.store.get_yaml("test.yaml")
+
+        with patch("builtins.open") as mock_open:
+            self.assertEqual(
+                self.store.get_yaml("test.yaml"), {"test": "test"}
+            )
+            mock_open.assert_not_called()
+
+    def test_reload_on_mtime_change(self):
+        self._write("test.yaml", "test: old", 1)
+        self.assertEqual(self.store.get_yaml("test.yaml"), {"test": "old"})
+
+        self._write("test.yaml", "test: new", 2)
+        self.assertEqual(self.store.get_yaml("test.yaml"), {"test": "new"})
+
+    def test_missing_or_invalid_file(self):
+        self._write("invalid.yaml", "test: test: test", 1)
+
+        self.assertIsNone(self.store.get_yaml("missing.yaml"))
+        self.assertIsNone(self.store.get_yaml("invalid.yaml"))
+
+    def test_preload(self):
+        os.mkdir(os.path.join(self.directory.name, "content"))
+        self._write("content/test.yaml", "test: test", 1)
+
+        self.store.preload(["content/", "missing/"])
+
+        with patch("builtins.open") as mock_open:
+            self.store.get_yaml("content/test.yaml")
+            mock_open.assert_not_called()
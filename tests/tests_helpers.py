@@ -0,0 +1,79 @@
+import unittest
+from unittest.mock import patch
+
+from canonicalwebteam.launchpad import Launchpad
+from webapp.helpers import CachedLaunchpad, api_publisher_session
+
+
+class CachedLaunchpadTest(unittest.TestCase):
+    def setUp(self):
+        self.launchpad = CachedLaunchpad(
+            username="toto",
+            token="token",
+            secret="secret",
+            session=api_publisher_session,
+        )
+        self.lp_snap = {
+            "name": "lp-toto",
+            "store_name": "toto",
+            "self_link": "https://api.launchpad.net/devel/~toto/+snap/toto",
+            "auto_build_archive_link": "/ubuntu/+archive/primary",
+            "auto_build_pocket": "Updates",
+        }
+
+    @patch.object(Launchpad, "get_snap_by_store_name")
+    def test_lookups_cached(self, get_snap_by_store_name):
+        get_snap_by_store_name.return_value = self.lp_snap
+
+        self.assertEqual(
+            self.launchpad.get_snap_by_store_name("toto"), self.lp_snap
+        )
+        self.assertEqual(
+            self.launchpad.get_snap_by_store_name("toto"), self.lp_snap
+        )
+        self.launchpad.get_snap_by_store_name("other")
+
+        self.assertEqual(get_snap_by_store_name.call_count, 2)
+
+    @patch.object(Launchpad, "request")
+    @patch.object(Launchpad, "get_snap_by_store_name")
+    def test_create_snap_invalidates(self, get_snap_by_store_name, request):
+        get_snap_by_store_name.return_value = None
+        self.assertIsNone(self.launchpad.get_snap_by_store_name("toto"))
+
+        self.launchpad.create_snap("toto", "https://github.com/a/b", "m")
+
+        get_snap_by_store_name.return_value = self.lp_snap
+        self.assertEqual(
+            self.launchpad.get_snap_by_store_name("toto"), self.lp_snap
+        )
+
+    @patch.object(Launchpad, "request")
+    @patch.object(Launchpad, "get_snap_by_store_name")
+    def test_delete_snap_invalidates(self, get_snap_by_store_name, request):
+        get_snap_by_store_name.return_value = self.lp_snap
+
+        self.launchpad.delete_snap("toto")
+        request.assert_called_once_with(
+            self.lp_snap["self_link"], method="delete"
+        )
+
+        get_snap_by_store_name.return_value = None
+        self.assertIsNone(self.launchpad.get_snap_by_store_name("toto"))
+
+    @patch.object(Launchpad, "request")
+    @patch.object(Launchpad, "get_builders_status")
+    def test_build_snap_invalidates_builders(
+        self, get_builders_status, request
+    ):
+        self.launchpad.get_builders_status()
+        self.launchpad.get_builders_status()
+        self.assertEqual(get_builders_status.call_count, 1)
+
+        with patch.object(
+            Launchpad, "get_snap_by_store_name", return_value=self.lp_snap
+        ):
+            self.launchpad.build_snap("toto")
+
+        self.launchpad.get_builders_status()
+        self.assertEqual(get_builders_status.call_count, 2)
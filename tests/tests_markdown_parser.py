@@ -1,6 +1,6 @@
 import unittest
 
-from webapp.markdown import parse_markdown_description
+from webapp.markdown import description_cache, parse_markdown_description
 
 
 class TestMarkdownParser(unittest.TestCase):
@@ -175,3 +175,14 @@ class TestMarkdownParser(unittest.TestCase):
         expected_result = "<p>" + markdown + "</p>\n"
 
         self.assertEqual(result, expected_result)
+
+    def test_parse_cached(self):
+        """Rendering the same content twice uses the cache"""
+        markdown = "Cached *description*"
+        hits = description_cache.hits
+
+        result = parse_markdown_description(markdown)
+        cached_result = parse_markdown_description(markdown)
+
+        self.assertEqual(result, cached_result)
+        self.assertEqual(description_cache.hits, hits + 1)
@@ -0,0 +1,89 @@
+import unittest
+
+import flask
+from webapp.cache import Cache
+from webapp.page_cache import cache_page
+
+
+class PageCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.renders = 0
+        self.status_code = 200
+
+        app = flask.Flask(__name__)
+        app.secret_key = "secret_key"
+        page_cache = Cache("test_pages", ttl=61)
+
+        @app.route("/page")
+        @cache_page(page_cache, query_args=("q",), vary_platform=True)
+        def page():
+            self.renders += 1
+            return f"render {self.renders}", self.status_code
+
+        @app.route("/headers")
+        @cache_page(page_cache)
+        def headers():
+            self.renders += 1
+            response = flask.make_response(f"render {self.renders}")
+            response.headers["Cache-Control"] = "max-age=61"
+            response.headers["ETag"] = f'"{self.renders}"'
+            response.headers["Link"] = "</static/css/styles.css>; rel=preload"
+            response.headers["Vary"] = "User-Agent"
+            response.set_cookie("visitor", str(self.renders))
+            return response
+
+        @app.route("/login")
+        def login():
+            flask.session["user"] = "toto"
+            return ""
+
+        self.client = app.test_client()
+
+    def test_cached(self):
+        self.assertEqual(self.client.get("/page").get_data(), b"render 1")
+        self.assertEqual(self.client.get("/page").get_data(), b"render 1")
+        self.assertEqual(
+            self.client.get("/page?utm_source=test").get_data(), b"render 1"
+        )
+        self.assertEqual(self.renders, 1)
+
+    def test_key(self):
+        self.client.get("/page?q=a")
+        self.client.get("/page?q=b")
+        self.client.get("/page?q=a", headers={"User-Agent": "X11; Linux"})
+
+        self.assertEqual(self.renders, 3)
+
+    def test_hosts_cached_apart(self):
+        self.client.get("/page", base_url="https://snapcraft.io")
+        self.client.get("/page", base_url="https://staging.snapcraft.io")
+        self.client.get("/page", base_url="https://snapcraft.io")
+
+        self.assertEqual(self.renders, 2)
+
+    def test_headers_cached(self):
+        rendered = self.client.get("/headers")
+        cached = self.client.get("/headers")
+
+        self.assertEqual(self.renders, 1)
+        self.assertEqual(cached.get_data(), b"render 1")
+        for header in ["Cache-Control", "ETag", "Link", "Vary"]:
+            self.assertEqual(cached.headers[header], rendered.headers[header])
+        self.assertEqual(cached.mimetype, "text/html")
+        self.assertEqual(cached.headers["Content-Length"], "8")
+        # The cookies of the visitor who rendered the page aren't shared
+        self.assertNotIn("Set-Cookie", cached.headers)
+
+    def test_errors_not_cached(self):
+        self.status_code = 502
+        self.assertEqual(self.client.get("/page").status_code, 502)
+        self.assertEqual(self.client.get("/page").status_code, 502)
+
+        self.assertEqual(self.renders, 2)
+
+    def test_bypassed_with_session(self):
+        self.client.get("/page")
+        self.client.get("/login")
+
+        self.assertEqual(self.client.get("/page").get_data(), b"render 2")
+        self.assertEqual(self.client.get("/page").get_data(), b"render 3")
@@ -1,10 +1,19 @@
+import threading
+import time
 import unittest
+from unittest.mock import Mock, patch
 
+import flask
+import prometheus_client
 from requests.exceptions import ConnectionError, Timeout
 
 import responses
 from webapp.api import requests
-from webapp.api.exceptions import ApiConnectionError, ApiTimeoutError
+from webapp.api.exceptions import (
+    ApiCircuitBreaker,
+    ApiConnectionError,
+    ApiTimeoutError,
+)
 
 
 class RequestsCacheTest(unittest.TestCase):
@@ -23,3 +32,338 @@ class RequestsCacheTest(unittest.TestCase):
         responses.add(responses.GET, test_url, body=Timeout())
         with self.assertRaises(ApiTimeoutError):
             session.get(test_url)
+
+
+class SingleFlightTest(unittest.TestCase):
+    def test_concurrent_calls_share_result(self):
+        single_flight = requests.SingleFlight()
+        release = threading.Event()
+        func = Mock(side_effect=lambda: release.wait() and "result")
+        results = []
+
+        def call():
+            results.append(single_flight.do("key", func))
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        threads[0].start()
+        while "key" not in single_flight._calls:
+            time.sleep(0.001)
+
+        for thread in threads[1:]:
+            thread.start()
+        while single_flight._calls["key"].waiters < 2:
+            time.sleep(0.001)
+
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        func.assert_called_once_with()
+        self.assertEqual(results, ["result"] * 3)
+        self.assertEqual(single_flight._calls, {})
+
+    def test_exception_not_kept(self):
+        single_flight = requests.SingleFlight()
+        func = Mock(side_effect=[ValueError(), "result"])
+
+        with self.assertRaises(ValueError):
+            single_flight.do("key", func)
+
+        self.assertEqual(single_flight.do("key", func), "result")
+
+    @responses.activate
+    def test_post_not_coalesced(self):
+        test_url = "https://snapcraft.io"
+        session = requests.Session()
+        responses.add(responses.POST, test_url, json={})
+
+        with patch.object(session.single_flight, "do") as mock_do:
+            session.post(test_url)
+
+        mock_do.assert_not_called()
+        self.assertEqual(len(responses.calls), 1)
+
+
+class ConcurrentCircuitBreakerTest(unittest.TestCase):
+    def test_calls_not_serialized(self):
+        breaker = requests.ConcurrentCircuitBreaker()
+        running = threading.Semaphore(0)
+        release = threading.Event()
+
+        def func():
+            running.release()
+            release.wait()
+
+        threads = [
+            threading.Thread(target=breaker.call, args=(func,))
+            for _ in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+
+        # All the calls are running at the same time
+        for _ in threads:
+            self.assertTrue(running.acquire(timeout=1))
+
+        release.set()
+        for thread in threads:
+            thread.join()
+
+    def test_concurrent_failures_counted(self):
+        breaker = requests.ConcurrentCircuitBreaker(fail_max=20)
+        barrier = threading.Barrier(10)
+
+        def func():
+            barrier.wait()
+            raise ValueError()
+
+        def call():
+            with self.assertRaises(ValueError):
+                breaker.call(func)
+
+        threads = [threading.Thread(target=call) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(breaker.fail_counter, 10)
+
+    def test_single_trial_call(self):
+        breaker = requests.ConcurrentCircuitBreaker(reset_timeout=0)
+        breaker.open()
+        started = threading.Event()
+        release = threading.Event()
+
+        def trial_call():
+            started.set()
+            release.wait()
+            return "result"
+
+        results = []
+        thread = threading.Thread(
+            target=lambda: results.append(breaker.call(trial_call))
+        )
+        thread.start()
+        started.wait()
+
+        # The other calls fail while the trial call runs
+        self.assertEqual(breaker.current_state, "half-open")
+        with self.assertRaises(requests.CircuitBreakerError):
+            breaker.call(Mock())
+
+        release.set()
+        thread.join()
+
+        self.assertEqual(results, ["result"])
+        self.assertEqual(breaker.current_state, "closed")
+        self.assertEqual(breaker.call(Mock(return_value=1)), 1)
+
+    def test_failed_trial_call_opens(self):
+        breaker = requests.ConcurrentCircuitBreaker(reset_timeout=0)
+        breaker.open()
+
+        with self.assertRaises(requests.CircuitBreakerError):
+            breaker.call(Mock(side_effect=ValueError()))
+
+        self.assertEqual(breaker.current_state, "open")
+
+
+class UpstreamTest(unittest.TestCase):
+    @responses.activate
+    def test_breaker_per_upstream(self):
+        failing_url = "https://api.snapcraft.io/v2/snaps/info/toto"
+        other_url = "https://api.launchpad.net/devel/builders"
+        session = requests.Session()
+        responses.add(responses.GET, failing_url, body=ConnectionError())
+        responses.add(responses.GET, other_url, json={})
+
+        # The breaker opens on the fifth failure
+        for _ in range(4):
+            with self.assertRaises(ApiConnectionError):
+                session.get(failing_url)
+
+        with self.assertRaises(ApiCircuitBreaker):
+            session.get(failing_url)
+
+        self.assertEqual(session.get(other_url).status_code, 200)
+
+    def test_route_family(self):
+        self.assertEqual(
+            requests.get_route_family("/v2/snaps/info/toto"), "v2/snaps"
+        )
+        self.assertEqual(requests.get_route_family("/api/v1"), "api/v1")
+        self.assertEqual(requests.get_route_family("/repos/a/b"), "repos")
+        self.assertEqual(
+            requests.get_route_family("/devel/~toto/+snap/toto"), "devel"
+        )
+        self.assertEqual(requests.get_route_family("/"), "")
+
+    def test_route_family_without_names(self):
+        # raw.githubusercontent.com
+        self.assertEqual(
+            requests.get_route_family(
+                "/someowner/repo/0123abc/snap/snapcraft.yaml"
+            ),
+            "other",
+        )
+        # launchpadlibrarian.net
+        self.assertEqual(
+            requests.get_route_family("/512345678/buildlog.txt.gz"), "other"
+        )
+        self.assertEqual(
+            requests.get_route_family("/~toto/+snap/toto/+build/1"), "other"
+        )
+        self.assertEqual(
+            requests.get_route_family("/v1/fdc99abe-ico_16px.png"), "v1"
+        )
+
+    def test_one_upstream_per_unknown_host_route(self):
+        session = requests.Session()
+
+        for owner in ["a", "b", "c"]:
+            session.get_upstream(
+                f"https://raw.githubusercontent.com/{owner}/repo/sha/x.yaml"
+            )
+
+        self.assertEqual(
+            list(session.upstreams),
+            [("raw.githubusercontent.com", "other")],
+        )
+
+    @responses.activate
+    def test_metrics(self):
+        test_url = "https://metrics.snapcraft.io/v2/snaps/info/toto"
+        responses.add(responses.GET, test_url, status=404)
+        labels = {
+            "upstream": "metrics.snapcraft.io",
+            "route": "v2/snaps",
+            "method": "GET",
+        }
+
+        requests.Session().get(test_url)
+
+        registry = prometheus_client.REGISTRY
+        self.assertEqual(
+            registry.get_sample_value(
+                "api_responses_total", dict(labels, status="404")
+            ),
+            1,
+        )
+        self.assertEqual(
+            registry.get_sample_value(
+                "api_request_duration_seconds_count", labels
+            ),
+            1,
+        )
+
+    @responses.activate
+    def test_names_not_in_metric_labels(self):
+        session = requests.Session()
+
+        for owner in ["owner-a", "owner-b", "owner-c", "owner-d", "owner-e"]:
+            test_url = (
+                f"https://raw.githubusercontent.com/{owner}/repo/sha/x.yaml"
+            )
+            responses.add(responses.GET, test_url, body=ConnectionError())
+
+            with self.assertRaises((ApiConnectionError, ApiCircuitBreaker)):
+                session.get(test_url)
+
+        # The breaker shared by the owners opened
+        self.assertEqual(
+            prometheus_client.REGISTRY.get_sample_value(
+                "api_breaker_state",
+                {"upstream": "raw.githubusercontent.com", "route": "other"},
+            ),
+            2,
+        )
+
+        for metric in prometheus_client.REGISTRY.collect():
+            if not metric.name.startswith("api_"):
+                continue
+
+            for sample in metric.samples:
+                for value in sample.labels.values():
+                    self.assertNotIn("owner-", value)
+
+    def test_adaptive_timeout(self):
+        upstream = requests.Upstream("snapcraft.io", "v2/snaps")
+        self.assertEqual(upstream.get_timeout(12), 12)
+        self.assertIsNone(upstream.get_timeout(None))
+
+        for _ in range(requests.MIN_LATENCY_SAMPLES):
+            upstream.observe(1)
+
+        self.assertEqual(upstream.get_timeout(12), 3)
+        self.assertEqual(upstream.get_timeout(2.5), 2.5)
+
+        for _ in range(requests.LATENCY_SAMPLES):
+            upstream.observe(0.1)
+
+        self.assertEqual(upstream.get_timeout(12), requests.MIN_TIMEOUT)
+
+
+class DeadlineTest(unittest.TestCase):
+    def setUp(self):
+        context = flask.Flask(__name__).test_request_context()
+        context.push()
+        self.addCleanup(context.pop)
+
+    def test_deadline_exceeded(self):
+        session = requests.Session()
+        requests.set_request_deadline(0)
+
+        with patch("requests.Session.request") as mock_request:
+            with self.assertRaises(ApiTimeoutError):
+                session.get("https://snapcraft.io")
+
+        mock_request.assert_not_called()
+
+    def test_timeout_from_deadline(self):
+        session = requests.Session()
+        requests.set_request_deadline(5)
+
+        with patch("requests.Session.request") as mock_request:
+            session.get("https://snapcraft.io")
+
+        timeout = mock_request.call_args[1]["timeout"]
+        self.assertTrue(4 < timeout <= 5)
+
+    def test_no_deadline_outside_request(self):
+        with flask.Flask(__name__).app_context():
+            self.assertIsNone(requests.get_remaining_time())
+
+
+class HedgedRequestTest(unittest.TestCase):
+    def test_hedged_request(self):
+        test_url = "https://snapcraft.io"
+        session = requests.Session()
+        session.hedge_requests = True
+
+        upstream = session.get_upstream(test_url)
+        for _ in range(requests.MIN_LATENCY_SAMPLES):
+            upstream.observe(0.01)
+
+        release = threading.Event()
+        responses_sent = iter(["slow", "fast"])
+
+        def send(*args, **kwargs):
+            response = next(responses_sent)
+            if response == "slow":
+                release.wait(5)
+            return Mock(text=response, status_code=200)
+
+        with patch("requests.Session.request", side_effect=send):
+            self.assertEqual(session.get(test_url).text, "fast")
+
+        release.set()
+
+    def test_not_hedged_by_default(self):
+        session = requests.Session()
+
+        with patch.object(session, "_hedged_request") as mock_hedged:
+            with patch("requests.Session.request"):
+                session.get("https://snapcraft.io")
+
+        mock_hedged.assert_not_called()
@@ -1,4 +1,7 @@
+import os
+import tempfile
 import unittest
+from unittest.mock import patch
 
 from webapp import template_utils
 
@@ -96,3 +99,39 @@ class TemplateUtilsTest(unittest.TestCase):
     def test_static_url(self):
         result = template_utils.static_url("images/rocket.png")
         self.assertEqual(result, "/static/images/rocket.png?v=7d7c26f")
+
+    def test_static_url_memoized(self):
+        template_utils.static_url("images/rocket.png")
+
+        with patch("builtins.open") as mock_open:
+            result = template_utils.static_url("images/rocket.png")
+
+        mock_open.assert_not_called()
+        self.assertEqual(result, "/static/images/rocket.png?v=7d7c26f")
+
+    def test_static_manifest(self):
+        with tempfile.TemporaryDirectory() as directory:
+            os.mkdir(os.path.join(directory, "images"))
+            with open(os.path.join(directory, "images/test.png"), "w") as f:
+                f.write("test")
+
+            manifest_path = os.path.join(directory, "manifest.json")
+            template_utils.write_static_manifest(directory, manifest_path)
+
+            with patch.dict(template_utils.static_manifest, clear=True):
+                self.assertTrue(
+                    template_utils.load_static_manifest(manifest_path)
+                )
+                self.assertEqual(
+                    template_utils.static_manifest,
+                    {"images/test.png": "098f6bc"},
+                )
+
+                with patch("os.stat") as mock_stat:
+                    result = template_utils.static_url("images/test.png")
+
+                mock_stat.assert_not_called()
+                self.assertEqual(result, "/static/images/test.png?v=098f6bc")
+
+    def test_static_manifest_missing(self):
+        self.assertFalse(template_utils.load_static_manifest("missing.json"))
@@ -0,0 +1,54 @@
+import json
+import unittest
+
+import flask
+from webapp.tracing import init_tracing, span
+
+
+class TracingTest(unittest.TestCase):
+    def setUp(self):
+        app = flask.Flask(__name__)
+        app.config["SLOW_REQUEST_THRESHOLD"] = 2000
+        init_tracing(app)
+
+        @app.route("/")
+        def index():
+            with span("api", upstream="api.snapcraft.io"):
+                with span("api", upstream="api.snapcraft.io"):
+                    pass
+
+            return flask.render_template_string("{{ 1 + 1 }}")
+
+        self.app = app
+        self.client = app.test_client()
+
+    def test_server_timing(self):
+        response = self.client.get("/")
+
+        self.assertEqual(response.get_data(), b"2")
+
+        metrics = [
+            metric.split(";")[0]
+            for metric in response.headers["Server-Timing"].split(", ")
+        ]
+        self.assertEqual(metrics, ["api", "context", "render", "total"])
+        self.assertIn("api;dur=", response.headers["Server-Timing"])
+        self.assertIn('desc="2"', response.headers["Server-Timing"])
+
+    def test_slow_request_log(self):
+        self.app.config["SLOW_REQUEST_THRESHOLD"] = -1
+
+        with self.assertLogs("webapp.tracing", "WARNING") as logs:
+            self.client.get("/")
+
+        spans = json.loads(logs.records[0].spans)
+        self.assertEqual(spans["name"], "request")
+        self.assertEqual(spans["children"][0]["name"], "api")
+        self.assertEqual(
+            spans["children"][0]["children"][0]["upstream"],
+            "api.snapcraft.io",
+        )
+
+    def test_span_outside_request(self):
+        with span("api") as current_span:
+            self.assertIsNone(current_span)
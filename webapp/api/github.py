@@ -1,19 +1,160 @@
 import hmac
+import json
+import threading
+import time
 from hashlib import sha1
+from itertools import chain
 from os import getenv
 
+import prometheus_client
+import requests
 from webapp import api
+from webapp.cache import Cache
 from webapp.helpers import get_yaml_loader
+from webapp.tracing import span
+from requests.exceptions import HTTPError
 from werkzeug.exceptions import Unauthorized
 
 
 GITHUB_WEBHOOK_SECRET = getenv("GITHUB_WEBHOOK_SECRET")
+GITHUB_SNAPCRAFT_USER_TOKEN = getenv("GITHUB_SNAPCRAFT_USER_TOKEN")
+
+# Share of the rate limit of the Snapcraft token kept for its critical
+# requests
+CRITICAL_RESERVE = 0.2
+
+# Responses of the REST API by token and URL, revalidated on each request
+# with their ETag or Last-Modified date. GitHub doesn't count the 304
+# responses against the rate limit.
+conditional_cache = Cache(
+    "github_conditional",
+    maxsize=4096,
+    ttl=86400,
+    maxweight=32 * 1024 * 1024,
+    weigher=lambda entry: len(entry["content"]),
+)
+
+# snapcraft.yaml probes by repo and commit SHA, which never change
+snapcraft_yaml_cache = Cache(
+    "github_snapcraft_yaml", maxsize=1024, ttl=86400, shared=True
+)
+
+# Organizations and repositories of the users, refreshed in the
+# background once stale
+listings_cache = Cache(
+    "github_listings", maxsize=1024, ttl=60, stale_ttl=600, shared=True
+)
+
+# Rate limit budgets of the Snapcraft token by API resource, kept for
+# the life of the process
+rate_limit_budgets = {}
+rate_limit_budgets_lock = threading.Lock()
+
+rate_limit_remaining = prometheus_client.Gauge(
+    "github_rate_limit_remaining",
+    "The requests left to the Snapcraft GitHub token until the rate limit "
+    "resets, by API resource",
+    ["resource"],
+    multiprocess_mode="liveall",
+)
+
+rate_limited_requests = prometheus_client.Counter(
+    "github_rate_limited_requests",
+    "A counter of GitHub requests that were not sent to keep the rate "
+    "limit for critical requests, by whether they were served from cache",
+    ["result"],
+)
+
+conditional_requests = prometheus_client.Counter(
+    "github_conditional_requests",
+    "A counter of GET requests to the GitHub REST API, by whether they "
+    "were served from the conditional cache (not_modified)",
+    ["result"],
+)
 
 
 class InvalidYAML(Exception):
     pass
 
 
+class RateLimitExceeded(Exception):
+    pass
+
+
+class RateLimitBudget:
+    """
+    The requests left to a token for an API resource, as reported by the
+    X-RateLimit headers of the last response and counted down by the
+    requests sent since. GitHub refills the whole budget when the limit
+    resets.
+
+    The last CRITICAL_RESERVE of the budget is kept for the critical
+    requests.
+    """
+
+    def __init__(self):
+        self.limit = None
+        self.remaining = None
+        self.reset = None
+        self.lock = threading.Lock()
+
+    def update(self, headers):
+        try:
+            limit = int(headers["X-RateLimit-Limit"])
+            remaining = int(headers["X-RateLimit-Remaining"])
+            reset = int(headers["X-RateLimit-Reset"])
+        except (KeyError, ValueError):
+            return
+
+        with self.lock:
+            self.limit = limit
+            self.remaining = remaining
+            self.reset = reset
+
+    def acquire(self, critical=False):
+        """
+        Returns True and counts the request if it can be sent
+        """
+        with self.lock:
+            # Unknown yet, or refilled since the last response
+            if self.remaining is None or time.time() >= self.reset:
+                self.remaining = None
+                return True
+
+            reserve = 0 if critical else self.limit * CRITICAL_RESERVE
+
+            if self.remaining <= reserve:
+                return False
+
+            self.remaining -= 1
+            return True
+
+
+def get_rate_limit_budget(resource):
+    with rate_limit_budgets_lock:
+        if resource not in rate_limit_budgets:
+            rate_limit_budgets[resource] = RateLimitBudget()
+
+        return rate_limit_budgets[resource]
+
+
+def parse_snapcraft_yaml_name(content):
+    """
+    Return the snap name from the content of a snapcraft.yaml
+    """
+    yaml = get_yaml_loader()
+
+    try:
+        content = yaml.load(content)
+    except Exception:
+        raise InvalidYAML
+
+    if not isinstance(content, dict):
+        raise InvalidYAML
+
+    return content.get("name")
+
+
 class GitHub:
     """
     Provides authentication for GitHub users. Helper methods are also provided
@@ -31,10 +172,54 @@ class GitHub:
         "build-aux/snap/snapcraft.yaml",
     ]
 
-    def __init__(self, access_token=None, session=api.requests.Session()):
+    def __init__(
+        self,
+        access_token=None,
+        session=api.requests.Session(),
+        critical=False,
+    ):
+        """
+        Requests of critical clients, such as the validation of webhooks,
+        can spend the budget of the Snapcraft token reserved to them.
+        """
         self.access_token = access_token
         self.session = session
         self.session.headers["Accept"] = "application/json"
+        self.critical = critical
+
+    def _get_token_hash(self):
+        return sha1(bytes(self.access_token or "", "UTF-8")).hexdigest()
+
+    def _is_snapcraft_token(self):
+        return bool(
+            self.access_token
+            and self.access_token == GITHUB_SNAPCRAFT_USER_TOKEN
+        )
+
+    def _acquire(self, resource):
+        """
+        Return True if the rate limit budget allows a read of the
+        resource. Only the reads with the Snapcraft token, shared by all
+        the users, are limited.
+        """
+        if not self._is_snapcraft_token():
+            return True
+
+        budget = get_rate_limit_budget(resource)
+
+        return budget.acquire(self.critical)
+
+    def _update_rate_limit(self, resource, response):
+        if not self._is_snapcraft_token():
+            return
+
+        budget = get_rate_limit_budget(resource)
+        budget.update(response.headers)
+
+        if budget.remaining is not None:
+            rate_limit_remaining.labels(resource=resource).set(
+                budget.remaining
+            )
 
     def _request(
         self, method="GET", url="", params={}, data={}, raise_exceptions=True
@@ -47,13 +232,51 @@ class GitHub:
         else:
             headers = {}
 
-        response = self.session.request(
-            method,
-            f"{self.REST_API_URL}/{url}",
-            headers=headers,
-            params=params,
-            json=data,
-        )
+        if method == "GET":
+            cache_key = (
+                self._get_token_hash(),
+                url,
+                tuple(sorted(params.items())),
+            )
+            cached = conditional_cache.get(cache_key)
+        else:
+            cached = None
+
+        # Writes are never held back, a cached response can't replace them
+        if method == "GET" and not self._acquire("core"):
+            if cached:
+                rate_limited_requests.labels(result="cached").inc()
+                return self._get_cached_response(cached)
+
+            rate_limited_requests.labels(result="rejected").inc()
+            raise RateLimitExceeded(url)
+
+        if cached:
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            else:
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        with span("github", method=method, endpoint=url):
+            response = self.session.request(
+                method,
+                f"{self.REST_API_URL}/{url}",
+                headers=headers,
+                params=params,
+                json=data,
+            )
+
+        self._update_rate_limit("core", response)
+
+        if method == "GET":
+            if cached and response.status_code == 304:
+                conditional_requests.labels(result="not_modified").inc()
+                response = self._get_cached_response(cached, response)
+            else:
+                conditional_requests.labels(
+                    result="modified" if cached else "uncached"
+                ).inc()
+                self._cache_response(cache_key, response)
 
         if raise_exceptions:
             if response.status_code == 401:
@@ -63,6 +286,46 @@ class GitHub:
 
         return response
 
+    def _cache_response(self, cache_key, response):
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+
+        if response.status_code != 200 or not (etag or last_modified):
+            conditional_cache.delete(cache_key)
+            return
+
+        conditional_cache.set(
+            cache_key,
+            {
+                "etag": etag,
+                "last_modified": last_modified,
+                "headers": dict(response.headers),
+                "content": response.content,
+                "url": response.url,
+            },
+        )
+
+    def _get_cached_response(self, cached, not_modified=None):
+        """
+        Returns the cached response, with the up to date headers (e.g.
+        rate limits) of the 304 response that revalidated it if any
+        """
+        response = requests.Response()
+        response.status_code = 200
+        response.url = cached["url"]
+        response.headers.update(cached["headers"])
+
+        if not_modified is not None:
+            response.headers.update(
+                (name, value)
+                for name, value in not_modified.headers.items()
+                if not name.lower().startswith("content-")
+            )
+        response._content = cached["content"]
+        response.encoding = "utf-8"
+
+        return response
+
     def _gql_request(self, query={}):
         """
         Makes a raw HTTP request and returns the response.
@@ -72,12 +335,19 @@ class GitHub:
         else:
             headers = {}
 
-        response = self.session.request(
-            "POST",
-            self.GRAPHQL_API_URL,
-            json={"query": query},
-            headers=headers,
-        )
+        if not self._acquire("graphql"):
+            rate_limited_requests.labels(result="rejected").inc()
+            raise RateLimitExceeded("graphql")
+
+        with span("github", method="POST", endpoint="graphql"):
+            response = self.session.request(
+                "POST",
+                self.GRAPHQL_API_URL,
+                json={"query": query},
+                headers=headers,
+            )
+
+        self._update_rate_limit("graphql", response)
 
         if response.status_code == 401:
             raise Unauthorized(response=response)
@@ -107,22 +377,118 @@ class GitHub:
 
         return self._gql_request(gql)["viewer"]
 
-    def get_orgs(self, end_cursor=None):
+    def _iter_pages(self, get_query, get_connection):
+        """
+        GraphQL: Yield the pages of nodes of a connection, following its
+        cursor
+        """
+        end_cursor = None
+        has_next_page = True
+
+        while has_next_page:
+            connection = get_connection(
+                self._gql_request(get_query(end_cursor))
+            )
+            page_info = connection["pageInfo"]
+
+            yield self._get_nodes(connection["edges"])
+
+            has_next_page = page_info["hasNextPage"]
+            end_cursor = page_info["endCursor"]
+
+    def _get_listing_key(self, listing, org=None):
+        return (self._get_token_hash(), listing, org)
+
+    def _list_orgs(self):
+        return list(chain.from_iterable(self.iter_orgs()))
+
+    def _list_repositories(self, org=None):
+        if org:
+            pages = self.iter_org_repositories(org)
+        else:
+            pages = self.iter_user_repositories()
+
+        return list(chain.from_iterable(pages))
+
+    def get_cached_repositories(self, org=None):
+        """
+        Return the cached repositories of the org, or of the user if org
+        is None, even if stale, or None if they aren't cached
+        """
+        return listings_cache.get_or_refresh(
+            self._get_listing_key("repositories", org),
+            self._list_repositories,
+            org,
+        )
+
+    def set_cached_repositories(self, repositories, org=None):
+        listings_cache.set(
+            self._get_listing_key("repositories", org), repositories
+        )
+
+    def iter_orgs(self):
+        """
+        Yield the pages of organizations that the authenticated user has
+        explicit permission to access.
+        """
+
+        def get_query(end_cursor):
+            return (
+                """
+                {
+                  viewer {
+                    organizations(first: 100,"""
+                + (f'after: "{end_cursor}"' if end_cursor else "")
+                + """) {
+                      edges {
+                        node {
+                          login
+                          name
+                        }
+                      }
+                      pageInfo {
+                        hasNextPage
+                        endCursor
+                      }
+                    }
+                  }
+                }
+            """
+            )
+
+        return self._iter_pages(
+            get_query, lambda data: data["viewer"]["organizations"]
+        )
+
+    def get_orgs(self):
         """
         Lists of organizations that the authenticated user has explicit
         permission to access.
         """
-        gql = (
-            """
-            {
-              viewer {
-                organizations(first: 100,"""
-            + (f'after: "{end_cursor}"' if end_cursor else "")
-            + """) {
+        return listings_cache.get_or_set(
+            self._get_listing_key("orgs"), self._list_orgs
+        )
+
+    def iter_user_repositories(self):
+        """
+        Yield the pages of public repositories from the authenticated user
+        """
+
+        def get_query(end_cursor):
+            return (
+                """{
+                  viewer {
+                    repositories(
+                        first: 100,
+                        privacy: PUBLIC,
+                    """
+                + (f'after: "{end_cursor}"' if end_cursor else "")
+                + """
+                    ) {
                   edges {
                     node {
-                      login
                       name
+                      nameWithOwner
                     }
                   }
                   pageInfo {
@@ -131,104 +497,71 @@ class GitHub:
                   }
                 }
               }
-            }
-        """
-        )
-
-        gql_response = self._gql_request(gql)["viewer"]["organizations"]
-        page_info = gql_response["pageInfo"]
-        orgs = self._get_nodes(gql_response["edges"])
-
-        if page_info["hasNextPage"]:
-            next_page = self.get_orgs(page_info["endCursor"])
-            orgs.extend(next_page)
+            }"""
+            )
 
-        return orgs
+        return self._iter_pages(
+            get_query, lambda data: data["viewer"]["repositories"]
+        )
 
-    def get_user_repositories(self, end_cursor=None):
+    def get_user_repositories(self):
         """
         Lists of public repositories from the authenticated user
         """
-        gql = (
-            """{
-              viewer {
-                repositories(
-                    first: 100,
-                    privacy: PUBLIC,
-                """
-            + (f'after: "{end_cursor}"' if end_cursor else "")
-            + """
-                ) {
-              edges {
-                node {
-                  name
-                  nameWithOwner
-                }
-              }
-              pageInfo {
-                hasNextPage
-                endCursor
-              }
-            }
-          }
-        }"""
+        return listings_cache.get_or_set(
+            self._get_listing_key("repositories"), self._list_repositories
         )
 
-        gql_response = self._gql_request(gql)["viewer"]["repositories"]
-        page_info = gql_response["pageInfo"]
-        repositories = self._get_nodes(gql_response["edges"])
-
-        if page_info["hasNextPage"]:
-            next_page = self.get_user_repositories(page_info["endCursor"])
-            repositories.extend(next_page)
+    def iter_org_repositories(self, org_login):
+        """
+        Yield the pages of public repositories from an organization of the
+        authenticated user
+        """
+
+        def get_query(end_cursor):
+            return (
+                """{
+                  viewer {
+                  organization(login: \""""
+                + org_login
+                + """") {
+                        repositories(
+                            first: 100,
+                            privacy: PUBLIC
+                        """
+                + (f'after: "{end_cursor}"' if end_cursor else "")
+                + """
+                    ) {
+                  edges {
+                    node {
+                      name
+                    }
+                    }
+                    pageInfo {
+                      hasNextPage
+                      endCursor
+                    }
+                  }
+                }
+              }
+            }"""
+            )
 
-        return repositories
+        return self._iter_pages(
+            get_query,
+            lambda data: data["viewer"]["organization"]["repositories"],
+        )
 
-    def get_org_repositories(self, org_login, end_cursor=None):
+    def get_org_repositories(self, org_login):
         """
-        Lists of public repositories from the authenticated user
+        Lists of public repositories from an organization of the
+        authenticated user
         """
-        gql = (
-            """{
-              viewer {
-              organization(login: \""""
-            + org_login
-            + """") {
-                    repositories(
-                        first: 100,
-                        privacy: PUBLIC
-                    """
-            + (f'after: "{end_cursor}"' if end_cursor else "")
-            + """
-                ) {
-              edges {
-                node {
-                  name
-                }
-                }
-                pageInfo {
-                  hasNextPage
-                  endCursor
-                }
-              }
-            }
-          }
-        }"""
+        return listings_cache.get_or_set(
+            self._get_listing_key("repositories", org_login),
+            self._list_repositories,
+            org_login,
         )
-        response = self._gql_request(gql)["viewer"]["organization"][
-            "repositories"
-        ]
-
-        page_info = response["pageInfo"]
-        repositories = self._get_nodes(response["edges"])
-
-        if page_info["hasNextPage"]:
-            next_page = self.get_org_repositories(
-                org_login, page_info["endCursor"]
-            )
-            repositories.extend(next_page)
-
-        return repositories
 
     def check_permissions_over_repo(self, owner, repo, permission="push"):
         """
@@ -261,65 +594,112 @@ class GitHub:
         elif response.status_code == 200:
             return True
 
-    def get_snapcraft_yaml_location(self, owner, repo):
-        """
-        Return the snapcraft.yaml file location in the GitHub repo
+    def get_snapcraft_yaml(self, owner, repo):
         """
+        Return the snapcraft.yaml at the head of the default branch, as a
+        dict with the "sha" of the commit, the "location" of the file and
+        its "content". The location and content are None when the repo
+        doesn't contain a snapcraft.yaml.
 
-        # It is not possible to use GraphQL without authentication
-        # for that reason we are doing a call for each location to the REST API
-        for loc in self.YAML_LOCATIONS:
+        The head is resolved by a conditional request, usually answered
+        by a 304, and the file is probed once per commit: with a single
+        GraphQL query when authenticated, from the git tree otherwise.
+        """
+        try:
             response = self._request(
-                "GET",
-                f"repos/{owner}/{repo}/contents/{loc}",
-                raise_exceptions=False,
+                "GET", f"repos/{owner}/{repo}/commits/HEAD"
             )
-            if response.status_code == 404:
-                continue
-            elif response.status_code == 200:
-                return loc
+        except HTTPError as error:
+            # The repo doesn't exist or has no commits
+            if error.response.status_code in [404, 409]:
+                return {"sha": None, "location": None, "content": None}
 
-            response.raise_for_status()
+            raise error
 
-        return False
+        sha = response.json()["sha"]
 
-    def get_default_branch(self, owner, repo):
-        response = self._request("GET", f"repos/{owner}/{repo}")
-        return response.json()["default_branch"]
+        return snapcraft_yaml_cache.get_or_set(
+            (owner, repo, sha), self._probe_snapcraft_yaml, owner, repo, sha
+        )
 
-    def get_last_commit(self, owner, repo, branch=None):
-        if not branch:
-            branch = self.get_default_branch(owner, repo)
+    def _probe_snapcraft_yaml(self, owner, repo, sha):
+        if self.access_token:
+            location, content = self._get_snapcraft_yaml_gql(owner, repo, sha)
+        else:
+            location, content = self._get_snapcraft_yaml_tree(owner, repo, sha)
 
-        response = self._request(
-            "GET", f"repos/{owner}/{repo}/commits/{branch}"
-        )
-        return response.json()["sha"]
+        return {"sha": sha, "location": location, "content": content}
 
-    def get_snapcraft_yaml_name(self, owner, repo):
+    def _get_snapcraft_yaml_gql(self, owner, repo, sha):
+        """
+        GraphQL: Return the location and content of the first
+        snapcraft.yaml found in the commit
         """
-        Return True if the name inside the yaml file match with the snap
+        objects = "".join(
+            f"""
+              location{index}: object(expression: {expression}) {{
+                ... on Blob {{
+                  text
+                }}
+              }}"""
+            for index, expression in enumerate(
+                json.dumps(f"{sha}:{loc}") for loc in self.YAML_LOCATIONS
+            )
+        )
+        gql = f"""
+        {{
+          repository(owner: {json.dumps(owner)}, name: {json.dumps(repo)}) {{
+            {objects}
+          }}
+        }}
         """
-        loc = self.get_snapcraft_yaml_location(owner, repo)
 
-        if loc:
-            # Get last commit to avoid cache issues with raw.github.com
-            last_commit = self.get_last_commit(owner, repo)
+        repository = self._gql_request(gql)["repository"] or {}
 
-            response = self.session.request(
-                "GET",
-                f"{self.RAW_CONTENT_URL}/{owner}/{repo}/{last_commit}/{loc}",
-            )
+        for index, loc in enumerate(self.YAML_LOCATIONS):
+            blob = repository.get(f"location{index}")
+
+            if blob:
+                return loc, blob["text"]
 
-            yaml = get_yaml_loader()
-            try:
-                content = yaml.load(response.content)
-            except Exception:
-                raise InvalidYAML
+        return None, None
 
-            return content.get("name")
+    def _get_snapcraft_yaml_tree(self, owner, repo, sha):
+        """
+        Return the location and content of the first snapcraft.yaml found
+        in the git tree of the commit
+        """
+        tree = self._request(
+            "GET",
+            f"repos/{owner}/{repo}/git/trees/{sha}",
+            params={"recursive": 1},
+        ).json()
+        paths = [entry["path"] for entry in tree["tree"]]
 
-        return False
+        for loc in self.YAML_LOCATIONS:
+            if loc in paths:
+                break
+
+            # The tree of very large repos is incomplete
+            if tree["truncated"]:
+                response = self._request(
+                    "GET",
+                    f"repos/{owner}/{repo}/contents/{loc}",
+                    params={"ref": sha},
+                    raise_exceptions=False,
+                )
+
+                if response.status_code == 200:
+                    break
+        else:
+            return None, None
+
+        response = self.session.request(
+            "GET", f"{self.RAW_CONTENT_URL}/{owner}/{repo}/{sha}/{loc}"
+        )
+        response.raise_for_status()
+
+        return loc, response.text
 
     def generate_webhook_secret_for_repo(self, owner, name):
         key = bytes(GITHUB_WEBHOOK_SECRET, "UTF-8")
@@ -353,19 +733,24 @@ class GitHub:
 
         return hmac.compare_digest(digest, signature)
 
-    def get_hooks(self, owner, repo, page=1):
+    def get_hooks(self, owner, repo):
         """
         Return all the webhooks in the repo
         """
-        response = self._request(
-            "GET",
-            f"repos/{owner}/{repo}/hooks",
-            params={"per_page": 100, "page": page},
-        )
-        hooks = response.json()
+        hooks = []
+        page = 1
+        has_next_page = True
+
+        while has_next_page:
+            response = self._request(
+                "GET",
+                f"repos/{owner}/{repo}/hooks",
+                params={"per_page": 100, "page": page},
+            )
+            hooks.extend(response.json())
 
-        if "next" in response.links:
-            hooks.extend(self.get_hooks(page=page + 1))
+            has_next_page = "next" in response.links
+            page += 1
 
         return hooks
 
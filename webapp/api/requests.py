@@ -1,24 +1,347 @@
+import json
 import os
+import threading
+import time
+from collections import deque
+from concurrent import futures
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
 
+import flask
+import prometheus_client
 import requests
 
-from pybreaker import CircuitBreaker, CircuitBreakerError
+from pybreaker import (
+    STATE_HALF_OPEN,
+    STATE_OPEN,
+    CircuitBreaker,
+    CircuitBreakerError,
+    CircuitBreakerListener,
+)
 from webapp.api.exceptions import (
     ApiCircuitBreaker,
     ApiConnectionError,
     ApiTimeoutError,
 )
+from webapp.tracing import span
+
+# Adaptive timeouts: once enough requests to an upstream succeeded, the
+# timeout becomes a multiple of their 99th percentile latency, within
+# [MIN_TIMEOUT, timeout given by the caller]
+LATENCY_SAMPLES = 200
+MIN_LATENCY_SAMPLES = 20
+LATENCY_PERCENTILE = 0.99
+TIMEOUT_FACTOR = 3
+MIN_TIMEOUT = 2
+
+# Hedged requests: when enabled on a session, a second attempt of a GET
+# request is sent if the first one didn't answer after the 95th
+# percentile latency of the upstream
+HEDGE_PERCENTILE = 0.95
+HEDGE_WORKERS = 32
+
+BREAKER_STATES = {"closed": 0, "half-open": 1, "open": 2}
+
+# Path prefixes grouping routes, whatever comes after them
+ROUTE_PREFIXES = {"api", "dev", "devel", "rest", "v1", "v2"}
+
+# Top-level routes of the APIs, on their own or after a prefix. Paths
+# starting with anything else, e.g. the owner of a repo on
+# raw.githubusercontent.com, are part of the OTHER_ROUTES family.
+ROUTE_FAMILIES = {
+    "acl",
+    "graphql",
+    "orgs",
+    "repos",
+    "snaps",
+    "tokens",
+    "user",
+    "users",
+}
+OTHER_ROUTES = "other"
+
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 30)
+
+# The metrics are aggregated across the gunicorn workers by talisker when
+# prometheus_multiproc_dir is set, see the entrypoint
+request_duration = prometheus_client.Histogram(
+    "api_request_duration_seconds",
+    "Duration of the requests to an upstream, errors included",
+    ["upstream", "route", "method"],
+    buckets=DURATION_BUCKETS,
+)
+
+responses_total = prometheus_client.Counter(
+    "api_responses",
+    "A counter of the requests to an upstream, by status code or error",
+    ["upstream", "route", "method", "status"],
+)
+
+retries_total = prometheus_client.Counter(
+    "api_request_retries",
+    "A counter of the requests sent again to an upstream",
+    ["upstream", "route", "method"],
+)
+
+breaker_state = prometheus_client.Gauge(
+    "api_breaker_state",
+    "State of the circuit breaker of an upstream: 0 closed, 1 half-open, "
+    "2 open",
+    ["upstream", "route"],
+    multiprocess_mode="liveall",
+)
+
+breaker_trips = prometheus_client.Counter(
+    "api_breaker_trips",
+    "A counter of circuit breakers opening",
+    ["upstream", "route"],
+)
+
+
+class _BreakerMetrics(CircuitBreakerListener):
+    def __init__(self, upstream, route):
+        self.labels = {"upstream": upstream, "route": route}
+
+    def state_change(self, cb, old_state, new_state):
+        breaker_state.labels(**self.labels).set(BREAKER_STATES[new_state.name])
+
+        if new_state.name == "open":
+            breaker_trips.labels(**self.labels).inc()
+
+
+class ConcurrentCircuitBreaker(CircuitBreaker):
+    """pybreaker holds a lock for the whole duration of `call`, so only one
+    request at a time could go through a breaker. Here the lock is only
+    held to check and update the state of the breaker, not while `func`
+    runs.
+
+    Once the reset timeout elapsed, a single trial call goes through the
+    half-open breaker, the other calls fail until it answers.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._trial_call = False
+
+    def call(self, func, *args, **kwargs):
+        with self._lock:
+            state = self.state
+
+            if state.name == STATE_OPEN:
+                reset_at = self._state_storage.opened_at + timedelta(
+                    seconds=self.reset_timeout
+                )
+
+                if datetime.utcnow() < reset_at:
+                    raise CircuitBreakerError(
+                        "Timeout not elapsed yet, circuit breaker still open"
+                    )
+
+                self.half_open()
+                state = self.state
+
+            trial_call = state.name == STATE_HALF_OPEN
+
+            if trial_call:
+                if self._trial_call:
+                    raise CircuitBreakerError(
+                        "Trial call in progress, circuit breaker half-open"
+                    )
+
+                self._trial_call = True
+
+            for listener in self.listeners:
+                listener.before_call(self, func, *args, **kwargs)
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as error:
+            with self._lock:
+                if trial_call:
+                    self._trial_call = False
+
+                # The outcome of calls started before the last state
+                # change doesn't count
+                if self.state is not state:
+                    raise
+
+                state._handle_error(error)
+        else:
+            with self._lock:
+                if trial_call:
+                    self._trial_call = False
+
+                if self.state is state:
+                    state._handle_success()
+
+        return result
+
+
+class Upstream:
+    """An upstream host and route family
+
+    Each upstream has its own circuit breaker, so failures of one
+    dependency don't close the requests to the others, and keeps the
+    latencies of its last successful requests to adapt its timeout.
+    """
+
+    def __init__(self, host, route, adaptive_timeouts=True):
+        self.host = host
+        self.route = route
+        self.adaptive_timeouts = adaptive_timeouts
+        self.breaker = ConcurrentCircuitBreaker(
+            fail_max=5,
+            reset_timeout=60,
+            listeners=[_BreakerMetrics(host, route)],
+        )
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def observe(self, seconds):
+        self.latencies.append(seconds)
+
+    def record(self, method, status, seconds=None):
+        """Export the outcome of a request to prometheus"""
+        labels = {"upstream": self.host, "route": self.route, "method": method}
+
+        if seconds is not None:
+            request_duration.labels(**labels).observe(seconds)
+
+        responses_total.labels(status=status, **labels).inc()
+
+    def percentile(self, percentile):
+        latencies = sorted(self.latencies)
+
+        if not latencies:
+            return None
+
+        return latencies[
+            min(int(len(latencies) * percentile), len(latencies) - 1)
+        ]
+
+    def get_timeout(self, timeout):
+        """Get the timeout to use, `timeout` being the maximum"""
+        if (
+            timeout is None
+            or not self.adaptive_timeouts
+            or len(self.latencies) < MIN_LATENCY_SAMPLES
+        ):
+            return timeout
+
+        adaptive_timeout = self.percentile(LATENCY_PERCENTILE) * TIMEOUT_FACTOR
+
+        return min(max(adaptive_timeout, MIN_TIMEOUT), timeout)
+
+
+def set_request_deadline(seconds):
+    """Give all the API calls of the current request a shared time budget"""
+    flask.g.api_deadline = time.monotonic() + seconds
+
+
+def get_remaining_time():
+    """Get the time left for API calls of the current request, or None"""
+    if not flask.has_request_context() or "api_deadline" not in flask.g:
+        return None
+
+    return flask.g.api_deadline - time.monotonic()
+
+
+def get_route_family(path):
+    """Get the first segment of a path, or the first two if the first one
+    is a prefix, e.g. /v2/snaps/info/toto is part of the v2/snaps family
+    and /repos/owner/name part of the repos family.
+
+    Route families are used as metric labels and to group the requests
+    to an upstream, so they must not include names: only the segments
+    known in ROUTE_PREFIXES and ROUTE_FAMILIES are kept, e.g.
+    /devel/~owner/+snap/toto is part of the devel family and
+    /owner/repo/sha/snapcraft.yaml of the other family.
+    """
+    parts = [part for part in path.split("/") if part][:2]
+
+    if not parts:
+        return ""
+
+    if parts[0] in ROUTE_FAMILIES:
+        return parts[0]
+
+    if parts[0] not in ROUTE_PREFIXES:
+        return OTHER_ROUTES
+
+    if len(parts) == 2 and (
+        parts[1] in ROUTE_PREFIXES or parts[1] in ROUTE_FAMILIES
+    ):
+        return "/".join(parts)
+
+    return parts[0]
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.waiters = 0
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Share the result of identical calls made at the same time
+
+    The first caller for a key runs the function, the callers arriving
+    while it runs wait for it and get the same result or exception.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+
+        if not leader:
+            call.done.wait()
+
+            if call.error:
+                raise call.error
+
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result
 
 
 class BaseSession:
     """A base session interface to implement common functionality
 
     Create an interface to manage exceptions and return API exceptions
+
+    Sessions given a `name` have their own upstreams in the metrics, e.g.
+    background jobs that shouldn't share the circuit breakers and
+    latencies of the requests of visitors. With `adaptive_timeouts` off,
+    the timeout given by the caller is always used.
     """
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, name=None, adaptive_timeouts=True, **kwargs):
         super().__init__(*args, **kwargs)
 
+        self.name = name
+        self.adaptive_timeouts = adaptive_timeouts
+
         # TODO allow user to choose it's own user agent
         storefront_header = "storefront ({commit_hash};{environment})".format(
             commit_hash=os.getenv("COMMIT_ID", "commit_id"),
@@ -27,32 +350,164 @@ class BaseSession:
 
         headers = {"User-Agent": storefront_header}
         self.headers.update(headers)
-        self.api_breaker = CircuitBreaker(fail_max=5, reset_timeout=60)
+        self.upstreams = {}
+        self.upstreams_lock = threading.Lock()
+        self.single_flight = SingleFlight()
+        self.hedge_requests = False
+        self.hedge_executor = futures.ThreadPoolExecutor(
+            max_workers=HEDGE_WORKERS
+        )
+
+    def get_upstream(self, url):
+        parsed_url = urlparse(url)
+        key = (parsed_url.netloc, get_route_family(parsed_url.path))
+
+        with self.upstreams_lock:
+            if key not in self.upstreams:
+                host, route = key
+
+                if self.name:
+                    host = f"{self.name}@{host}"
+
+                self.upstreams[key] = Upstream(
+                    host, route, self.adaptive_timeouts
+                )
+
+        return self.upstreams[key]
 
     def request(self, method, url, timeout=12, **kwargs):
+        parsed_url = urlparse(url)
+
+        with span(
+            "api",
+            method=method.upper(),
+            upstream=parsed_url.netloc,
+            path=parsed_url.path,
+        ) as current_span:
+            # Identical GET requests in flight share the same upstream
+            # request
+            if method.upper() == "GET" and not kwargs.get("stream"):
+                key = (url, json.dumps(kwargs, sort_keys=True, default=str))
+
+                response = self.single_flight.do(
+                    key, self._request, method, url, timeout, **kwargs
+                )
+            else:
+                response = self._request(method, url, timeout, **kwargs)
+
+            if current_span:
+                current_span.attributes["status"] = response.status_code
+
+        return response
+
+    def _request(self, method, url, timeout, **kwargs):
+        upstream = self.get_upstream(url)
+        timeout = upstream.get_timeout(timeout)
+
+        remaining_time = get_remaining_time()
+        if remaining_time is not None:
+            if remaining_time <= 0:
+                raise ApiTimeoutError(
+                    "No time left in the request deadline for {}".format(url)
+                )
+
+            timeout = (
+                remaining_time
+                if timeout is None
+                else min(timeout, remaining_time)
+            )
+
+        hedge_delay = upstream.percentile(HEDGE_PERCENTILE)
+        if (
+            self.hedge_requests
+            and method.upper() == "GET"
+            and not kwargs.get("stream")
+            and len(upstream.latencies) >= MIN_LATENCY_SAMPLES
+            and (timeout is None or hedge_delay < timeout)
+        ):
+            return self._hedged_request(
+                upstream, hedge_delay, method, url, timeout, **kwargs
+            )
+
+        return self._send_request(upstream, method, url, timeout, **kwargs)
+
+    def _hedged_request(self, upstream, delay, method, url, timeout, **kwargs):
+        """Send the request, and send it a second time if no response came
+        after `delay`. The first successful response is returned.
+        """
+        attempts = [
+            self.hedge_executor.submit(
+                self._send_request, upstream, method, url, timeout, **kwargs
+            )
+        ]
+
+        done, _ = futures.wait(attempts, timeout=delay)
+        if not done:
+            if timeout is not None:
+                timeout -= delay
+
+            retries_total.labels(
+                upstream=upstream.host,
+                route=upstream.route,
+                method=method.upper(),
+            ).inc()
+
+            attempts.append(
+                self.hedge_executor.submit(
+                    self._send_request,
+                    upstream,
+                    method,
+                    url,
+                    timeout,
+                    **kwargs,
+                )
+            )
+
+        error = None
+        for attempt in futures.as_completed(attempts):
+            if attempt.exception() is None:
+                return attempt.result()
+
+            error = error or attempt.exception()
+
+        raise error
+
+    def _send_request(self, upstream, method, url, timeout, **kwargs):
+        method = method.upper()
+        start = time.monotonic()
+
         try:
-            request = self.api_breaker.call(
+            request = upstream.breaker.call(
                 super().request,
                 method=method,
                 url=url,
                 timeout=timeout,
-                **kwargs
+                **kwargs,
             )
         except requests.exceptions.Timeout:
+            upstream.record(method, "timeout", time.monotonic() - start)
             raise ApiTimeoutError(
                 "The request to {} took too long".format(url)
             )
         except requests.exceptions.ConnectionError:
+            upstream.record(
+                method, "connection_error", time.monotonic() - start
+            )
             raise ApiConnectionError(
                 "Failed to establish connection to {}.".format(url)
             )
         except CircuitBreakerError:
+            upstream.record(method, "circuit_breaker")
             raise ApiCircuitBreaker(
                 "Requests are closed because of too many failures {}".format(
                     url
                 )
             )
 
+        duration = time.monotonic() - start
+        upstream.observe(duration)
+        upstream.record(method, str(request.status_code), duration)
+
         return request
 
 
@@ -4,10 +4,14 @@ A Flask application for snapcraft.io.
 The web frontend for the snap store.
 """
 
+import functools
+
 import talisker.requests
 import webapp.api
+from webapp import template_utils
 from canonicalwebteam.flask_base.app import FlaskBase
 from webapp.blog.views import init_blog
+from webapp.content import init_content
 from webapp.docs.views import init_docs
 from webapp.extensions import csrf
 from webapp.first_snap.views import first_snap
@@ -20,6 +24,7 @@ from webapp.admin.views import admin
 from webapp.publisher.views import account
 from webapp.snapcraft.views import snapcraft_blueprint
 from webapp.store.views import store_blueprint
+from webapp.tracing import init_tracing
 from webapp.tutorials.views import init_tutorials
 
 
@@ -42,6 +47,9 @@ def create_app(testing=False):
         talisker.requests.configure(webapp.helpers.api_publisher_session)
 
     app.config.from_object("webapp.configs." + app.config["WEBAPP"])
+    init_content(app)
+    template_utils.load_static_manifest()
+    init_tracing(app)
     set_handlers(app)
 
     if app.config["WEBAPP"] == "snapcraft":
@@ -49,9 +57,20 @@ def create_app(testing=False):
     else:
         init_brandstore(app)
 
+    init_api_deadlines(app)
+
     return app
 
 
+def init_api_deadlines(app):
+    for blueprint, seconds in app.config["API_DEADLINES"].items():
+        app.before_request_funcs.setdefault(blueprint, []).append(
+            functools.partial(
+                webapp.api.requests.set_request_deadline, seconds
+            )
+        )
+
+
 def init_brandstore(app):
     store = app.config.get("WEBAPP_CONFIG").get("STORE_QUERY")
     app.register_blueprint(store_blueprint(store))
@@ -11,7 +11,7 @@ from canonicalwebteam.blog import (
 from dateutil import parser
 from requests.exceptions import RequestException
 
-from webapp.helpers import get_yaml
+from webapp.content import content_store
 
 
 def init_blog(app, url_prefix):
@@ -40,7 +40,7 @@ def init_blog(app, url_prefix):
         blog_articles = None
         articles = []
 
-        third_party_blogs = get_yaml("blog/content/blog-posts.yaml")
+        third_party_blogs = content_store.get_blog_posts()
 
         if third_party_blogs and snap in third_party_blogs:
             post = third_party_blogs[snap]
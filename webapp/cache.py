@@ -0,0 +1,349 @@
+import hashlib
+import os
+import pickle
+import random
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import prometheus_client
+
+cache_hits = prometheus_client.Counter(
+    "cache_hits", "A counter of in-process cache hits", ["cache"]
+)
+
+cache_misses = prometheus_client.Counter(
+    "cache_misses", "A counter of in-process cache misses", ["cache"]
+)
+
+cache_shared_hits = prometheus_client.Counter(
+    "cache_shared_hits",
+    "A counter of in-process cache misses found in the shared store",
+    ["cache"],
+)
+
+# Directory of the store shared by the workers, set by the entrypoint,
+# preferably on a tmpfs such as /dev/shm
+SHARED_CACHE_DIRECTORY = os.getenv("SHARED_CACHE_DIRECTORY")
+
+# Probability for a write to the shared store to trigger a cleanup
+PRUNE_PROBABILITY = 0.01
+
+
+class SharedStore:
+    """
+    Cache entries shared by all the worker processes of a host, so they
+    are computed once and survive the recycling of the workers.
+
+    Each entry is a pickle file written atomically in a directory per
+    namespace. Namespaces are pruned to their `maxsize` newest entries
+    from time to time.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, namespace, key):
+        key_hash = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+
+        return os.path.join(self.directory, namespace, key_hash)
+
+    def get(self, namespace, key):
+        """
+        Returns a tuple (value, created_at) for the key, or None
+        """
+        try:
+            with open(self._path(namespace, key), "rb") as entry_file:
+                entry_key, value, created_at = pickle.load(entry_file)
+        except Exception:
+            return None
+
+        # Different keys with the same hash
+        if entry_key != repr(key):
+            return None
+
+        return value, created_at
+
+    def set(self, namespace, key, value, created_at, maxsize=None):
+        path = self._path(namespace, key)
+        directory = os.path.dirname(path)
+
+        try:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+            descriptor, tmp_path = tempfile.mkstemp(dir=directory)
+
+            with os.fdopen(descriptor, "wb") as entry_file:
+                pickle.dump((repr(key), value, created_at), entry_file)
+
+            os.replace(tmp_path, path)
+        except Exception:
+            # The shared store is only an optimisation
+            return
+
+        if maxsize and random.random() < PRUNE_PROBABILITY:
+            self.prune(namespace, maxsize)
+
+    def delete(self, namespace, key):
+        try:
+            os.remove(self._path(namespace, key))
+        except OSError:
+            pass
+
+    def _entries(self, namespace):
+        try:
+            return list(os.scandir(os.path.join(self.directory, namespace)))
+        except OSError:
+            return []
+
+    def prune(self, namespace, maxsize):
+        entries = []
+
+        for entry in self._entries(namespace):
+            try:
+                entries.append((entry.stat().st_mtime, entry.path))
+            except OSError:
+                continue
+
+        entries.sort(reverse=True)
+
+        for _, path in entries[maxsize:]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def clear(self, namespace):
+        for entry in self._entries(namespace):
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+_shared_store = None
+
+
+def get_shared_store():
+    """
+    Returns the store shared by the workers, or None if it isn't
+    configured
+    """
+    global _shared_store
+
+    if _shared_store is None and SHARED_CACHE_DIRECTORY:
+        _shared_store = SharedStore(SHARED_CACHE_DIRECTORY)
+
+    return _shared_store
+
+
+class Cache:
+    """
+    A bounded LRU cache where every entry expires after `ttl` seconds, or
+    never if `ttl` is None.
+
+    Entries older than `ttl` but younger than `ttl + stale_ttl` are still
+    served by `get_or_set` while a single background refresh replaces
+    them (stale-while-revalidate).
+
+    The cache holds at most `maxsize` entries. If `maxweight` is set, the
+    total of `weigher(value)` over all entries is bounded as well.
+
+    If `shared` is set, entries are also written to the store shared by
+    the workers, where in-process misses are looked up.
+    """
+
+    def __init__(
+        self,
+        name,
+        maxsize=1024,
+        ttl=60,
+        stale_ttl=0,
+        maxweight=None,
+        weigher=len,
+        shared=False,
+    ):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.maxweight = maxweight
+        self.weigher = weigher
+        self.weight = 0
+        self.hits = 0
+        self.misses = 0
+        self.shared_store = get_shared_store() if shared else None
+
+        self._entries = OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _lookup(self, key):
+        """
+        Returns a tuple (value, age) for the key, or None if the key is
+        missing or too old to be served
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None:
+                value, created_at, _ = entry
+                age = time.monotonic() - created_at
+
+                if not self._is_expired(age):
+                    self._entries.move_to_end(key)
+                    return value, age
+
+                self._pop(key)
+
+        return self._lookup_shared(key)
+
+    def _lookup_shared(self, key):
+        if not self.shared_store:
+            return None
+
+        entry = self.shared_store.get(self.name, key)
+
+        if entry is None:
+            return None
+
+        value, created_at = entry
+        age = time.time() - created_at
+
+        if self._is_expired(age):
+            return None
+
+        cache_shared_hits.labels(cache=self.name).inc()
+        self._store(key, value, time.monotonic() - age)
+
+        return value, age
+
+    def _is_expired(self, age):
+        return self.ttl is not None and age >= self.ttl + self.stale_ttl
+
+    def _is_stale(self, age):
+        return self.ttl is not None and age >= self.ttl
+
+    def _pop(self, key):
+        entry = self._entries.pop(key, None)
+
+        if entry is not None:
+            self.weight -= entry[2]
+
+    def _record(self, hit):
+        if hit:
+            self.hits += 1
+            cache_hits.labels(cache=self.name).inc()
+        else:
+            self.misses += 1
+            cache_misses.labels(cache=self.name).inc()
+
+    def get(self, key, default=None):
+        """
+        Returns the fresh value stored for the key, or `default`
+        """
+        entry = self._lookup(key)
+
+        if entry is None or self._is_stale(entry[1]):
+            self._record(False)
+            return default
+
+        self._record(True)
+        return entry[0]
+
+    def _store(self, key, value, created_at):
+        weight = self.weigher(value) if self.maxweight else 0
+
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = (value, created_at, weight)
+            self.weight += weight
+
+            while len(self._entries) > self.maxsize or (
+                self.maxweight and self.weight > self.maxweight
+            ):
+                self._pop(next(iter(self._entries)))
+
+    def set(self, key, value):
+        self._store(key, value, time.monotonic())
+
+        if self.shared_store:
+            self.shared_store.set(
+                self.name, key, value, time.time(), self.maxsize
+            )
+
+    def delete(self, key):
+        with self._lock:
+            self._pop(key)
+
+        if self.shared_store:
+            self.shared_store.delete(self.name, key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.weight = 0
+
+        if self.shared_store:
+            self.shared_store.clear(self.name)
+
+    def _refresh(self, key, func, args, kwargs):
+        try:
+            self.set(key, func(*args, **kwargs))
+        except Exception:
+            # Keep serving the stale value until it expires
+            pass
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def get_or_set(self, key, func, *args, **kwargs):
+        """
+        Returns the value stored for the key. On a miss `func` is called
+        with the remaining arguments and its result is stored. Exceptions
+        raised by `func` are never cached.
+        """
+        entry = self._lookup(key)
+
+        if entry is None:
+            self._record(False)
+            value = func(*args, **kwargs)
+            self.set(key, value)
+            return value
+
+        return self._serve(key, entry, func, args, kwargs)
+
+    def get_or_refresh(self, key, func, *args, **kwargs):
+        """
+        Returns the value stored for the key, or None on a miss. Like in
+        `get_or_set`, stale values are served while `func` refreshes them
+        in the background, but `func` is never called on a miss.
+        """
+        entry = self._lookup(key)
+
+        if entry is None:
+            self._record(False)
+            return None
+
+        return self._serve(key, entry, func, args, kwargs)
+
+    def _serve(self, key, entry, func, args, kwargs):
+        value, age = entry
+        self._record(True)
+
+        if self._is_stale(age):
+            with self._lock:
+                refresh = key not in self._refreshing
+                self._refreshing.add(key)
+
+            if refresh:
+                threading.Thread(
+                    target=self._refresh,
+                    args=(key, func, args, kwargs),
+                    daemon=True,
+                ).start()
+
+        return value
@@ -25,6 +25,20 @@ SEND_FILE_MAX_AGE_DEFAULT = 10 * 365 * 24 * 60 * 60
 
 CONTENT_DIRECTORY = {"PUBLISHER_PAGES": "store/content/publishers/"}
 
+# Time budget in seconds shared by all the API calls of a request,
+# per blueprint
+API_DEADLINES = {
+    "store": 15,
+    "snapcraft": 15,
+    "publisher_snaps": 30,
+    "account": 30,
+    "github": 30,
+}
+
+# Requests slower than this, in milliseconds, are logged with their
+# span tree
+SLOW_REQUEST_THRESHOLD = int(os.getenv("SLOW_REQUEST_THRESHOLD", 2000))
+
 # Docs search
 SEARCH_API_KEY = os.getenv("SEARCH_API_KEY")
 SEARCH_API_URL = "https://www.googleapis.com/customsearch/v1"
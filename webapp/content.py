@@ -0,0 +1,142 @@
+import os
+
+import flask
+from webapp.helpers import get_yaml_loader
+
+ROOT_PATH = os.path.dirname(os.path.abspath(__file__))
+
+PRELOAD_DIRECTORIES = [
+    "store/content/developers/",
+    "store/content/distros/",
+    "snapcraft/content/",
+    "blog/content/",
+    "publisher/content/",
+]
+
+
+class FrozenDict(dict):
+    """
+    A dict that can't be modified once created. Being a dict subclass, it
+    can still be serialized to JSON and used in templates.
+    """
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError("FrozenDict can't be modified, copy it first")
+
+    __setitem__ = _immutable
+    __delitem__ = _immutable
+    clear = _immutable
+    pop = _immutable
+    popitem = _immutable
+    setdefault = _immutable
+    update = _immutable
+
+
+def freeze(data):
+    """
+    Recursively converts dicts to FrozenDict and lists to tuples
+    """
+    if isinstance(data, dict):
+        return FrozenDict((key, freeze(value)) for key, value in data.items())
+
+    if isinstance(data, list):
+        return tuple(freeze(value) for value in data)
+
+    return data
+
+
+class ContentStore:
+    """
+    YAML content files are parsed once, and only parsed again when the
+    modification time of the file changes. The parsed data is frozen as
+    it is shared between all the requests.
+    """
+
+    def __init__(self, root_path=ROOT_PATH):
+        self.root_path = root_path
+        self._files = {}
+
+    def preload(self, directories):
+        """
+        Parses all the YAML files of the directories
+        """
+        for directory in directories:
+            path = os.path.join(self.root_path, directory)
+
+            if not os.path.isdir(path):
+                continue
+
+            for filename in sorted(os.listdir(path)):
+                if filename.endswith(".yaml"):
+                    self.get_yaml(os.path.join(directory, filename))
+
+    def get_yaml(self, filename):
+        """
+        Returns the frozen content of a YAML file, or None if the file
+        doesn't exist or can't be parsed
+
+        Keyword arguments:
+        filename -- path of the file, relative to the webapp directory
+        """
+        filepath = os.path.join(self.root_path, filename)
+
+        try:
+            mtime = os.stat(filepath).st_mtime_ns
+        except OSError:
+            self._files.pop(filepath, None)
+            return None
+
+        cached = self._files.get(filepath)
+
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        try:
+            with open(filepath, "r") as f:
+                data = freeze(get_yaml_loader("safe").load(f))
+        except Exception:
+            data = None
+
+        self._files[filepath] = (mtime, data)
+
+        return data
+
+    def _publisher_pages_path(self):
+        return flask.current_app.config["CONTENT_DIRECTORY"]["PUBLISHER_PAGES"]
+
+    def get_publisher(self, publisher):
+        return self.get_yaml(f"{self._publisher_pages_path()}{publisher}.yaml")
+
+    def get_publisher_snaps(self, publisher):
+        return self.get_yaml(
+            f"{self._publisher_pages_path()}{publisher}-snaps.yaml"
+        )
+
+    def get_snap_developer(self, snap_name):
+        developers = self.get_yaml("store/content/developers/snaps.yaml")
+
+        if developers:
+            return developers.get(snap_name)
+
+        return None
+
+    def get_distro(self, distro):
+        return self.get_yaml(f"store/content/distros/{distro}.yaml")
+
+    def get_livestreams(self):
+        return self.get_yaml("snapcraft/content/snapcraft_live.yaml")
+
+    def get_blog_posts(self):
+        return self.get_yaml("blog/content/blog-posts.yaml")
+
+    def get_listing_tour(self):
+        return self.get_yaml("publisher/content/listing_tour.yaml")
+
+
+content_store = ContentStore()
+
+
+def init_content(app):
+    content_store.preload(
+        list(app.config["CONTENT_DIRECTORY"].values()) + PRELOAD_DIRECTORIES
+    )
@@ -0,0 +1,14 @@
+"""
+gunicorn server hooks, see the entrypoint
+"""
+
+from webapp import config
+
+
+def post_worker_init(worker):
+    # Claim the queued builds as soon as the worker boots: jobs left by
+    # a recycled worker or an expired lease don't wait for traffic
+    if config.WEBAPP == "snapcraft":
+        from webapp.publisher.snaps.build_views import build_queue
+
+        build_queue.start()
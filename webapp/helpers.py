@@ -1,17 +1,142 @@
 import json
 import os
+import threading
+import time
+from hashlib import md5
 
 import flask
 from canonicalwebteam.launchpad import Launchpad
 from ruamel.yaml import YAML
 from webapp.api.requests import PublisherSession, Session
+from webapp.cache import Cache, get_shared_store
 
 _yaml = YAML(typ="rt")
 _yaml_safe = YAML(typ="safe")
 api_session = Session()
 api_publisher_session = PublisherSession()
 
-launchpad = Launchpad(
+
+class CachedLaunchpad(Launchpad):
+    """
+    Launchpad client caching the lookups of snaps and builders, which
+    rarely change, for `CACHE_TTLS` seconds.
+
+    The snaps and builds created or deleted through this client
+    invalidate the entries they affect. Each key has a generation,
+    stored in the store shared by the workers, that is part of the
+    cache keys: invalidating a key bumps its generation so no worker
+    serves the previous entries.
+    """
+
+    CACHE_TTLS = {
+        "get_snap_by_store_name": 300,
+        "get_snap": 300,
+        "get_snap_build_status": 30,
+        "get_builders_status": 60,
+    }
+    GENERATIONS_NAMESPACE = "launchpad_generations"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.caches = {
+            method: Cache(f"launchpad_{method}", ttl=ttl, shared=True)
+            for method, ttl in self.CACHE_TTLS.items()
+        }
+        self.shared_store = get_shared_store()
+        self.generations = {}
+        self.generations_lock = threading.Lock()
+
+    def _get_generation(self, key):
+        if self.shared_store:
+            entry = self.shared_store.get(self.GENERATIONS_NAMESPACE, key)
+            return entry[0] if entry else 0
+
+        return self.generations.get(key, 0)
+
+    def invalidate(self, *keys):
+        with self.generations_lock:
+            for key in keys:
+                generation = time.time()
+
+                if self.shared_store:
+                    self.shared_store.set(
+                        self.GENERATIONS_NAMESPACE,
+                        key,
+                        generation,
+                        generation,
+                        maxsize=4096,
+                    )
+                else:
+                    self.generations[key] = generation
+
+    def clear_cache(self):
+        for cache in self.caches.values():
+            cache.clear()
+
+        self.generations.clear()
+
+    def _cached(self, method, key, *args):
+        generation = self._get_generation(key)
+
+        return self.caches[method].get_or_set(
+            (generation, *args), getattr(super(), method), *args
+        )
+
+    def get_snap_by_store_name(self, snap_name):
+        return self._cached(
+            "get_snap_by_store_name", ("snap", snap_name), snap_name
+        )
+
+    def get_snap(self, name):
+        return self._cached("get_snap", ("lp_snap", name), name)
+
+    def get_snap_build_status(self, snap_name):
+        return self._cached(
+            "get_snap_build_status", ("builds", snap_name), snap_name
+        )
+
+    def get_builders_status(self):
+        return self._cached("get_builders_status", ("builders",))
+
+    def create_snap(self, snap_name, git_url, macaroon):
+        try:
+            return super().create_snap(snap_name, git_url, macaroon)
+        finally:
+            lp_snap_name = md5(git_url.encode("UTF-8")).hexdigest()
+            self.invalidate(
+                ("snap", snap_name),
+                ("lp_snap", lp_snap_name),
+                ("builds", snap_name),
+            )
+
+    def delete_snap(self, snap_name):
+        lp_snap = self.get_snap_by_store_name(snap_name)
+
+        try:
+            return super().delete_snap(snap_name)
+        finally:
+            keys = [("snap", snap_name), ("builds", snap_name)]
+
+            if lp_snap:
+                keys.append(("lp_snap", lp_snap["name"]))
+
+            self.invalidate(*keys)
+
+    def build_snap(self, snap_name):
+        try:
+            return super().build_snap(snap_name)
+        finally:
+            self.invalidate(("builds", snap_name), ("builders",))
+
+    def cancel_snap_builds(self, snap_name):
+        try:
+            return super().cancel_snap_builds(snap_name)
+        finally:
+            self.invalidate(("builds", snap_name), ("builders",))
+
+
+launchpad = CachedLaunchpad(
     username=os.getenv("LP_API_USERNAME"),
     token=os.getenv("LP_API_TOKEN"),
     secret=os.getenv("LP_API_TOKEN_SECRET"),
@@ -1,3 +1,6 @@
+import hashlib
+import re
+
 from mistune import (
     BlockGrammar,
     BlockLexer,
@@ -7,7 +10,7 @@ from mistune import (
     _pure_pattern,
     InlineLexer,
 )
-import re
+from webapp.cache import Cache
 
 
 class DescriptionBlockGrammar(BlockGrammar):
@@ -138,5 +141,18 @@ parser = Markdown(
 )
 
 
+# Descriptions only change when a publisher edits the listing. Rendered
+# HTML is kept by content hash and bounded to 16MB of text.
+description_cache = Cache(
+    "markdown_description",
+    maxsize=10000,
+    ttl=None,
+    maxweight=16 * 2**20,
+    shared=True,
+)
+
+
 def parse_markdown_description(content):
-    return parser(content)
+    key = hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+    return description_cache.get_or_set(key, parser, content)
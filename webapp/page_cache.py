@@ -0,0 +1,96 @@
+"""
+Pages rendered for anonymous visitors are the same for everyone, so
+they can be rendered once and served from a cache until they expire.
+Stale pages are served while a background thread renders them again.
+"""
+
+import functools
+
+import flask
+
+
+# Headers of the rendered page that aren't replayed from the cache: the
+# cookies are set for the visitor who rendered the page
+UNCACHED_HEADERS = {"content-length", "set-cookie"}
+
+
+class _UncacheableResponse(Exception):
+    def __init__(self, response):
+        self.response = response
+
+
+def is_linux(user_agent):
+    return "Linux" in user_agent and "Android" not in user_agent
+
+
+def cache_page(cache, query_args=(), vary_platform=False):
+    """
+    Decorator caching the responses of a view for anonymous visitors
+
+    Only successful responses are cached, with their headers, keyed by
+    host URL, path, the values of `query_args` and, if `vary_platform` is
+    set, whether the visitor is on Linux. The templates render the host
+    URL, so the pages of each host are cached apart. The cache is bypassed
+    when the session isn't empty.
+    """
+
+    def decorator(view):
+        def render(app, environ, args, kwargs):
+            if flask.has_request_context():
+                response = flask.make_response(view(*args, **kwargs))
+            else:
+                # Refreshing a stale page, in a background thread
+                with app.request_context(environ):
+                    response = flask.make_response(view(*args, **kwargs))
+
+            # Pages rendered from stale data while an upstream is down
+            # set g.degraded
+            if (
+                response.status_code != 200
+                or response.is_streamed
+                or flask.session
+                or flask.g.get("degraded")
+            ):
+                raise _UncacheableResponse(response)
+
+            headers = [
+                (name, value)
+                for name, value in response.headers
+                if name.lower() not in UNCACHED_HEADERS
+            ]
+
+            return response.get_data(), headers
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if flask.session or flask.request.method != "GET":
+                return view(*args, **kwargs)
+
+            user_agent = flask.request.headers.get("User-Agent", "")
+            key = (
+                flask.request.host_url,
+                flask.request.path,
+                tuple(
+                    tuple(flask.request.args.getlist(arg))
+                    for arg in query_args
+                ),
+                is_linux(user_agent) if vary_platform else None,
+            )
+
+            try:
+                body, headers = cache.get_or_set(
+                    key,
+                    render,
+                    flask.current_app._get_current_object(),
+                    dict(flask.request.environ),
+                    args,
+                    kwargs,
+                )
+            except _UncacheableResponse as uncacheable:
+                return uncacheable.response
+
+            return flask.Response(body, headers=headers)
+
+        return wrapper
+
+    return decorator
@@ -1,5 +1,10 @@
+import json
+
 import flask
+from requests.exceptions import HTTPError
+from webapp.api.exceptions import ApiError
 from webapp.api.github import GitHub
+from webapp.api.requests import set_request_deadline
 from webapp.decorators import login_required
 from werkzeug.exceptions import Unauthorized
 
@@ -26,3 +31,77 @@ def get_repos():
         )
 
     return flask.jsonify(repos)
+
+
+@publisher_github.route("/publisher/github/get-repos.ndjson", methods=["GET"])
+@login_required
+def stream_repos():
+    """
+    Same as /publisher/github/get-repos, but each repository is sent as a
+    line of JSON as soon as its page is fetched. The last line is either
+    {"done": true} or {"error": "..."} if the listing was interrupted.
+    """
+    github = GitHub(flask.session.get("github_auth_secret"))
+    org = flask.request.args.get("org")
+    repos = github.get_cached_repositories(org)
+
+    if repos is not None:
+        pages = iter([repos])
+    elif org:
+        pages = github.iter_org_repositories(org)
+    else:
+        pages = github.iter_user_repositories()
+
+    # Fetch the first page before answering, to report its errors with a
+    # status code
+    try:
+        first_page = next(pages)
+    except Unauthorized:
+        return (
+            flask.jsonify({"error": "You need to be authenticated on GitHub"}),
+            401,
+        )
+    except (HTTPError, ApiError):
+        return (
+            flask.jsonify(
+                {"error": "The repositories could not be fetched from GitHub"}
+            ),
+            502,
+        )
+
+    # The request deadline covers the first page, each next page gets
+    # the same budget
+    deadline = flask.current_app.config["API_DEADLINES"].get("github")
+
+    def generate():
+        page = first_page
+        fetched_repos = []
+
+        try:
+            while page is not None:
+                fetched_repos.extend(page)
+
+                for repo in page:
+                    yield json.dumps(repo) + "\n"
+
+                if deadline:
+                    set_request_deadline(deadline)
+
+                page = next(pages, None)
+        except Unauthorized:
+            error = "You need to be authenticated on GitHub"
+        except (HTTPError, ApiError):
+            error = "The repositories could not be fetched from GitHub"
+        else:
+            if repos is None:
+                github.set_cached_repositories(fetched_repos, org)
+
+            yield json.dumps({"done": True}) + "\n"
+            return
+
+        yield json.dumps({"error": error}) + "\n"
+
+    return flask.Response(
+        flask.stream_with_context(generate()),
+        mimetype="application/x-ndjson",
+    )
@@ -0,0 +1,161 @@
+"""
+Live build statuses. The browsers showing the builds of a snap
+subscribe to a poller shared by all the subscribers of the snap: it
+polls Launchpad in a background thread and pushes to each subscriber
+the builds whose status changed.
+
+The polled builds are kept in a shared cache for POLL_INTERVAL, so
+the pollers of the different workers don't poll Launchpad again.
+"""
+
+import json
+import queue
+import threading
+import time
+
+from webapp.cache import Cache
+
+POLL_INTERVAL = 15
+MAX_QUEUED_EVENTS = 100
+KEEPALIVE_INTERVAL = 20
+
+# Streams are closed after this many seconds, browsers reconnect
+MAX_STREAM_DURATION = 600
+
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class Subscription:
+    def __init__(self, snap_name):
+        self.snap_name = snap_name
+        self.events = queue.Queue(maxsize=MAX_QUEUED_EVENTS)
+
+    def put(self, build):
+        try:
+            self.events.put_nowait(build)
+        except queue.Full:
+            # The client doesn't read its events anymore
+            pass
+
+    def get(self, timeout):
+        """Returns the next build that changed, or None after `timeout`"""
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class BuildPoller:
+    def __init__(self, snap_name):
+        self.snap_name = snap_name
+        self.subscribers = set()
+        self.builds = None
+
+    def publish(self, builds):
+        """Pushes the builds whose status changed since the last poll,
+        or all of them on the first poll
+        """
+        previous_builds = self.builds or {}
+        self.builds = {build["id"]: build for build in builds}
+
+        for build in builds:
+            previous_build = previous_builds.get(build["id"])
+
+            if previous_build and previous_build["status"] == build["status"]:
+                continue
+
+            for subscription in list(self.subscribers):
+                subscription.put(build)
+
+
+class BuildPollers:
+    """
+    The pollers of the snaps with subscribers. A poller stops once its
+    snap has no subscribers left.
+
+    :param fetch_builds: Function returning the latest builds of a snap,
+        as dicts with at least an id and a status
+    """
+
+    def __init__(self, fetch_builds, poll_interval=POLL_INTERVAL):
+        self.fetch_builds = fetch_builds
+        self.poll_interval = poll_interval
+        self.cache = Cache(
+            "build_statuses", maxsize=1024, ttl=poll_interval, shared=True
+        )
+        self.pollers = {}
+        self.lock = threading.Lock()
+
+    def subscribe(self, snap_name):
+        subscription = Subscription(snap_name)
+
+        with self.lock:
+            poller = self.pollers.get(snap_name)
+
+            if poller is None:
+                poller = self.pollers[snap_name] = BuildPoller(snap_name)
+                threading.Thread(
+                    target=self._run, args=(poller,), daemon=True
+                ).start()
+            elif poller.builds:
+                # The client may have missed changes since its page loaded
+                for build in poller.builds.values():
+                    subscription.put(build)
+
+            poller.subscribers.add(subscription)
+
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            poller = self.pollers.get(subscription.snap_name)
+
+            if poller:
+                poller.subscribers.discard(subscription)
+
+    def stream(self, snap_name, max_duration=MAX_STREAM_DURATION):
+        """Yields the server-sent events of the builds of a snap"""
+        subscription = self.subscribe(snap_name)
+        deadline = time.monotonic() + max_duration
+
+        try:
+            yield "retry: 5000\n\n"
+
+            while time.monotonic() < deadline:
+                build = subscription.get(
+                    max(
+                        min(KEEPALIVE_INTERVAL, deadline - time.monotonic()),
+                        0,
+                    )
+                )
+
+                if build is None:
+                    yield ": keepalive\n\n"
+                else:
+                    yield format_event("build", build)
+        finally:
+            self.unsubscribe(subscription)
+
+    def _poll(self, poller):
+        try:
+            builds = self.cache.get_or_set(
+                poller.snap_name, self.fetch_builds, poller.snap_name
+            )
+        except Exception:
+            # Try again on the next poll
+            return
+
+        with self.lock:
+            poller.publish(builds)
+
+    def _run(self, poller):
+        while True:
+            self._poll(poller)
+            time.sleep(self.poll_interval)
+
+            with self.lock:
+                if not poller.subscribers:
+                    del self.pollers[poller.snap_name]
+                    return
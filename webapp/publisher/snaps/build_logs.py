@@ -0,0 +1,115 @@
+"""
+Build logs can weigh several megabytes, so they are proxied from
+Launchpad in chunks instead of being loaded in memory. The logs of
+finished builds never change: they are cached on disk, where they can
+be served by range, from an offset or by their tail.
+"""
+
+import glob
+import os
+import tempfile
+
+from webapp.helpers import api_publisher_session
+
+BUILD_LOG_DIRECTORY = os.getenv(
+    "BUILD_LOG_DIRECTORY",
+    os.path.join(tempfile.gettempdir(), "snapcraft-build-logs"),
+)
+CHUNK_SIZE = 64 * 1024
+MAX_CACHED_LOGS = 1000
+
+# Launchpad build states after which the log can still change
+IN_PROGRESS_STATES = [
+    "Needs building",
+    "Currently building",
+    "Uploading build",
+    "Cancelling build",
+]
+
+
+def is_log_complete(lp_build):
+    return (
+        bool(lp_build["build_log_url"])
+        and lp_build["buildstate"] not in IN_PROGRESS_STATES
+    )
+
+
+def get_log_path(build_id, directory=BUILD_LOG_DIRECTORY):
+    return os.path.join(directory, f"{int(build_id)}.txt")
+
+
+def iter_log(log_url, start=0):
+    """Yields the chunks of a log from Launchpad, from byte `start`"""
+    headers = {"Range": f"bytes={start}-"} if start else {}
+    response = api_publisher_session.get(log_url, headers=headers, stream=True)
+
+    try:
+        # Nothing was written to the log since byte `start`
+        if response.status_code == 416:
+            return
+
+        response.raise_for_status()
+
+        # Only skip the first bytes if the whole log was sent, ignoring
+        # the Range header
+        if response.status_code != 200:
+            start = 0
+
+        for chunk in response.iter_content(CHUNK_SIZE):
+            if start >= len(chunk):
+                start -= len(chunk)
+                continue
+
+            yield chunk[start:]
+            start = 0
+    finally:
+        response.close()
+
+
+def iter_file(path, start=0):
+    with open(path, "rb") as log_file:
+        log_file.seek(start)
+
+        for chunk in iter(lambda: log_file.read(CHUNK_SIZE), b""):
+            yield chunk
+
+
+def _prune(directory, max_logs):
+    paths = glob.glob(os.path.join(directory, "*.txt"))
+
+    if len(paths) <= max_logs:
+        return
+
+    paths.sort(key=lambda path: os.path.getmtime(path), reverse=True)
+
+    for path in paths[max_logs:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def iter_and_cache_log(log_url, path):
+    """Yields the chunks of a log from Launchpad, and saves it to `path`
+    once it was read entirely
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    descriptor, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+
+    try:
+        with os.fdopen(descriptor, "wb") as log_file:
+            for chunk in iter_log(log_url):
+                log_file.write(chunk)
+                yield chunk
+
+        os.replace(tmp_path, path)
+        _prune(directory, MAX_CACHED_LOGS)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def cache_log(log_url, path):
+    for _ in iter_and_cache_log(log_url, path):
+        pass
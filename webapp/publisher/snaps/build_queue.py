@@ -0,0 +1,239 @@
+"""
+Builds requested by GitHub push webhooks are queued instead of being
+requested while GitHub waits for the webhook response.
+
+The queue is a SQLite database shared by the workers of a host, with at
+most one job per snap: pushes to a snap within DEBOUNCE_WINDOW seconds
+of each other are coalesced into a single validation and build. A job
+waits at most MAX_DEBOUNCE seconds, however many pushes follow.
+
+Each worker process claims the jobs that are due from the time it boots
+(see webapp/gunicorn_config.py) and runs them in a pool of threads. A
+claimed job stays in the queue, leased to the worker for LEASE seconds:
+it's removed once it ran, and claimed again if the worker was recycled
+before running it.
+"""
+
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+BUILD_QUEUE_PATH = os.getenv(
+    "BUILD_QUEUE_PATH",
+    os.path.join(tempfile.gettempdir(), "snapcraft-build-queue.sqlite"),
+)
+DEBOUNCE_WINDOW = 30
+MAX_DEBOUNCE = 300
+POLL_INTERVAL = 1
+WORKERS = 4
+LEASE = 600
+
+# SQLite waits for locks without yielding to other greenlets: it only
+# waits briefly and the writes are attempted again after a pause
+BUSY_TIMEOUT = 0.1
+WRITE_ATTEMPTS = 10
+
+# Failed jobs are tried again after RETRY_DELAY seconds
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 60
+
+
+class BuildQueue:
+    """
+    :param run_job: Function called with the snap name, GitHub owner
+        and GitHub repo of each job
+    """
+
+    def __init__(
+        self,
+        run_job,
+        path=BUILD_QUEUE_PATH,
+        debounce_window=DEBOUNCE_WINDOW,
+        max_debounce=MAX_DEBOUNCE,
+        workers=WORKERS,
+    ):
+        self.run_job = run_job
+        self.path = path
+        self.debounce_window = debounce_window
+        self.max_debounce = max_debounce
+        self.workers = workers
+
+        self.running = 0
+        self.lock = threading.Lock()
+        self.pid = None
+
+    def _connect(self):
+        connection = sqlite3.connect(
+            self.path, timeout=BUSY_TIMEOUT, isolation_level=None
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS build_jobs ("
+            "snap_name TEXT PRIMARY KEY, "
+            "gh_owner TEXT, "
+            "gh_repo TEXT, "
+            "queued_at REAL, "
+            "run_at REAL, "
+            "attempts INTEGER, "
+            "claimed_until REAL)"
+        )
+
+        return connection
+
+    def _write(self, query, parameters):
+        for attempt in range(WRITE_ATTEMPTS):
+            try:
+                connection = self._connect()
+
+                try:
+                    return connection.execute(query, parameters).rowcount
+                finally:
+                    connection.close()
+            except sqlite3.OperationalError:
+                if attempt + 1 == WRITE_ATTEMPTS:
+                    raise
+
+            time.sleep(BUSY_TIMEOUT)
+
+    def enqueue(self, snap_name, gh_owner, gh_repo):
+        """
+        Queues a build of the snap, or postpones the build already queued.
+        A push to a snap whose job is running queues a new job.
+        """
+        now = time.time()
+
+        self._write(
+            "INSERT INTO build_jobs VALUES (?, ?, ?, ?, ?, 0, NULL) "
+            "ON CONFLICT(snap_name) DO UPDATE SET "
+            "gh_owner = excluded.gh_owner, "
+            "gh_repo = excluded.gh_repo, "
+            "queued_at = CASE WHEN claimed_until IS NULL "
+            "THEN queued_at ELSE excluded.queued_at END, "
+            "run_at = MIN(excluded.run_at, CASE WHEN claimed_until IS NULL "
+            "THEN queued_at ELSE excluded.queued_at END + ?), "
+            "attempts = 0, "
+            "claimed_until = NULL",
+            (
+                snap_name,
+                gh_owner,
+                gh_repo,
+                now,
+                now + self.debounce_window,
+                self.max_debounce,
+            ),
+        )
+
+        self.start()
+
+    def claim(self, limit):
+        """
+        Leases and returns up to `limit` jobs that are due, with the end
+        of their lease
+        """
+        now = time.time()
+        connection = self._connect()
+
+        try:
+            # Most polls find no due job, without locking the database
+            due_job = connection.execute(
+                "SELECT 1 FROM build_jobs WHERE run_at <= ? "
+                "AND (claimed_until IS NULL OR claimed_until < ?) LIMIT 1",
+                (now, now),
+            ).fetchone()
+
+            if not due_job:
+                return []
+
+            # Lock the database for writing, so jobs are claimed once
+            connection.execute("BEGIN IMMEDIATE")
+            jobs = connection.execute(
+                "SELECT snap_name, gh_owner, gh_repo, attempts "
+                "FROM build_jobs WHERE run_at <= ? "
+                "AND (claimed_until IS NULL OR claimed_until < ?) "
+                "ORDER BY run_at LIMIT ?",
+                (now, now, limit),
+            ).fetchall()
+            connection.executemany(
+                "UPDATE build_jobs SET claimed_until = ? WHERE snap_name = ?",
+                [(now + LEASE, job[0]) for job in jobs],
+            )
+            connection.execute("COMMIT")
+        finally:
+            connection.close()
+
+        return [job + (now + LEASE,) for job in jobs]
+
+    def _complete(self, snap_name, lease):
+        # Jobs pushed again or claimed by another worker are kept
+        self._write(
+            "DELETE FROM build_jobs "
+            "WHERE snap_name = ? AND claimed_until = ?",
+            (snap_name, lease),
+        )
+
+    def _retry(self, snap_name, attempts, lease):
+        self._write(
+            "UPDATE build_jobs SET "
+            "run_at = ?, attempts = ?, claimed_until = NULL "
+            "WHERE snap_name = ? AND claimed_until = ?",
+            (time.time() + RETRY_DELAY, attempts, snap_name, lease),
+        )
+
+    def _execute(self, snap_name, gh_owner, gh_repo, attempts, lease):
+        try:
+            try:
+                self.run_job(snap_name, gh_owner, gh_repo)
+            except Exception:
+                logger.exception(f"Build job failed for {snap_name}")
+
+                if attempts + 1 < MAX_ATTEMPTS:
+                    self._retry(snap_name, attempts + 1, lease)
+                    return
+
+            self._complete(snap_name, lease)
+        except sqlite3.Error:
+            logger.exception(f"Could not update the build job of {snap_name}")
+        finally:
+            with self.lock:
+                self.running -= 1
+
+    def start(self):
+        """
+        Starts claiming jobs in the current process, if not yet started
+        """
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+
+            # The threads of a parent process aren't inherited
+            self.pid = os.getpid()
+            self.running = 0
+
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+
+        while True:
+            with self.lock:
+                free_workers = self.workers - self.running
+
+            if free_workers > 0:
+                try:
+                    jobs = self.claim(free_workers)
+                except sqlite3.Error:
+                    logger.exception("Could not claim build jobs")
+                    jobs = []
+
+                for job in jobs:
+                    with self.lock:
+                        self.running += 1
+
+                    executor.submit(self._execute, *job)
+
+            time.sleep(POLL_INTERVAL)
@@ -1,5 +1,10 @@
 # Standard library
+import base64
+import binascii
+import json
+import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from hashlib import md5
 
 # Packages
@@ -13,46 +18,182 @@ from requests.exceptions import HTTPError
 
 # Local
 from webapp.helpers import api_publisher_session, launchpad
-from webapp.api.github import GitHub, InvalidYAML
+from webapp.api.github import (
+    GitHub,
+    InvalidYAML,
+    RateLimitExceeded,
+    parse_snapcraft_yaml_name,
+)
 from webapp.api.exceptions import ApiError
 from webapp.decorators import login_required
 from webapp.extensions import csrf
+from webapp.publisher.snaps import build_events, build_logs
+from webapp.publisher.snaps.build_queue import BuildQueue
 from webapp.publisher.snaps.builds import map_build_and_upload_states
 from webapp.publisher.views import _handle_error, _handle_error_list
 from werkzeug.exceptions import Unauthorized
 
+logger = logging.getLogger(__name__)
+
 GITHUB_SNAPCRAFT_USER_TOKEN = os.getenv("GITHUB_SNAPCRAFT_USER_TOKEN")
 GITHUB_WEBHOOK_HOST_URL = os.getenv("GITHUB_WEBHOOK_HOST_URL")
 BUILDS_PER_PAGE = 15
+MAX_BUILDS_PER_PAGE = 100
+
+# Windows of builds requested at most to find the page after a cursor,
+# when builds were created since the previous page
+MAX_CURSOR_WINDOWS = 5
 publisher_api = SnapPublisher(api_publisher_session)
 
 
-def get_builds(lp_snap, selection):
-    builds = launchpad.get_snap_builds(lp_snap["store_name"])
+def _get_build_key(build):
+    """Builds are listed newest first, by creation date then id"""
+    return build["datecreated"], int(build["self_link"].split("/")[-1])
 
-    total_builds = len(builds)
 
-    builds = builds[selection]
+def encode_builds_cursor(start, build):
+    """Returns the cursor of the builds older than `build`, to be looked
+    for from position `start`
+    """
+    cursor = [start, *_get_build_key(build)]
 
-    snap_builds = []
-    builders_status = None
+    return base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
 
-    for build in builds:
-        status = map_build_and_upload_states(
+
+def decode_builds_cursor(cursor):
+    """Returns the position to look from and the key of the last build
+    of the previous page, or None if the cursor is invalid
+    """
+    try:
+        start, datecreated, build_id = json.loads(
+            base64.urlsafe_b64decode(cursor.encode())
+        )
+    except (binascii.Error, TypeError, ValueError):
+        return None
+
+    if (
+        not isinstance(start, int)
+        or start < 0
+        or not isinstance(datecreated, str)
+        or not isinstance(build_id, int)
+    ):
+        return None
+
+    return start, (datecreated, build_id)
+
+
+def _get_builds_window(lp_snap, start, size):
+    """Returns the builds from position `start` to `start + size`, newest
+    first, and the total number of builds.
+
+    The pending builds come first. Only the window of completed builds
+    is requested from the Launchpad collection.
+    """
+    pending_builds = launchpad.get_collection_entries(
+        lp_snap["pending_builds_collection_link"]
+    )
+    end = start + size
+    builds = pending_builds[start:end]
+
+    completed_start = max(start - len(pending_builds), 0)
+    completed_size = size - len(builds)
+
+    completed_builds = launchpad.request(
+        lp_snap["completed_builds_collection_link"],
+        params={
+            "ws.start": completed_start,
+            "ws.size": max(completed_size, 1),
+        },
+    ).json()
+
+    if completed_size > 0:
+        builds += completed_builds.get("entries", [])[:completed_size]
+
+    if "total_size" in completed_builds:
+        total_completed = completed_builds["total_size"]
+    else:
+        total_completed = launchpad.request(
+            completed_builds["total_size_link"]
+        ).json()
+
+    builds.sort(key=lambda build: build["datecreated"], reverse=True)
+
+    return builds, len(pending_builds) + total_completed
+
+
+def format_build(build):
+    return {
+        "id": build["self_link"].split("/")[-1],
+        "arch_tag": build["arch_tag"],
+        "datebuilt": build["datebuilt"],
+        "duration": build["duration"],
+        "logs": build["build_log_url"],
+        "revision_id": build["revision_id"],
+        "status": map_build_and_upload_states(
             build["buildstate"], build["store_upload_status"]
+        ),
+        "title": build["title"],
+    }
+
+
+def get_latest_builds(snap_name):
+    lp_snap = launchpad.get_snap_by_store_name(snap_name)
+
+    if not lp_snap:
+        return []
+
+    builds, _ = _get_builds_window(lp_snap, 0, BUILDS_PER_PAGE)
+
+    return [format_build(build) for build in builds]
+
+
+build_pollers = build_events.BuildPollers(get_latest_builds)
+
+
+def _get_builds_after(lp_snap, start, size, after):
+    """Returns up to `size` builds older than the build with the key
+    `after`, looked for from position `start`, the total number of
+    builds and the position after the last build returned.
+
+    Builds created since `start` was computed shift the positions, the
+    builds that aren't older than `after` are skipped.
+    """
+    builds = []
+    total_builds = 0
+
+    for _ in range(MAX_CURSOR_WINDOWS):
+        window, total_builds = _get_builds_window(lp_snap, start, size)
+
+        for build in window:
+            if len(builds) == size:
+                break
+
+            start += 1
+
+            if _get_build_key(build) < after:
+                builds.append(build)
+
+        if len(builds) == size or len(window) < size:
+            break
+
+    return builds, total_builds, start
+
+
+def get_builds(lp_snap, start=0, size=BUILDS_PER_PAGE, after=None):
+    if after is None:
+        builds, total_builds = _get_builds_window(lp_snap, start, size)
+        next_start = start + len(builds)
+    else:
+        builds, total_builds, next_start = _get_builds_after(
+            lp_snap, start, size, after
         )
 
-        snap_build = {
-            "id": build["self_link"].split("/")[-1],
-            "arch_tag": build["arch_tag"],
-            "datebuilt": build["datebuilt"],
-            "duration": build["duration"],
-            "logs": build["build_log_url"],
-            "revision_id": build["revision_id"],
-            "status": status,
-            "title": build["title"],
-            "queue_time": None,
-        }
+    snap_builds = []
+    builders_status = None
+
+    for build in builds:
+        snap_build = format_build(build)
+        snap_build["queue_time"] = None
 
         if build["buildstate"] == "Needs building":
             if not builders_status:
@@ -67,6 +208,11 @@ def get_builds(lp_snap, selection):
     return {
         "total_builds": total_builds,
         "snap_builds": snap_builds,
+        "next_cursor": (
+            encode_builds_cursor(next_start, builds[-1])
+            if builds and next_start < total_builds
+            else None
+        ),
     }
 
 
@@ -113,31 +259,64 @@ def get_snap_builds(snap_name):
         context["github_repository"] = lp_snap["git_repository_url"][19:]
         github_owner, github_repo = context["github_repository"].split("/")
 
-        context["github_repository_exists"] = github.check_if_repo_exists(
-            github_owner, github_repo
-        )
+        try:
+            context["github_repository_exists"] = github.check_if_repo_exists(
+                github_owner, github_repo
+            )
 
-        context["yaml_file_exists"] = github.get_snapcraft_yaml_location(
-            github_owner, github_repo
-        )
+            context["yaml_file_exists"] = github.get_snapcraft_yaml(
+                github_owner, github_repo
+            )["location"]
+        except RateLimitExceeded:
+            # Don't warn about the repository while it can't be checked
+            context["github_repository_exists"] = True
+            context["yaml_file_exists"] = True
 
-        context.update(get_builds(lp_snap, slice(0, BUILDS_PER_PAGE)))
+        context.update(get_builds(lp_snap))
 
         context["snap_builds_enabled"] = bool(context["snap_builds"])
     else:
         github = GitHub(flask.session.get("github_auth_secret"))
 
+        # The organizations are fetched while the token is checked
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            github_user = executor.submit(github.get_user)
+            github_orgs = executor.submit(github.get_orgs)
+
         try:
-            context["github_user"] = github.get_user()
+            context["github_user"] = github_user.result()
         except Unauthorized:
             context["github_user"] = None
 
         if context["github_user"]:
-            context["github_orgs"] = github.get_orgs()
+            context["github_orgs"] = github_orgs.result()
 
     return flask.render_template("publisher/builds.html", **context)
 
 
+@login_required
+def get_snap_build_events(snap_name):
+    """
+    Server-sent events of the latest builds of a snap, pushed when their
+    status changes
+    """
+    try:
+        details = publisher_api.get_snap_info(snap_name, flask.session)
+    except StoreApiResponseErrorList as api_response_error_list:
+        if api_response_error_list.status_code == 404:
+            return flask.abort(404, "No snap named {}".format(snap_name))
+        else:
+            return _handle_error_list(api_response_error_list.errors)
+    except (StoreApiError, ApiError) as api_error:
+        return _handle_error(api_error)
+
+    return flask.Response(
+        build_pollers.stream(details["snap_name"]),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @login_required
 def get_snap_build(snap_name, build_id):
     try:
@@ -175,18 +354,90 @@ def get_snap_build(snap_name, build_id):
             "title": lp_build["title"],
         }
 
-        if context["snap_build"]["logs"]:
-            context["raw_logs"] = launchpad.get_snap_build_log(
-                details["snap_name"], build_id
+    return flask.render_template("publisher/build.html", **context)
+
+
+@login_required
+def get_snap_build_log(snap_name, build_id):
+    """
+    Streams the log of a build. Clients can ask for a Range of the log,
+    its last bytes with ?tail=, or poll the log of a build in progress
+    with ?offset=, the X-Build-Log-Complete header telling when to stop.
+    """
+    try:
+        details = publisher_api.get_snap_info(snap_name, flask.session)
+    except StoreApiResponseErrorList as api_response_error_list:
+        if api_response_error_list.status_code == 404:
+            return flask.abort(404, "No snap named {}".format(snap_name))
+        else:
+            return _handle_error_list(api_response_error_list.errors)
+    except (StoreApiError, ApiError) as api_error:
+        return _handle_error(api_error)
+
+    if not build_id.isdigit():
+        return flask.abort(404, "No build with id {}".format(build_id))
+
+    lp_build = launchpad.get_snap_build(details["snap_name"], build_id)
+
+    if not lp_build:
+        return flask.abort(404, "No build with id {}".format(build_id))
+
+    log_url = lp_build["build_log_url"]
+    complete = build_logs.is_log_complete(lp_build)
+    offset = max(flask.request.args.get("offset", 0, type=int), 0)
+    tail = flask.request.args.get("tail", type=int)
+
+    headers = {
+        "X-Build-Log-Complete": "true" if complete else "false",
+        "Cache-Control": "private",
+    }
+
+    if not log_url:
+        return flask.Response(b"", mimetype="text/plain", headers=headers)
+
+    if not complete:
+        return flask.Response(
+            flask.stream_with_context(build_logs.iter_log(log_url, offset)),
+            mimetype="text/plain",
+            headers=headers,
+        )
+
+    path = build_logs.get_log_path(build_id)
+
+    if not os.path.isfile(path):
+        if offset or tail or "Range" in flask.request.headers:
+            build_logs.cache_log(log_url, path)
+        else:
+            return flask.Response(
+                flask.stream_with_context(
+                    build_logs.iter_and_cache_log(log_url, path)
+                ),
+                mimetype="text/plain",
+                headers=headers,
             )
 
-    return flask.render_template("publisher/build.html", **context)
+    if offset or tail:
+        size = os.path.getsize(path)
+        start = max(size - tail, 0) if tail else min(offset, size)
+        headers["X-Build-Log-Offset"] = str(start)
+
+        return flask.Response(
+            build_logs.iter_file(path, start),
+            mimetype="text/plain",
+            headers=headers,
+        )
+
+    response = flask.send_file(path, mimetype="text/plain", conditional=True)
+    response.headers.update(headers)
+
+    return response
 
 
-def validate_repo(github_token, snap_name, gh_owner, gh_repo):
-    github = GitHub(github_token)
+def validate_repo(github_token, snap_name, gh_owner, gh_repo, critical=False):
+    github = GitHub(github_token, critical=critical)
     result = {"success": True}
-    yaml_location = github.get_snapcraft_yaml_location(gh_owner, gh_repo)
+    snapcraft_yaml = github.get_snapcraft_yaml(gh_owner, gh_repo)
+    yaml_location = snapcraft_yaml["location"]
 
     # The snapcraft.yaml is not present
     if not yaml_location:
@@ -202,7 +453,7 @@ def validate_repo(github_token, snap_name, gh_owner, gh_repo):
     # The property name inside the yaml file doesn't match the snap
     else:
         try:
-            gh_snap_name = github.get_snapcraft_yaml_name(gh_owner, gh_repo)
+            gh_snap_name = parse_snapcraft_yaml_name(snapcraft_yaml["content"])
 
             if gh_snap_name != snap_name:
                 result["success"] = False
@@ -242,17 +493,29 @@ def get_snap_builds_json(snap_name):
     except (StoreApiError, ApiError) as api_error:
         return _handle_error(api_error)
 
-    context = {"snap_builds": []}
+    context = {"snap_builds": [], "total_builds": 0, "next_cursor": None}
+
+    cursor = flask.request.args.get("cursor")
+    after = None
+
+    if cursor:
+        decoded_cursor = decode_builds_cursor(cursor)
+
+        if decoded_cursor is None:
+            return flask.jsonify({"error": "Invalid cursor"}), 400
 
-    start = flask.request.args.get("start", 0, type=int)
-    size = flask.request.args.get("size", 15, type=int)
-    build_slice = slice(start, size)
+        start, after = decoded_cursor
+    else:
+        start = max(flask.request.args.get("start", 0, type=int), 0)
+
+    size = flask.request.args.get("size", BUILDS_PER_PAGE, type=int)
+    size = min(max(size, 1), MAX_BUILDS_PER_PAGE)
 
     # Get built snap in launchpad with this store name
     lp_snap = launchpad.get_snap_by_store_name(details["snap_name"])
 
     if lp_snap:
-        context.update(get_builds(lp_snap, build_slice))
+        context.update(get_builds(lp_snap, start, size, after))
 
     return flask.jsonify(context)
 
@@ -497,19 +760,38 @@ def post_github_webhook(snap_name=None, github_owner=None, github_repo=None):
         ):
             return ("Invalid secret", 403)
 
+    build_queue.enqueue(lp_snap["store_name"], gh_owner, gh_repo)
+
+    return ("", 202)
+
+
+def build_from_webhook(snap_name, gh_owner, gh_repo):
+    """
+    Validates the repo and builds the snap, for the jobs of the build
+    queue
+    """
     validation = validate_repo(
-        GITHUB_SNAPCRAFT_USER_TOKEN, lp_snap["store_name"], gh_owner, gh_repo
+        GITHUB_SNAPCRAFT_USER_TOKEN,
+        snap_name,
+        gh_owner,
+        gh_repo,
+        critical=True,
     )
 
     if not validation["success"]:
-        return (validation["error"]["message"], 400)
+        logger.warning(
+            f"Build of {snap_name} from {gh_owner}/{gh_repo} not requested:"
+            f" {validation['error']['message']}"
+        )
+        return
+
+    if launchpad.is_snap_building(snap_name):
+        launchpad.cancel_snap_builds(snap_name)
 
-    if launchpad.is_snap_building(lp_snap["store_name"]):
-        launchpad.cancel_snap_builds(lp_snap["store_name"])
+    launchpad.build_snap(snap_name)
 
-    launchpad.build_snap(lp_snap["store_name"])
 
-    return ("", 204)
+build_queue = BuildQueue(build_from_webhook)
 
 
 @login_required
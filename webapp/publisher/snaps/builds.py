@@ -1,5 +1,12 @@
+import time
+from concurrent import futures
 from enum import Enum
 
+# Build statuses of the snaps of an account are fetched concurrently,
+# each snap getting STATUS_TIMEOUT seconds once its fetch started
+STATUS_WORKERS = 16
+STATUS_TIMEOUT = 10
+
 
 class StoreFrontBuildState(Enum):
     NEVER_BUILT = "never_built"
@@ -147,3 +154,76 @@ def map_snap_build_status(snap_build_statuses):
             return status
 
     return StoreFrontBuildState.UNKNOWN.value
+
+
+def get_snap_build_statuses(
+    launchpad, snap_names, workers=STATUS_WORKERS, timeout=STATUS_TIMEOUT
+):
+    """Yields the status of each snap as soon as it is known, as a dict
+    with the name and the status of the snap.
+
+    The statuses are fetched by a bounded pool of workers. Snaps whose
+    status fails or takes more than `timeout` seconds are yielded with
+    the unknown status.
+    """
+    started = {}
+
+    def get_status(snap_name):
+        started[snap_name] = time.monotonic()
+
+        return map_snap_build_status(
+            launchpad.get_snap_build_status(snap_name)
+        )
+
+    executor = futures.ThreadPoolExecutor(max_workers=workers)
+    pending = {
+        executor.submit(get_status, snap_name): snap_name
+        for snap_name in snap_names
+    }
+
+    try:
+        while pending:
+            deadlines = [
+                started[snap_name] + timeout
+                for snap_name in pending.values()
+                if snap_name in started
+            ]
+            wait = (
+                max(min(deadlines) - time.monotonic(), 0)
+                if deadlines
+                else timeout
+            )
+
+            done, _ = futures.wait(
+                pending, timeout=wait, return_when=futures.FIRST_COMPLETED
+            )
+
+            for future in done:
+                snap_name = pending.pop(future)
+
+                try:
+                    status = future.result()
+                except Exception:
+                    status = StoreFrontBuildState.UNKNOWN.value
+
+                yield {"name": snap_name, "status": status}
+
+            now = time.monotonic()
+
+            for future, snap_name in list(pending.items()):
+                if (
+                    snap_name in started
+                    and now - started[snap_name] >= timeout
+                ):
+                    del pending[future]
+
+                    yield {
+                        "name": snap_name,
+                        "status": StoreFrontBuildState.UNKNOWN.value,
+                    }
+    finally:
+        # Don't wait for the statuses that timed out
+        for future in pending:
+            future.cancel()
+
+        executor.shutdown(wait=False)
@@ -15,6 +15,7 @@ from canonicalwebteam.store_api.exceptions import (
 
 # Local
 from webapp import helpers
+from webapp.content import content_store
 from webapp.helpers import api_publisher_session
 from webapp.api.exceptions import ApiError
 from webapp.decorators import login_required
@@ -101,8 +102,7 @@ def get_listing_snap(snap_name):
         category["name"] for category in snap_categories["categories"]
     ]
 
-    filename = "publisher/content/listing_tour.yaml"
-    tour_steps = helpers.get_yaml(filename, typ="rt")
+    tour_steps = content_store.get_listing_tour()
 
     context = {
         "snap_id": snap_details["snap_id"],
@@ -277,8 +277,7 @@ def post_listing_snap(snap_name):
 
             snap_categories = logic.filter_categories(snap_categories)
 
-            filename = "publisher/content/listing_tour.yaml"
-            tour_steps = helpers.get_yaml(filename, typ="rt")
+            tour_steps = content_store.get_listing_tour()
 
             context = {
                 # read-only values from details API
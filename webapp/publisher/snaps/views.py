@@ -1,3 +1,6 @@
+# Core
+import json
+
 # Packages
 import bleach
 import flask
@@ -20,7 +23,7 @@ from webapp.publisher.snaps import (
     release_views,
     settings_views,
 )
-from webapp.publisher.snaps.builds import map_snap_build_status
+from webapp.publisher.snaps.builds import get_snap_build_statuses
 from webapp.publisher.views import _handle_error, _handle_error_list
 
 publisher_api = SnapPublisher(api_publisher_session)
@@ -33,6 +36,15 @@ publisher_snaps = flask.Blueprint(
     static_folder="/static",
 )
 
+
+@publisher_snaps.before_app_first_request
+def start_build_queue():
+    # gunicorn workers claim the queued builds from boot, this starts
+    # them in other servers, e.g. flask run, but not in the tests
+    if not flask.current_app.testing:
+        build_views.build_queue.start()
+
+
 # Listing views
 publisher_snaps.add_url_rule(
     "/account/snaps/<snap_name>/market",
@@ -85,6 +97,16 @@ publisher_snaps.add_url_rule(
     view_func=build_views.get_snap_build,
     methods=["GET"],
 )
+publisher_snaps.add_url_rule(
+    "/<snap_name>/builds/events",
+    view_func=build_views.get_snap_build_events,
+    methods=["GET"],
+)
+publisher_snaps.add_url_rule(
+    "/<snap_name>/builds/<build_id>/log",
+    view_func=build_views.get_snap_build_log,
+    methods=["GET"],
+)
 publisher_snaps.add_url_rule(
     "/<snap_name>/builds/validate-repo",
     view_func=build_views.get_validate_repo,
@@ -252,16 +274,38 @@ def get_snap_build_status():
     except (StoreApiError, ApiError) as api_error:
         return flask.jsonify(api_error), 400
 
-    response = []
     user_snaps, _ = logic.get_snaps_account_info(account_info)
 
-    for snap_name in user_snaps:
-        snap_build_statuses = launchpad.get_snap_build_status(snap_name)
-        status = map_snap_build_status(snap_build_statuses)
+    statuses = {
+        snap_status["name"]: snap_status
+        for snap_status in get_snap_build_statuses(launchpad, user_snaps)
+    }
 
-        response.append({"name": snap_name, "status": status})
+    return flask.jsonify([statuses[snap_name] for snap_name in user_snaps])
 
-    return flask.jsonify(response)
+
+@publisher_snaps.route("/snap-builds.ndjson")
+@login_required
+def stream_snap_build_status():
+    """
+    Same as /snap-builds.json, but each status is sent as a line of JSON
+    as soon as it is known
+    """
+    try:
+        account_info = publisher_api.get_account(flask.session)
+    except (StoreApiError, ApiError) as api_error:
+        return flask.jsonify(api_error), 400
+
+    user_snaps, _ = logic.get_snaps_account_info(account_info)
+
+    def generate():
+        for snap_status in get_snap_build_statuses(launchpad, user_snaps):
+            yield json.dumps(snap_status) + "\n"
+
+    return flask.Response(
+        flask.stream_with_context(generate()),
+        mimetype="application/x-ndjson",
+    )
 
 
 @publisher_snaps.route("/account/register-snap")
@@ -1,11 +1,21 @@
 import flask
 
 from webapp.snapcraft import logic
+from webapp.store import sitemap as store_sitemap
 
 
 def snapcraft_blueprint():
     snapcraft = flask.Blueprint("snapcraft", __name__)
 
+    @snapcraft.before_app_first_request
+    def start_store_sitemap_refresh():
+        # Keep the store sitemap built from each worker process, without
+        # crawling the store from the tests
+        if not flask.current_app.testing:
+            store_sitemap.start_refresh(
+                directory=store_sitemap.SITEMAP_DIRECTORY
+            )
+
     @snapcraft.route("/")
     def homepage():
         nps = flask.request.args.get("nps")
@@ -267,9 +277,21 @@ def snapcraft_blueprint():
 
     @snapcraft.route("/sitemap.xml")
     def sitemap():
+        store_sitemap.refresh_in_background(
+            directory=store_sitemap.SITEMAP_DIRECTORY
+        )
+
+        # Sitemap indexes can't be nested, so the store sitemaps are
+        # listed here directly
         xml_sitemap = flask.render_template(
             "sitemap/sitemap-index.xml",
             base_url="https://snapcraft.io",
+            store_sitemaps=[
+                store_sitemap.get_shard_url(shard)
+                for shard in store_sitemap.get_shards(
+                    store_sitemap.SITEMAP_DIRECTORY
+                )
+            ],
         )
         response = flask.make_response(xml_sitemap)
         response.headers["Content-Type"] = "application/xml"
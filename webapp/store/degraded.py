@@ -0,0 +1,96 @@
+"""
+The last successful responses of the store API are kept for a day, as
+promised by the stale-if-error directive of our Cache-Control header.
+While the circuit breaker is open or the API times out, they are served
+instead of an error, and the response is flagged with DEGRADED_HEADER.
+"""
+
+import flask
+from canonicalwebteam.store_api.exceptions import (
+    StoreApiCircuitBreaker,
+    StoreApiTimeoutError,
+)
+from webapp.api.exceptions import ApiCircuitBreaker, ApiTimeoutError
+
+DEGRADED_HEADER = "X-Store-Degraded"
+LAST_GOOD_TTL = 86400
+
+UNAVAILABLE_ERRORS = (
+    StoreApiCircuitBreaker,
+    StoreApiTimeoutError,
+    ApiCircuitBreaker,
+    ApiTimeoutError,
+)
+
+
+def is_degraded():
+    return flask.has_request_context() and flask.g.get("degraded", False)
+
+
+def _get_last_good(last_good, key):
+    """
+    Returns the last good value for the key and flags the request as
+    degraded, or None if there is none
+    """
+    value = last_good.get(key)
+
+    # Background refreshes of other caches keep their stale entry
+    if value is None or not flask.has_request_context():
+        return None
+
+    flask.g.degraded = True
+
+    return value
+
+
+def call_or_last_good(last_good, key, func, *args, **kwargs):
+    """
+    Calls `func` and keeps its result in the `last_good` cache. If the
+    store is unavailable the last result for the key is returned, or the
+    error raised again if there is none.
+    """
+    try:
+        value = func(*args, **kwargs)
+    except UNAVAILABLE_ERRORS:
+        value = _get_last_good(last_good, key)
+
+        if value is None:
+            raise
+
+        return value
+
+    last_good.set(key, value)
+
+    return value
+
+
+def get_or_last_good(cache, last_good, key, func, *args, **kwargs):
+    """
+    Returns the value for the key from `cache`, calling `func` on a miss
+    like `Cache.get_or_set`. If the store is unavailable the last good
+    value is returned, without being stored in `cache`: the next
+    requests try the store again and are flagged as degraded too.
+    """
+
+    def fetch():
+        value = func(*args, **kwargs)
+        last_good.set(key, value)
+
+        return value
+
+    try:
+        return cache.get_or_set(key, fetch)
+    except UNAVAILABLE_ERRORS:
+        value = _get_last_good(last_good, key)
+
+        if value is None:
+            raise
+
+        return value
+
+
+def add_degraded_header(response):
+    if is_degraded():
+        response.headers[DEGRADED_HEADER] = "stale-if-error"
+
+    return response
@@ -5,7 +5,7 @@ from urllib.parse import parse_qs, urlparse
 
 import humanize
 from dateutil import parser
-from webapp import helpers
+from webapp.content import content_store
 
 
 def get_n_random_snaps(snaps, choice_number):
@@ -172,29 +172,27 @@ def convert_channel_maps(channel_map):
 
     :returns: The channel maps reshaped
     """
-    channel_map_restruct = {}
-    for channel in channel_map:
-        arch = channel.get("channel").get("architecture")
-        track = channel.get("channel").get("track")
-        if arch not in channel_map_restruct:
-            channel_map_restruct[arch] = {}
-        if track not in channel_map_restruct[arch]:
-            channel_map_restruct[arch][track] = []
-
-        info = {
-            "created-at": convert_date(channel.get("created-at")),
-            "version": channel.get("version"),
-            "channel": channel.get("channel").get("name"),
-            "risk": channel.get("channel").get("risk"),
-            "confinement": channel.get("confinement"),
-            "size": channel.get("download").get("size"),
-        }
-        channel_map_restruct[arch][track].append(info)
+    return ChannelMap(channel_map).channel_maps_list
+
+
+def parse_date(date_to_parse):
+    """Parse a date returned by the API
+
+    The API returns ISO-8601 dates, which the standard library parses a lot
+    faster than dateutil. Other formats fall back to dateutil.
+
+    :param date_to_parse: Date to parse
+    :returns: A naive datetime
+    """
+    try:
+        date_parsed = datetime.datetime.fromisoformat(date_to_parse)
+    except ValueError:
+        date_parsed = parser.parse(date_to_parse)
 
-    return channel_map_restruct
+    return date_parsed.replace(tzinfo=None)
 
 
-def convert_date(date_to_convert):
+def convert_date(date_to_convert, yesterday=None):
     """Convert date to human readable format: Month Day Year
 
     If date is less than a day return: today or yesterday
@@ -203,11 +201,15 @@ def convert_date(date_to_convert):
     Output: Jan 12 2019
 
     :param date_to_convert: Date to convert
+    :param yesterday: The datetime one day ago, computed if not given
     :returns: Readable date
     """
-    date_parsed = parser.parse(date_to_convert).replace(tzinfo=None)
-    delta = datetime.datetime.now() - datetime.timedelta(days=1)
-    if delta < date_parsed:
+    date_parsed = parse_date(date_to_convert)
+
+    if not yesterday:
+        yesterday = datetime.datetime.now() - datetime.timedelta(days=1)
+
+    if yesterday < date_parsed:
         return humanize.naturalday(date_parsed).title()
     else:
         return date_parsed.strftime("%-d %B %Y")
@@ -230,6 +232,12 @@ categories_list = [
 
 blacklist = ["featured"]
 
+risk_order = {"stable": 0, "candidate": 1, "beta": 2, "edge": 3}
+
+
+def _risk_rank(risk):
+    return risk_order.get(risk, len(risk_order))
+
 
 def format_category_name(slug):
     """Format category name into a standard title format
@@ -334,19 +342,15 @@ def get_lowest_available_risk(channel_map, track):
 
     :returns: The lowest available risk
     """
-    risk_order = ["stable", "candidate", "beta", "edge"]
     lowest_available_risk = None
     for arch in channel_map:
-        if arch in channel_map and track in channel_map[arch]:
+        if track in channel_map[arch]:
             releases = channel_map[arch][track]
             for release in releases:
-                if not lowest_available_risk:
+                if not lowest_available_risk or _risk_rank(
+                    release["risk"]
+                ) < _risk_rank(lowest_available_risk):
                     lowest_available_risk = release["risk"]
-                else:
-                    risk_index = risk_order.index(release["risk"])
-                    lowest_index = risk_order.index(lowest_available_risk)
-                    if risk_index < lowest_index:
-                        lowest_available_risk = release["risk"]
 
     return lowest_available_risk
 
@@ -378,6 +382,93 @@ def extract_info_channel_map(channel_map, track, risk):
     return context
 
 
+class ChannelMap:
+    """Index of a channel map list returned by the API
+
+    The channel map is walked only once, and every query made by the snap
+    details views is then answered from the index.
+
+    :param channel_map: The channel map list returned by the API
+    """
+
+    def __init__(self, channel_map):
+        self.channel_maps_list = {}
+        self.latest_channel = None
+        self.has_stable = False
+
+        # arch -> position in the channel map
+        self._arch_positions = {}
+        # (arch, track, risk) -> first release
+        self._releases = {}
+        # (track, risk) -> (arch position, release)
+        self._track_risk = {}
+        # track -> lowest risk
+        self._lowest_risk = {}
+
+        yesterday = datetime.datetime.now() - datetime.timedelta(days=1)
+
+        for channel in channel_map:
+            info = channel.get("channel")
+            arch = info.get("architecture")
+            track = info.get("track")
+            risk = info.get("risk")
+
+            if arch not in self.channel_maps_list:
+                self.channel_maps_list[arch] = {}
+                self._arch_positions[arch] = len(self._arch_positions)
+            arch_position = self._arch_positions[arch]
+
+            release = {
+                "created-at": convert_date(
+                    channel.get("created-at"), yesterday
+                ),
+                "version": channel.get("version"),
+                "channel": info.get("name"),
+                "risk": risk,
+                "confinement": channel.get("confinement"),
+                "size": channel.get("download").get("size"),
+            }
+            self.channel_maps_list[arch].setdefault(track, []).append(release)
+
+            self._releases.setdefault((arch, track, risk), release)
+
+            known = self._track_risk.get((track, risk))
+            if not known or arch_position < known[0]:
+                self._track_risk[(track, risk)] = (arch_position, release)
+
+            lowest_risk = self._lowest_risk.get(track)
+            if not lowest_risk or _risk_rank(risk) < _risk_rank(lowest_risk):
+                self._lowest_risk[track] = risk
+
+            if risk == "stable":
+                if not self.has_stable:
+                    self.latest_channel = channel
+                self.has_stable = True
+            elif not self.latest_channel:
+                self.latest_channel = channel
+
+    def get(self, arch, track, risk):
+        """Get the first release of a channel
+
+        :returns: The release or None
+        """
+        return self._releases.get((arch, track, risk))
+
+    def get_lowest_available_risk(self, track):
+        """Same as get_lowest_available_risk"""
+        return self._lowest_risk.get(track)
+
+    def extract_info(self, track, risk):
+        """Same as extract_info_channel_map"""
+        known = self._track_risk.get((track, risk))
+        release = known[1] if known else {}
+
+        return {
+            "confinement": release.get("confinement"),
+            "version": release.get("version"),
+        }
+
+
 def get_video_embed_code(url):
     """Get the embed code for videos
 
@@ -460,10 +551,4 @@ def get_snap_developer(snap_name):
     :returns: a list of [display_name, url]
 
     """
-    filename = "store/content/developers/snaps.yaml"
-    snaps = helpers.get_yaml(filename, typ="rt")
-
-    if snaps and snap_name in snaps:
-        return snaps[snap_name]
-
-    return None
+    return content_store.get_snap_developer(snap_name)
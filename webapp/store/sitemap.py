@@ -0,0 +1,303 @@
+"""
+The store sitemap lists every snap of the store. Walking the whole
+catalogue is slow, so the sitemap is built in a background thread and
+written to disk, split in files of at most 50,000 URLs as required by
+the sitemap protocol. The views only stream these files.
+"""
+
+import fcntl
+import glob
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from math import ceil
+from xml.sax.saxutils import escape
+
+from webapp.api.requests import Session
+from webapp.store import logic
+
+logger = logging.getLogger(__name__)
+
+BASE_URL = "https://snapcraft.io"
+SEARCH_URL = "https://api.snapcraft.io/api/v1/snaps/search"
+SITEMAP_DIRECTORY = os.getenv(
+    "SITEMAP_DIRECTORY",
+    os.path.join(tempfile.gettempdir(), "snapcraft-sitemap"),
+)
+INDEX_FILENAME = "index.xml"
+SHARD_FILENAME = "store-{}.xml"
+
+MAX_URLS = 50000
+PAGE_SIZE = 500
+MAX_PAGES = 1000
+FETCH_WORKERS = 8
+FETCH_RETRIES = 3
+FETCH_TIMEOUT = 30
+REFRESH_INTERVAL = 43200
+
+# How often each worker checks whether the sitemap is stale
+CHECK_INTERVAL = 600
+
+# The crawl has its own circuit breakers and timeouts, so it can't open
+# the breaker of the store search for visitors
+session = Session(name="sitemap", adaptive_timeouts=False)
+
+_builder = None
+_builder_lock = threading.Lock()
+
+
+def _fetch_page(session, page):
+    """Fetch one page of the search API, retrying a few times
+
+    :returns: The decoded response, or None
+    """
+    params = {
+        "scope": "wide",
+        "size": PAGE_SIZE,
+        "page": page,
+        "fields": "package_name,last_updated",
+    }
+
+    for _ in range(FETCH_RETRIES):
+        try:
+            return session.get(
+                SEARCH_URL, params=params, timeout=FETCH_TIMEOUT
+            ).json()
+        except Exception:
+            continue
+
+    return None
+
+
+def _get_links(snaps_response):
+    links = []
+
+    if not snaps_response or "_embedded" not in snaps_response:
+        return links
+
+    for snap in snaps_response["_embedded"]["clickindex:package"]:
+        try:
+            links.append(
+                {
+                    "url": f"{BASE_URL}/{snap['package_name']}",
+                    "last_updated": logic.parse_date(
+                        snap["last_updated"]
+                    ).strftime("%Y-%m-%d"),
+                }
+            )
+        except Exception:
+            continue
+
+    return links
+
+
+def fetch_links(session):
+    """Fetch all the snaps of the store
+
+    The first page tells how many pages there are, the others are
+    fetched concurrently. Pages that keep failing are skipped.
+
+    :returns: A list of links, or None if the first page failed
+    """
+    first_page = _fetch_page(session, 1)
+
+    if not first_page:
+        return None
+
+    links = _get_links(first_page)
+
+    if "total" in first_page:
+        last_page = min(ceil(first_page["total"] / PAGE_SIZE), MAX_PAGES)
+
+        with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as executor:
+            pages = executor.map(
+                lambda page: _fetch_page(session, page),
+                range(2, last_page + 1),
+            )
+
+            for snaps_response in pages:
+                links.extend(_get_links(snaps_response))
+    else:
+        snaps_response = first_page
+        page = 1
+
+        while "next" in snaps_response.get("_links", {}) and page < MAX_PAGES:
+            page += 1
+            snaps_response = _fetch_page(session, page)
+
+            if not snaps_response:
+                break
+
+            links.extend(_get_links(snaps_response))
+
+    return links
+
+
+def _write_file(directory, filename, lines):
+    """Write a file atomically, so it can be served while being built"""
+    descriptor, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+
+    with os.fdopen(descriptor, "w") as f:
+        for line in lines:
+            f.write(line)
+
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, os.path.join(directory, filename))
+
+
+def _shard_lines(links):
+    yield '<?xml version="1.0" encoding="utf-8"?>\n'
+    yield '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+
+    for link in links:
+        yield "  <url>\n"
+        yield f"    <loc>{escape(link['url'])}</loc>\n"
+        if "last_updated" in link:
+            yield f"    <lastmod>{link['last_updated']}</lastmod>\n"
+        yield "    <changefreq>monthly</changefreq>\n"
+        yield "  </url>\n"
+
+    yield "</urlset>\n"
+
+
+def _index_lines(shards):
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield (
+        '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+    )
+
+    for shard in shards:
+        yield "  <sitemap>\n"
+        yield f"    <loc>{get_shard_url(shard)}</loc>\n"
+        yield "  </sitemap>\n"
+
+    yield "</sitemapindex>\n"
+
+
+def write_sitemaps(links, directory=SITEMAP_DIRECTORY):
+    """Write the shards and the index of the store sitemap
+
+    :returns: The number of shards
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    links = [{"url": f"{BASE_URL}/store"}] + links
+    shards = range(1, ceil(len(links) / MAX_URLS) + 1)
+
+    for shard in shards:
+        start, end = (shard - 1) * MAX_URLS, shard * MAX_URLS
+        shard_links = links[start:end]
+        _write_file(
+            directory, SHARD_FILENAME.format(shard), _shard_lines(shard_links)
+        )
+
+    _write_file(directory, INDEX_FILENAME, _index_lines(shards))
+
+    # Remove shards left from a bigger catalogue
+    for shard in get_shards(directory):
+        if shard > len(shards):
+            os.remove(os.path.join(directory, SHARD_FILENAME.format(shard)))
+
+    return len(shards)
+
+
+def is_fresh(directory=SITEMAP_DIRECTORY):
+    try:
+        modified = os.path.getmtime(os.path.join(directory, INDEX_FILENAME))
+    except OSError:
+        return False
+
+    return time.time() - modified < REFRESH_INTERVAL
+
+
+def build_sitemap(session, directory=SITEMAP_DIRECTORY):
+    """Build the sitemap unless another process is already doing it
+
+    :returns: True if the sitemap was built
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    with open(os.path.join(directory, ".lock"), "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return False
+
+        if is_fresh(directory):
+            return False
+
+        links = fetch_links(session)
+
+        if links is None:
+            return False
+
+        write_sitemaps(links, directory)
+
+    return True
+
+
+def refresh_in_background(session=session, directory=SITEMAP_DIRECTORY):
+    """Start building the sitemap in a thread if it is missing or stale"""
+    global _builder
+
+    if is_fresh(directory):
+        return
+
+    with _builder_lock:
+        if _builder and _builder.is_alive():
+            return
+
+        _builder = threading.Thread(
+            target=build_sitemap, args=(session, directory), daemon=True
+        )
+        _builder.start()
+
+
+def _refresh_periodically(session, directory):
+    while True:
+        try:
+            build_sitemap(session, directory)
+        except Exception:
+            logger.exception("Could not build the store sitemap")
+
+        time.sleep(CHECK_INTERVAL)
+
+
+_refresher_pid = None
+
+
+def start_refresh(session=session, directory=SITEMAP_DIRECTORY):
+    """Build the sitemap from a thread of the current process if it is
+    missing or stale, now and every CHECK_INTERVAL seconds
+    """
+    global _refresher_pid
+
+    with _builder_lock:
+        # The threads of a parent process aren't inherited
+        if _refresher_pid == os.getpid():
+            return
+
+        _refresher_pid = os.getpid()
+
+    threading.Thread(
+        target=_refresh_periodically, args=(session, directory), daemon=True
+    ).start()
+
+
+def get_shards(directory=SITEMAP_DIRECTORY):
+    shards = []
+
+    for path in glob.glob(os.path.join(directory, SHARD_FILENAME.format("*"))):
+        shard = os.path.basename(path)[6:-4]
+
+        if shard.isdigit():
+            shards.append(int(shard))
+
+    return sorted(shards)
+
+
+def get_shard_url(shard):
+    return f"{BASE_URL}/store/sitemap-{shard}.xml"
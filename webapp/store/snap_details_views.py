@@ -1,6 +1,7 @@
+import hashlib
+
 import flask
 import humanize
-import webapp.helpers as helpers
 import webapp.metrics.helper as metrics_helper
 import webapp.metrics.metrics as metrics
 import webapp.store.logic as logic
@@ -15,17 +16,47 @@ from canonicalwebteam.store_api.exceptions import (
     StoreApiTimeoutError,
 )
 from webapp.api.exceptions import ApiError
+from webapp.cache import Cache
+from webapp.content import content_store
 from webapp.markdown import parse_markdown_description
+from webapp.page_cache import cache_page, is_linux
+from webapp.store.degraded import LAST_GOOD_TTL, get_or_last_good
+
+EMPTY_BADGE_SVG = (
+    b'<svg height="20" width="1" xmlns="http://www.w3.org/2000/svg" '
+    b'xmlns:xlink="http://www.w3.org/1999/xlink"></svg>'
+)
+EMPTY_BADGE_ETAG = hashlib.sha1(EMPTY_BADGE_SVG).hexdigest()
 
 
-def snap_details_views(store, api, handle_errors):
+def snap_details_views(
+    store, api, handle_errors, details_cache, page_cache, store_query
+):
 
     snap_regex = "[a-z0-9-]*[a-z][a-z0-9-]*"
     snap_regex_upercase = "[A-Za-z0-9-]*[A-Za-z][A-Za-z0-9-]*"
 
+    # Rendered badges, keyed by everything that ends up in the SVG
+    badge_cache = Cache("badge_svg", maxsize=4096, ttl=3600, shared=True)
+
+    # Last successful details, served while the store API is unavailable
+    last_good_details = Cache(
+        "snap_details_last_good",
+        maxsize=4096,
+        ttl=LAST_GOOD_TTL,
+        shared=True,
+    )
+
     def _get_context_snap_details(snap_name):
         try:
-            details = api.get_item_details(snap_name, api_version=2)
+            details = get_or_last_good(
+                details_cache,
+                last_good_details,
+                (store_query, snap_name),
+                api.get_item_details,
+                snap_name,
+                api_version=2,
+            )
         except StoreApiTimeoutError as api_timeout_error:
             flask.abort(504, str(api_timeout_error))
         except StoreApiResponseDecodeError as api_response_decode_error:
@@ -59,13 +90,9 @@ def snap_details_views(store, api, handle_errors):
             details["snap"]["description"]
         )
 
-        channel_maps_list = logic.convert_channel_maps(
-            details.get("channel-map")
-        )
-
-        latest_channel = logic.get_last_updated_version(
-            details.get("channel-map")
-        )
+        channel_map = logic.ChannelMap(details.get("channel-map"))
+        channel_maps_list = channel_map.channel_maps_list
+        latest_channel = channel_map.latest_channel
 
         default_track = (
             details.get("default-track")
@@ -73,12 +100,12 @@ def snap_details_views(store, api, handle_errors):
             else "latest"
         )
 
-        lowest_risk_available = logic.get_lowest_available_risk(
-            channel_maps_list, default_track
+        lowest_risk_available = channel_map.get_lowest_available_risk(
+            default_track
         )
 
-        extracted_info = logic.extract_info_channel_map(
-            channel_maps_list, default_track, lowest_risk_available
+        extracted_info = channel_map.extract_info(
+            default_track, lowest_risk_available
         )
 
         last_updated = latest_channel["created-at"]
@@ -89,24 +116,12 @@ def snap_details_views(store, api, handle_errors):
 
         icons = logic.get_icon(details["snap"]["media"])
 
-        publisher_info = helpers.get_yaml(
-            "{}{}.yaml".format(
-                flask.current_app.config["CONTENT_DIRECTORY"][
-                    "PUBLISHER_PAGES"
-                ],
-                details["snap"]["publisher"]["username"],
-            ),
-            typ="safe",
+        publisher_info = content_store.get_publisher(
+            details["snap"]["publisher"]["username"]
         )
 
-        publisher_snaps = helpers.get_yaml(
-            "{}{}-snaps.yaml".format(
-                flask.current_app.config["CONTENT_DIRECTORY"][
-                    "PUBLISHER_PAGES"
-                ],
-                details["snap"]["publisher"]["username"],
-            ),
-            typ="safe",
+        publisher_snaps = content_store.get_publisher_snaps(
+            details["snap"]["publisher"]["username"]
         )
 
         publisher_featured_snaps = None
@@ -157,7 +172,7 @@ def snap_details_views(store, api, handle_errors):
             "summary": details["snap"]["summary"],
             "description": formatted_description,
             "channel_map": channel_maps_list,
-            "has_stable": logic.has_stable(channel_maps_list),
+            "has_stable": channel_map.has_stable,
             "developer_validation": details["snap"]["publisher"]["validation"],
             "default_track": default_track,
             "lowest_risk_available": lowest_risk_available,
@@ -183,6 +198,7 @@ def snap_details_views(store, api, handle_errors):
         return context
 
     @store.route('/<regex("' + snap_regex + '"):snap_name>')
+    @cache_page(page_cache, vary_platform=True)
     def snap_details(snap_name):
         """
         A view to display the snap details page for specific snaps.
@@ -262,10 +278,8 @@ def snap_details_views(store, api, handle_errors):
                 ),
                 "normalized_os": os_metrics.os if os_metrics else None,
                 # Context info
-                "is_linux": (
-                    "Linux" in flask.request.headers.get("User-Agent", "")
-                    and "Android"
-                    not in flask.request.headers.get("User-Agent", "")
+                "is_linux": is_linux(
+                    flask.request.headers.get("User-Agent", "")
                 ),
                 "error_info": error_info,
             }
@@ -319,16 +333,13 @@ def snap_details_views(store, api, handle_errors):
             flask.url_for(".snap_details", snap_name=snap_name.lower())
         )
 
-    def get_badge_svg(snap_name, left_text, right_text, color="#0e8420"):
-        show_name = flask.request.args.get("name", default=1, type=int)
-        snap_link = flask.request.url_root + snap_name
-
+    def _render_badge_svg(left_text, right_text, color, link):
         svg = badge(
-            left_text=left_text if show_name else "",
+            left_text=left_text,
             right_text=right_text,
             right_color=color,
-            left_link=snap_link,
-            right_link=snap_link,
+            left_link=link,
+            right_link=link,
             logo=(
                 "data:image/svg+xml,%3Csvg xmlns='http://www.w3.org/2000/svg' "
                 "viewBox='0 0 32 32'%3E%3Cdefs%3E%3Cstyle%3E.cls-1%7Bfill:%23f"
@@ -337,8 +348,34 @@ def snap_details_views(store, api, handle_errors):
                 "-7.3 13.69zM2.5 3.6l15.02 14.94V9.03L2.5 3.6zM27.03 9.03h-8.6"
                 "5l11.12 4.95-2.47-4.95z'/%3E%3C/svg%3E"
             ),
+        ).encode("utf-8")
+
+        return svg, hashlib.sha1(svg).hexdigest()
+
+    def get_badge_svg(snap_name, left_text, right_text, color="#0e8420"):
+        """
+        Returns a tuple (svg, etag) for the badge. The rendered SVG only
+        depends on the texts, the colour and the link so it is cached.
+        """
+        show_name = flask.request.args.get("name", default=1, type=int)
+        snap_link = flask.request.url_root + snap_name
+
+        return badge_cache.get_or_set(
+            (snap_link, left_text, right_text, color, bool(show_name)),
+            _render_badge_svg,
+            left_text if show_name else "",
+            right_text,
+            color,
+            snap_link,
         )
-        return svg
+
+    def _badge_response(svg, etag):
+        response = flask.make_response(svg)
+        response.headers["Content-Type"] = "image/svg+xml"
+        response.set_etag(etag)
+
+        # Answers with a 304 if the ETag matches If-None-Match
+        return response.make_conditional(flask.request)
 
     @store.route('/<regex("' + snap_regex + '"):snap_name>/badge.svg')
     def snap_details_badge(snap_name):
@@ -349,13 +386,13 @@ def snap_details_views(store, api, handle_errors):
             [context["default_track"], "/", context["lowest_risk_available"]]
         )
 
-        svg = get_badge_svg(
+        svg, etag = get_badge_svg(
             snap_name=snap_name,
             left_text=context["snap_title"],
             right_text=snap_channel + " " + context["version"],
         )
 
-        return svg, 200, {"Content-Type": "image/svg+xml"}
+        return _badge_response(svg, etag)
 
     @store.route('/<regex("' + snap_regex + '"):snap_name>/trending.svg')
     def snap_details_badge_trending(snap_name):
@@ -363,10 +400,7 @@ def snap_details_views(store, api, handle_errors):
         context = _get_context_snap_details(snap_name)
 
         # default to empty SVG
-        svg = (
-            '<svg height="20" width="1" xmlns="http://www.w3.org/2000/svg" '
-            'xmlns:xlink="http://www.w3.org/1999/xlink"></svg>'
-        )
+        svg, etag = EMPTY_BADGE_SVG, EMPTY_BADGE_ETAG
 
         # publishers can see preview of trending badge of their own snaps
         # on Publicise page
@@ -382,19 +416,18 @@ def snap_details_views(store, api, handle_errors):
                 show_as_preview = True
 
         if context["trending"] or show_as_preview:
-            svg = get_badge_svg(
+            svg, etag = get_badge_svg(
                 snap_name=snap_name,
                 left_text=context["snap_title"],
                 right_text="Trending this week",
                 color="#FA7041",
             )
 
-        return svg, 200, {"Content-Type": "image/svg+xml"}
+        return _badge_response(svg, etag)
 
     @store.route('/install/<regex("' + snap_regex + '"):snap_name>/<distro>')
     def snap_distro_install(snap_name, distro):
-        filename = f"store/content/distros/{distro}.yaml"
-        distro_data = helpers.get_yaml(filename)
+        distro_data = content_store.get_distro(distro)
 
         if not distro_data:
             flask.abort(404)
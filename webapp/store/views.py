@@ -1,9 +1,9 @@
+import os
 from math import ceil, floor
 import talisker.requests
 import flask
-from dateutil import parser
-import webapp.helpers as helpers
 import webapp.store.logic as logic
+import webapp.store.sitemap as sitemap
 from webapp.api import requests
 from canonicalwebteam.store_api.stores.snapstore import SnapStore
 from canonicalwebteam.store_api.exceptions import (
@@ -16,10 +16,19 @@ from canonicalwebteam.store_api.exceptions import (
     StoreApiTimeoutError,
 )
 from webapp.api.exceptions import ApiError
+from webapp.cache import Cache
+from webapp.content import content_store
+from webapp.page_cache import cache_page
 from webapp.snapcraft import logic as snapcraft_logic
+from webapp.store.degraded import (
+    LAST_GOOD_TTL,
+    add_degraded_header,
+    call_or_last_good,
+)
 from webapp.store.snap_details_views import snap_details_views
 
 session = talisker.requests.get_session(requests.Session)
+session.hedge_requests = os.getenv("STORE_API_HEDGING", "false") == "true"
 
 
 def store_blueprint(store_query=None):
@@ -54,7 +63,28 @@ def store_blueprint(store_query=None):
 
         return status_code, error
 
-    snap_details_views(store, api, _handle_error)
+    # The details of a snap are shared by the details page, the embedded
+    # card, the badges and the distro install pages
+    details_cache = Cache(
+        "snap_details", maxsize=2048, ttl=60, stale_ttl=300, shared=True
+    )
+
+    # Last successful responses of the store API, served while it is
+    # unavailable
+    last_good = Cache(
+        "store_last_good", maxsize=4096, ttl=LAST_GOOD_TTL, shared=True
+    )
+    store.after_request(add_degraded_header)
+
+    # Rendered pages for anonymous visitors, kept as long as the public
+    # Cache-Control header allows
+    page_cache = Cache(
+        "store_pages", maxsize=1024, ttl=61, stale_ttl=300, shared=True
+    )
+
+    snap_details_views(
+        store, api, _handle_error, details_cache, page_cache, store_query
+    )
 
     @store.route("/discover")
     def discover():
@@ -65,14 +95,18 @@ def store_blueprint(store_query=None):
         status_code = 200
 
         try:
-            categories_results = api.get_categories()
+            categories_results = call_or_last_good(
+                last_good, "categories", api.get_categories
+            )
         except StoreApiError:
             categories_results = []
 
         categories = logic.get_categories(categories_results)
 
         try:
-            featured_snaps_results = api.get_featured_items()
+            featured_snaps_results = call_or_last_good(
+                last_good, "featured", api.get_featured_items
+            )
         except (StoreApiError, ApiError) as api_error:
             status_code, error_info = _handle_error(api_error)
             return flask.abort(status_code)
@@ -153,7 +187,10 @@ def store_blueprint(store_query=None):
         searched_results = []
 
         try:
-            searched_results = api.search(
+            searched_results = call_or_last_good(
+                last_good,
+                ("search", snap_searched, snap_category, page),
+                api.search,
                 snap_searched,
                 category=snap_category,
                 size=size,
@@ -291,17 +328,14 @@ def store_blueprint(store_query=None):
         A view to display the publisher details page for specific publisher.
         """
 
-        publisher_content_path = flask.current_app.config["CONTENT_DIRECTORY"][
-            "PUBLISHER_PAGES"
-        ]
-
-        context = helpers.get_yaml(
-            publisher_content_path + publisher + ".yaml", typ="safe"
-        )
+        publisher_content = content_store.get_publisher(publisher)
 
-        if not context:
+        if not publisher_content:
             flask.abort(404)
 
+        # The content is shared between requests
+        context = dict(publisher_content)
+
         if "publishers" in context:
             context["snaps"] = []
             for publisher in context["publishers"]:
@@ -319,9 +353,7 @@ def store_blueprint(store_query=None):
                 )
 
         if "snaps" not in context:
-            snaps = helpers.get_yaml(
-                publisher_content_path + publisher + "-snaps.yaml", typ="safe"
-            )
+            snaps = content_store.get_publisher_snaps(publisher)
 
             context["snaps"] = snaps["snaps"]
 
@@ -344,8 +376,13 @@ def store_blueprint(store_query=None):
         category_results = []
 
         try:
-            category_results = api.get_category_items(
-                category=category, size=10, page=1
+            category_results = call_or_last_good(
+                last_good,
+                ("category", category, 10),
+                api.get_category_items,
+                category=category,
+                size=10,
+                page=1,
             )
         except (StoreApiError, ApiError) as api_error:
             status_code, error_info = _handle_error(api_error)
@@ -379,8 +416,13 @@ def store_blueprint(store_query=None):
         category_results = []
 
         try:
-            category_results = api.get_category_items(
-                category=category, size=3, page=1
+            category_results = call_or_last_good(
+                last_good,
+                ("category", category, 3),
+                api.get_category_items,
+                category=category,
+                size=3,
+                page=1,
             )
         except (StoreApiError, ApiError) as api_error:
             status_code, error_info = _handle_error(api_error)
@@ -393,58 +435,43 @@ def store_blueprint(store_query=None):
 
         return flask.jsonify(snaps_results)
 
-    @store.route("/store/sitemap.xml")
-    def sitemap():
-        base_url = "https://snapcraft.io/store"
-
-        snaps = []
-        page = 0
-        url = f"https://api.snapcraft.io/api/v1/snaps/search?page={page}"
-        while url:
-            response = session.get(url)
-            try:
-                snaps_response = response.json()
-            except Exception:
-                continue
-
-            for snap in snaps_response["_embedded"]["clickindex:package"]:
-                try:
-                    last_udpated = (
-                        parser.parse(snap["last_updated"])
-                        .replace(tzinfo=None)
-                        .strftime("%Y-%m-%d")
-                    )
-                    snaps.append(
-                        {
-                            "url": "https://snapcraft.io/"
-                            + snap["package_name"],
-                            "last_udpated": last_udpated,
-                        }
-                    )
-                except Exception:
-                    continue
-            if "next" in snaps_response["_links"]:
-                url = snaps_response["_links"]["next"]["href"]
-            else:
-                url = None
-
-        xml_sitemap = flask.render_template(
-            "sitemap/sitemap.xml",
-            base_url=base_url,
-            links=snaps,
-        )
+    def _send_sitemap(filename):
+        if not os.path.isfile(
+            os.path.join(sitemap.SITEMAP_DIRECTORY, filename)
+        ):
+            # The first build is still running
+            return flask.abort(503)
 
-        response = flask.make_response(xml_sitemap)
-        response.headers["Content-Type"] = "application/xml"
+        response = flask.send_from_directory(
+            sitemap.SITEMAP_DIRECTORY, filename, mimetype="application/xml"
+        )
         response.headers["Cache-Control"] = "public, max-age=43200"
 
         return response
 
+    @store.route("/store/sitemap.xml")
+    def sitemap_index():
+        sitemap.refresh_in_background(directory=sitemap.SITEMAP_DIRECTORY)
+
+        return _send_sitemap(sitemap.INDEX_FILENAME)
+
+    @store.route("/store/sitemap-<int:shard>.xml")
+    def sitemap_shard(shard):
+        return _send_sitemap(sitemap.SHARD_FILENAME.format(shard))
+
     if store_query:
         store.add_url_rule("/", "homepage", brand_store_view)
         store.add_url_rule("/search", "search", brand_search_snap)
     else:
-        store.add_url_rule("/store", "homepage", store_view)
-        store.add_url_rule("/search", "search", search_snap)
+        store.add_url_rule(
+            "/store", "homepage", cache_page(page_cache)(store_view)
+        )
+        store.add_url_rule(
+            "/search",
+            "search",
+            cache_page(page_cache, query_args=("q", "category", "page"))(
+                search_snap
+            ),
+        )
 
     return store
@@ -1,6 +1,8 @@
 # Core
 import hashlib
+import json
 import os
+import stat
 
 
 # generator functions for templates
@@ -58,6 +60,73 @@ def join(arr, separator=""):
     return separator.join(arr)
 
 
+STATIC_DIRECTORY = "static"
+STATIC_MANIFEST = os.path.join(STATIC_DIRECTORY, "manifest.json")
+
+# Hashes of the static files, from the manifest built with
+# `python3 -m webapp.template_utils`
+static_manifest = {}
+
+# Hashes of the files missing from the manifest, with their modification
+# time so they are hashed again when rebuilt during development
+static_hashes = {}
+
+
+def hash_static_file(filepath):
+    # Use MD5 as we care about speed a lot
+    # and not security in this case
+    file_hash = hashlib.md5()
+    with open(filepath, "rb") as file_contents:
+        for chunk in iter(lambda: file_contents.read(4096), b""):
+            file_hash.update(chunk)
+
+    return file_hash.hexdigest()[:7]
+
+
+def build_static_manifest(directory=STATIC_DIRECTORY):
+    """
+    Returns the hashes of all the files of a directory, by path
+    relative to the directory
+    """
+    manifest = {}
+
+    for root, _, filenames in os.walk(directory):
+        for filename in filenames:
+            filepath = os.path.join(root, filename)
+            relative_path = os.path.relpath(filepath, directory)
+            manifest[relative_path] = hash_static_file(filepath)
+
+    return manifest
+
+
+def write_static_manifest(
+    directory=STATIC_DIRECTORY, manifest_path=STATIC_MANIFEST
+):
+    manifest = build_static_manifest(directory)
+    manifest.pop(os.path.relpath(manifest_path, directory), None)
+
+    with open(manifest_path, "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+
+
+def load_static_manifest(manifest_path=STATIC_MANIFEST):
+    """
+    Loads the manifest of the static files if it was built
+
+    :returns: True if the manifest was loaded
+    """
+    try:
+        with open(manifest_path) as manifest_file:
+            manifest = json.load(manifest_file)
+    except (OSError, ValueError):
+        return False
+
+    static_manifest.clear()
+    static_manifest.update(manifest)
+
+    return True
+
+
 def static_url(filename):
     """
     Template function for generating URLs to static assets:
@@ -65,21 +134,31 @@ def static_url(filename):
     with a hex hash as a query string for versioning
     """
 
-    filepath = os.path.join("static", filename)
+    filepath = os.path.join(STATIC_DIRECTORY, filename)
     url = "/" + filepath
 
-    if not os.path.isfile(filepath):
-        # Could not find static file
-        return url
+    file_hash = static_manifest.get(filename)
 
-    # Use MD5 as we care about speed a lot
-    # and not security in this case
-    file_hash = hashlib.md5()
-    with open(filepath, "rb") as file_contents:
-        for chunk in iter(lambda: file_contents.read(4096), b""):
-            file_hash.update(chunk)
+    if not file_hash:
+        try:
+            file_stat = os.stat(filepath)
+        except OSError:
+            file_stat = None
 
-    return url + "?v=" + file_hash.hexdigest()[:7]
+        if not file_stat or not stat.S_ISREG(file_stat.st_mode):
+            # Could not find static file
+            return url
+
+        mtime = file_stat.st_mtime_ns
+        cached = static_hashes.get(filename)
+
+        if cached and cached[0] == mtime:
+            file_hash = cached[1]
+        else:
+            file_hash = hash_static_file(filepath)
+            static_hashes[filename] = (mtime, file_hash)
+
+    return url + "?v=" + file_hash
 
 
 def install_snippet(
@@ -118,3 +197,7 @@ def display_name(display_name, username):
         return display_name
     else:
         return f"{display_name} ({username})"
+
+
+if __name__ == "__main__":
+    write_static_manifest()
@@ -0,0 +1,157 @@
+"""
+Request-scoped tracing. The upstream calls, the template rendering and
+the context processors of a request are recorded as a tree of spans.
+Their totals are sent in the Server-Timing header, and requests slower
+than SLOW_REQUEST_THRESHOLD are logged with their whole span tree.
+"""
+
+import json
+import logging
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import flask
+import jinja2
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    def __init__(self, name, **attributes):
+        self.name = name
+        self.attributes = attributes
+        self.children = []
+        self.start = time.monotonic()
+        self.end = None
+
+    @property
+    def duration(self):
+        end = self.end if self.end is not None else time.monotonic()
+
+        return end - self.start
+
+    def finish(self):
+        self.end = time.monotonic()
+
+    def walk(self):
+        yield self
+
+        for child in self.children:
+            yield from child.walk()
+
+    def to_dict(self, origin=None):
+        origin = self.start if origin is None else origin
+
+        span = {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 1),
+            "duration_ms": round(self.duration * 1000, 1),
+        }
+        span.update(self.attributes)
+
+        if self.children:
+            span["children"] = [
+                child.to_dict(origin) for child in self.children
+            ]
+
+        return span
+
+
+def _get_stack():
+    if not flask.has_request_context():
+        return None
+
+    return flask.g.get("trace_stack")
+
+
+@contextmanager
+def span(name, **attributes):
+    """Record a span in the trace of the current request
+
+    Outside of a request, nothing is recorded and None is yielded.
+    """
+    stack = _get_stack()
+
+    if not stack:
+        yield None
+        return
+
+    current = Span(name, **attributes)
+    stack[-1].children.append(current)
+    stack.append(current)
+
+    try:
+        yield current
+    finally:
+        current.finish()
+        stack.remove(current)
+
+
+def get_server_timing(root):
+    """Sum the spans by name, in the Server-Timing header format"""
+    totals = OrderedDict()
+
+    for current in root.walk():
+        if current is root:
+            continue
+
+        duration, count = totals.get(current.name, (0, 0))
+        totals[current.name] = (duration + current.duration, count + 1)
+
+    metrics = [
+        f'{name};dur={duration * 1000:.1f};desc="{count}"'
+        for name, (duration, count) in totals.items()
+    ]
+    metrics.append(f"total;dur={root.duration * 1000:.1f}")
+
+    return ", ".join(metrics)
+
+
+class TracedTemplate(jinja2.Template):
+    def render(self, *args, **kwargs):
+        with span("render", template=self.name):
+            return super().render(*args, **kwargs)
+
+
+def init_tracing(app):
+    app.jinja_env.template_class = TracedTemplate
+
+    update_template_context = app.update_template_context
+
+    def traced_update_template_context(context):
+        with span("context"):
+            update_template_context(context)
+
+    app.update_template_context = traced_update_template_context
+
+    @app.before_request
+    def start_trace():
+        flask.g.trace_stack = [Span("request")]
+
+    @app.after_request
+    def finish_trace(response):
+        stack = flask.g.pop("trace_stack", None)
+
+        if not stack:
+            return response
+
+        root = stack[0]
+        root.finish()
+
+        response.headers["Server-Timing"] = get_server_timing(root)
+
+        duration_ms = root.duration * 1000
+        if duration_ms > app.config["SLOW_REQUEST_THRESHOLD"]:
+            logger.warning(
+                "Slow request",
+                extra={
+                    "method": flask.request.method,
+                    "path": flask.request.path,
+                    "status": response.status_code,
+                    "duration_ms": round(duration_ms, 1),
+                    "spans": json.dumps(root.to_dict()),
+                },
+            )
+
+        return response